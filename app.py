@@ -1,18 +1,99 @@
 # flask-oidc-provider/app.py
 
-from flask import Flask, redirect, request, render_template, session, jsonify
-from datetime import datetime, timezone
+from flask import (
+    Blueprint, Flask, abort, current_app, redirect, request, render_template, session, jsonify,
+    has_request_context, stream_with_context, url_for
+)
 from typing import Tuple, Dict, Any, Optional
+import json
+from urllib.parse import urlencode
+import time
 import uuid
-from auth.token import TokenService
+import hashlib
+import secrets
+import threading
+from auth.token import KeyRing, TokenService, get_issuer, get_keyring
 from auth.pkce import verify_code_challenge
-from auth.client_auth import authenticate_client, get_client_config
-from models import clients, authorization_codes, tokens, users, cleanup_expired_tokens
+from auth.client_auth import authenticate_client, compile_client_policies, get_client_config, get_client_policy
+from auth.consent import canonical_scope, consent_grants, has_consent, remember_consent, revoke_consent
+from auth.codes import open_code, redeemed_codes, seal_code
+from auth.refresh import issue_refresh_token, refresh_families, refresh_redemptions, rotate_refresh_token
+from auth.revocation import is_revoked, is_token_active, revoke_token, revoked_tokens
+from models import (
+    clients, authorization_codes, authorization_requests, sso_sessions, tokens, users, users_by_sub,
+    client_credentials_tokens, cleanup_expired_tokens
+)
 from config import Config
+from cache import SingleFlight
+from metrics import cache_requests, init_metrics, init_server_timing, phase, rate_limit_rejections, register_store
+from profiling import init_profiler
+from diagnostics import init_debug_stats
+from auth.admin import verify_admin_token
+from auth.registration import RegistrationError, import_clients, register_client
+from auth.device import (
+    DEVICE_CODE_GRANT, complete_device_authorization, device_codes, device_polls, get_device_request,
+    poll_device_code, start_device_authorization, user_codes
+)
+from auth.exchange import ACCESS_TOKEN_TYPE, TOKEN_EXCHANGE_GRANT, derived_tokens, exchange_token
+from audit import audit, init_audit
+from auth.logout import LogoutDispatcher, pop_rp_sessions, record_rp_session, rp_sessions, wait_for_deliveries
+from tenants import TenantRegistry, current_tenant, current_tenant_id, set_current_tenant, tenant_from_host
 
-app = Flask(__name__)
-app.config.from_object(Config)
-app.secret_key = app.config['SECRET_KEY']  # Required for session management
+bp = Blueprint("oidc", __name__)
+
+# Pre-encoded discovery documents are kept per URL root, in app.extensions["discovery"]
+# (tenants keep their own)
+DISCOVERY_CACHE_SIZE = 64
+DISCOVERY_PATH = "/.well-known/openid-configuration"
+
+# Claims of recently verified bearer tokens ((key ring, token): claims); revocation is still checked per call
+_verified_tokens: Dict[Tuple[KeyRing, str], Dict[str, Any]] = {}
+VERIFIED_TOKEN_CACHE_SIZE = 4096
+
+# Pre-encoded userinfo bodies ((sub, scope): (user version, body, etag))
+_userinfo_cache: Dict[Tuple[str, str], Tuple[int, bytes, str]] = {}
+USERINFO_CACHE_SIZE = 4096
+
+# Everything that grows with traffic, for /metrics and /debug/stats
+STORES = {
+    "tokens": tokens,
+    "authorization_codes": authorization_codes,
+    "redeemed_codes": redeemed_codes,
+    "authorization_requests": authorization_requests,
+    "sso_sessions": sso_sessions,
+    "consent_grants": consent_grants,
+    "refresh_families": refresh_families,
+    "refresh_redemptions": refresh_redemptions,
+    "revoked_tokens": revoked_tokens,
+    "client_credentials_tokens": client_credentials_tokens,
+    "device_codes": device_codes,
+    "device_polls": device_polls,
+    "user_codes": user_codes,
+    "rp_sessions": rp_sessions,
+    "derived_tokens": derived_tokens,
+    "clients": clients,
+}
+for name, store in STORES.items():
+    register_store(name, store)
+
+# Label tuples for cache metrics, built once
+CLIENT_CREDENTIALS_HIT = ("client_credentials", "hit")
+CLIENT_CREDENTIALS_MISS = ("client_credentials", "miss")
+REFRESH_SHARED = ("refresh_single_flight", "hit")
+REFRESH_LEADER = ("refresh_single_flight", "miss")
+USERINFO_HIT = ("userinfo", "hit")
+USERINFO_MISS = ("userinfo", "miss")
+TOKEN_EXCHANGE_HIT = ("token_exchange", "hit")
+TOKEN_EXCHANGE_MISS = ("token_exchange", "miss")
+TOKEN_ENDPOINT = ("token",)
+
+DEVICE_POLL_ERRORS = {
+    "authorization_pending": "The user has not yet completed authorization",
+    "slow_down": "Polling too frequently; increase the interval by 5 seconds",
+    "access_denied": "The user denied the authorization request",
+    "expired_token": "The device code has expired",
+    "invalid_grant": "Invalid device code"
+}
 
 def create_error_response(error: str, description: str, status: int = 400) -> Tuple[Dict, int]:
     """Create standardized error response"""
@@ -46,33 +127,188 @@ def authenticate_client_request() -> Tuple[Dict[str, Any], Optional[Tuple[Dict,
 
     return client, None
 
-@app.route("/")
+def get_authorization_request(pop: bool = False) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """
+    Look up the pending authorization request for this browser.
+    The handle comes from the submitted form, falling back to the session.
+    Returns (handle, request parameters); parameters are None if unknown,
+    expired or started by another browser.
+    """
+    handle = request.form.get("auth_request") or session.get("auth_request")
+    if not handle:
+        return None, None
+    auth_request = authorization_requests.get(handle)
+    if auth_request is None:
+        return handle, None
+    # Requests started at one tenant cannot be completed at another, and a
+    # handle planted in another browser's form cannot be approved by its session
+    browser = session.get("browser")
+    if (
+        auth_request.get('tenant') != current_tenant_id()
+        or not browser or not secrets.compare_digest(auth_request.get('browser', ''), browser)
+    ):
+        return handle, None
+    if pop:
+        session.pop("auth_request", None)
+        auth_request = authorization_requests.pop(handle)
+    return handle, auth_request
+
+def start_sso_session(username: str) -> Dict[str, Any]:
+    """Create a provider-side SSO session and bind it to this browser"""
+    old_sid = session.pop('sid', None)
+    if old_sid:
+        sso_sessions.delete(old_sid)
+
+    sid = secrets.token_urlsafe(24)
+    sso = {"user": username, "auth_time": int(time.time()), "tenant": current_tenant_id()}
+    sso_sessions.set(sid, sso, current_app.config['SSO_SESSION_MAX_AGE'])
+    session['sid'] = sid
+    return sso
+
+def get_sso_session() -> Optional[Dict[str, Any]]:
+    """Return the SSO session bound to this browser, or None"""
+    sid = session.get('sid')
+    sso = sso_sessions.get(sid) if sid else None
+    # Users log in to each tenant separately
+    if sso and sso.get('tenant') != current_tenant_id():
+        return None
+    return sso
+
+def redirect_with_error(auth_request: Dict[str, Any], error: str, description: str):
+    """Redirect back to the client with an authorization error"""
+    params = {"error": error, "error_description": description}
+    if auth_request.get('state'):
+        params["state"] = auth_request['state']
+    return redirect(f"{auth_request['redirect_uri']}?{urlencode(params)}")
+
+def render_consent(handle: str, auth_request: Dict[str, Any]):
+    """Render the consent page for a pending authorization request"""
+    # Get the scope string and split it into a list
+    scope_string = auth_request.get('scope') or 'openid'
+    scopes = [s.strip() for s in scope_string.split() if s.strip()]
+    print(f"Rendering consent page with scopes: {scopes}")
+    return render_template(
+        "consent.html",
+        client_id=auth_request['client_id'],
+        scopes=scopes,
+        auth_request=handle
+    )
+
+def issue_authorization_code(auth_request: Dict[str, Any], username: str, auth_time: int):
+    """Create an authorization code and redirect back to the client with it"""
+    # Ensure scope is properly formatted
+    scope_string = auth_request.get('scope') or 'openid'
+    scopes = ' '.join(s.strip() for s in scope_string.split() if s.strip())
+
+    claims = {
+        "client_id": auth_request['client_id'],
+        "user": username,
+        "code_challenge": auth_request.get('code_challenge'),
+        "code_challenge_method": auth_request.get('code_challenge_method') or 'S256',
+        "scope": scopes,
+        "nonce": auth_request.get('nonce'),
+        "auth_time": auth_time,
+        "tenant": current_tenant_id()
+    }
+    ttl = current_app.config['AUTHORIZATION_CODE_TTL']
+    if current_app.config['SEALED_AUTHORIZATION_CODES']:
+        # The code carries its own state; any node can redeem it
+        code = seal_code(claims, ttl, current_app.config['AUTHORIZATION_CODE_KEY'])
+    else:
+        code = str(uuid.uuid4())
+        authorization_codes.set(code, {**claims, "created_at": int(time.time())}, ttl)
+
+    print(f"Generated authorization code for user {username} with scopes: {scopes}")
+    record_rp_session(username, auth_request['client_id'], auth_time, current_app.config['REFRESH_TOKEN_TTL'])
+    audit("code_issued", user=username, client_id=auth_request['client_id'], scope=scopes)
+
+    # Redirect back to client with the code
+    redirect_uri = (
+        f"{auth_request['redirect_uri']}?"
+        f"code={code}&"
+        f"state={auth_request.get('state') or ''}"
+    )
+    return redirect(redirect_uri)
+
+@bp.url_value_preprocessor
+def resolve_tenant(endpoint: Optional[str], values: Optional[Dict[str, Any]]) -> None:
+    """Bind the tenant addressed by the URL prefix or host to this request"""
+    tenant_id = values.pop("tenant_id", None) if values else None
+    if tenant_id is None:
+        tenant_id = tenant_from_host(request.host, current_app.config['TENANT_HOST_SUFFIX'])
+    tenant = current_app.extensions["tenants"].get(tenant_id) if tenant_id else None
+    set_current_tenant(tenant)
+    if tenant_id and tenant is None:
+        abort(404)
+
+@bp.teardown_request
+def release_tenant(exc: Optional[BaseException]) -> None:
+    """Unbind the tenant so it cannot leak into the next request on this thread"""
+    set_current_tenant(None)
+
+@bp.url_defaults
+def add_tenant_id(endpoint: str, values: Dict[str, Any]) -> None:
+    """Keep generated URLs (e.g. form actions) inside the current tenant"""
+    tenant = current_tenant()
+    if tenant and "tenant_id" not in values and current_app.url_map.is_endpoint_expecting(endpoint, "tenant_id"):
+        values["tenant_id"] = tenant.tenant_id
+
+def tenant_scoped(client_id: str) -> str:
+    """Qualify a client id with the current tenant for keys in shared stores"""
+    tenant_id = current_tenant_id()
+    return f"{tenant_id}/{client_id}" if tenant_id else client_id
+
+@bp.route("/")
 def index():
     return "OIDC Provider is Running"
 
-@app.route("/.well-known/openid-configuration")
-def openid_configuration() -> Dict[str, Any]:
-    """OpenID Connect discovery endpoint"""
-    return jsonify({
-        "issuer": "http://localhost:5000",
-        "authorization_endpoint": f"{request.url_root}authorize",
-        "token_endpoint": f"{request.url_root}token",
-        "userinfo_endpoint": f"{request.url_root}userinfo",
-        "jwks_uri": f"{request.url_root}.well-known/jwks.json",
+def build_discovery_document(url_root: str, issuer: str) -> bytes:
+    """Encode the discovery document for a given URL root"""
+    return json.dumps({
+        "issuer": issuer,
+        "authorization_endpoint": f"{url_root}authorize",
+        "token_endpoint": f"{url_root}token",
+        "userinfo_endpoint": f"{url_root}userinfo",
+        "jwks_uri": f"{url_root}.well-known/jwks.json",
+        "revocation_endpoint": f"{url_root}revoke",
+        "introspection_endpoint": f"{url_root}introspect",
+        "registration_endpoint": f"{url_root}register",
+        "device_authorization_endpoint": f"{url_root}device_authorization",
+        "end_session_endpoint": f"{url_root}logout",
+        "backchannel_logout_supported": True,
+        "backchannel_logout_session_supported": False,
         "scopes_supported": ["openid", "profile", "email"],
         "response_types_supported": ["code"],
         "token_endpoint_auth_methods_supported": ["client_secret_basic"],
-        "grant_types_supported": ["authorization_code", "refresh_token"],
+        "revocation_endpoint_auth_methods_supported": ["client_secret_basic", "client_secret_post"],
+        "introspection_endpoint_auth_methods_supported": ["client_secret_basic", "client_secret_post"],
+        "grant_types_supported": [
+            "authorization_code", "refresh_token", "client_credentials", DEVICE_CODE_GRANT, TOKEN_EXCHANGE_GRANT
+        ],
         "subject_types_supported": ["public"],
         "id_token_signing_alg_values_supported": ["RS256"]
-    })
+    }).encode()
 
-@app.route("/.well-known/jwks.json")
+@bp.route(DISCOVERY_PATH)
+def openid_configuration():
+    """OpenID Connect discovery endpoint"""
+    tenant = current_tenant()
+    cache = tenant.discovery if tenant else current_app.extensions["discovery"]
+    # Endpoints live next to this document, under the tenant prefix if any
+    url_root = request.base_url[:-len(DISCOVERY_PATH)] + "/"
+    body = cache.get(url_root)
+    if body is None:
+        if len(cache) >= DISCOVERY_CACHE_SIZE:
+            cache.clear()
+        body = cache[url_root] = build_discovery_document(url_root, get_issuer())
+    return current_app.response_class(body, mimetype="application/json")
+
+@bp.route("/.well-known/jwks.json")
 def jwks():
     """JSON Web Key Set endpoint"""
-    return Config.load_jwks(), 200, {"Content-Type": "application/json"}
+    return current_app.response_class(get_keyring().jwks_bytes, mimetype="application/json")
 
-@app.route("/authorize", methods=["GET", "POST"])
+@bp.route("/authorize", methods=["GET", "POST"])
 def authorize():
     """Authorization endpoint"""
     if request.method == "GET":
@@ -91,16 +327,16 @@ def authorize():
             )
             
         # Validate client and redirect URI
-        client = get_client_config(client_id)
-        print(f"Found client: {client}")
-        
-        if not client:
+        policy = get_client_policy(client_id)
+        print(f"Found client: {client_id if policy else None}")
+
+        if not policy:
             return create_error_response(
                 "invalid_client",
                 "Unknown client"
             )
-            
-        if redirect_uri not in client.get("redirect_uris", []):
+
+        if redirect_uri not in policy.redirect_uris:
             return create_error_response(
                 "invalid_request",
                 "Invalid redirect URI"
@@ -113,18 +349,49 @@ def authorize():
                 "Only 'code' response type is supported"
             )
 
-        # Store request parameters in session
-        session.update({
+        prompt = set((request.args.get("prompt") or "").split())
+        max_age = request.args.get("max_age")
+        if max_age is not None and not max_age.isdigit():
+            return create_error_response("invalid_request", "max_age must be a non-negative integer")
+
+        # Store request parameters server-side; only the handle travels with the browser
+        handle = secrets.token_urlsafe(16)
+        authorization_requests.set(handle, {
             'client_id': client_id,
             'redirect_uri': redirect_uri,
             'state': request.args.get("state"),
             'scope': scope,
             'code_challenge': request.args.get("code_challenge"),
             'code_challenge_method': request.args.get("code_challenge_method", "S256"),
-            'nonce': request.args.get("nonce")
-        })
-        
-        return render_template("login.html")
+            'nonce': request.args.get("nonce"),
+            'tenant': current_tenant_id(),
+            # Binds the request to the browser that started it
+            'browser': session.setdefault('browser', secrets.token_urlsafe(16))
+        }, current_app.config['AUTHORIZATION_REQUEST_TTL'])
+        session['auth_request'] = handle
+
+        # Reuse the SSO session unless the client demands a fresh login
+        sso = get_sso_session()
+        if sso and "login" in prompt:
+            sso = None
+        if sso and max_age is not None and time.time() - sso['auth_time'] > int(max_age):
+            sso = None
+
+        if not sso:
+            if "none" in prompt:
+                _, auth_request = get_authorization_request(pop=True)
+                return redirect_with_error(auth_request, "login_required", "User is not logged in")
+            return render_template("login.html", auth_request=handle)
+
+        if has_consent(sso['user'], tenant_scoped(client_id), scope):
+            _, auth_request = get_authorization_request(pop=True)
+            return issue_authorization_code(auth_request, sso['user'], sso['auth_time'])
+
+        if "none" in prompt:
+            _, auth_request = get_authorization_request(pop=True)
+            return redirect_with_error(auth_request, "consent_required", "User consent is required")
+
+        return render_consent(handle, authorization_requests.get(handle))
 
     # Handle POST (login only - consent goes to /consent endpoint)
     if request.method == "POST":
@@ -166,82 +433,257 @@ def authorize():
                 print(f"   Reason: User '{username}' not found")
             else:
                 print(f"   Reason: Password mismatch")
+            audit("login", "failure", user=username)
             return create_error_response("invalid_credentials", "Invalid username or password", 401)
 
-        session['user'] = username
+        handle, auth_request = get_authorization_request()
+        if not auth_request:
+            return create_error_response("invalid_request", "Unknown or expired authorization request", 400)
+
+        sso = start_sso_session(username)
+        audit("login", user=username, client_id=auth_request['client_id'])
         print(f"User {username} authenticated successfully")
-          # Get the scope string and split it into a list
-        scope_string = session.get('scope', 'openid')
-        scopes = [s.strip() for s in scope_string.split() if s.strip()]
-        print(f"Rendering consent page with scopes: {scopes}")
-        return render_template(
-            "consent.html", 
-            client_id=session.get('client_id'),
-            scopes=scopes
-        )
 
-@app.route("/consent", methods=["POST"])
+        # Skip the consent page if the user already approved these scopes
+        if has_consent(username, tenant_scoped(auth_request['client_id']), auth_request.get('scope') or 'openid'):
+            _, auth_request = get_authorization_request(pop=True)
+            if auth_request:
+                return issue_authorization_code(auth_request, username, sso['auth_time'])
+            return create_error_response("invalid_request", "Unknown or expired authorization request", 400)
+
+        return render_consent(handle, auth_request)
+
+@bp.route("/consent", methods=["POST"])
 def consent():
     """Handle user consent"""
-    if "user" not in session:
+    sso = get_sso_session()
+    if not sso:
         print("No active session found")
         return create_error_response("unauthorized", "No active session", 401)
 
+    # Authorization requests are single-use
+    _, auth_request = get_authorization_request(pop=True)
+    if not auth_request:
+        return create_error_response("invalid_request", "Unknown or expired authorization request", 400)
+
     # Check if user denied access
     if request.form.get("action") == "deny":
-        redirect_uri = (
-            f"{session['redirect_uri']}?"
-            f"error=access_denied&"
-            f"error_description=User denied access&"
-            f"state={session.get('state', '')}"
-        )
-        return redirect(redirect_uri)
+        audit("consent", "denied", user=sso['user'], client_id=auth_request['client_id'], scope=auth_request.get('scope'))
+        return redirect_with_error(auth_request, "access_denied", "User denied access")
 
-    # Generate authorization code
-    code = str(uuid.uuid4())
-    
-    # Ensure scope is properly formatted
-    scope_string = session.get('scope', 'openid')
-    scopes = ' '.join(s.strip() for s in scope_string.split() if s.strip())
-    
-    authorization_codes[code] = {
-        "client_id": session['client_id'],
-        "user": session['user'],
-        "code_challenge": session.get('code_challenge'),
-        "code_challenge_method": session.get('code_challenge_method', 'S256'),
-        "scope": scopes,
-        "created_at": datetime.now(timezone.utc)
-    }
+    audit("consent", user=sso['user'], client_id=auth_request['client_id'], scope=auth_request.get('scope'))
+    remember_consent(sso['user'], tenant_scoped(auth_request['client_id']), auth_request.get('scope') or 'openid')
+    return issue_authorization_code(auth_request, sso['user'], sso['auth_time'])
 
-    print(f"Generated authorization code for user {session['user']} with scopes: {scopes}")
+@bp.route("/consent/revoke", methods=["POST"])
+def consent_revoke():
+    """Revoke the remembered consents the logged-in user gave to a client"""
+    sso = get_sso_session()
+    if not sso:
+        return create_error_response("unauthorized", "No active session", 401)
 
-    # Redirect back to client with the code
-    redirect_uri = (
-        f"{session['redirect_uri']}?"
-        f"code={code}&"
-        f"state={session.get('state', '')}"
+    client_id = request.form.get("client_id")
+    if not client_id:
+        return create_error_response("invalid_request", "Missing client_id")
+
+    revoked = revoke_consent(sso['user'], tenant_scoped(client_id))
+    return jsonify({"client_id": client_id, "revoked": revoked})
+
+@bp.route("/device_authorization", methods=["POST"])
+def device_authorization():
+    """RFC 8628 device authorization endpoint"""
+    client, error = authenticate_client_request()
+    if error:
+        return error
+
+    policy = get_client_policy(client["client_id"])
+    if DEVICE_CODE_GRANT not in policy.grant_types:
+        return create_error_response("unauthorized_client", "Client is not allowed to use the device_code grant")
+    requested = request.form.get("scope")
+    scope = canonical_scope(requested if requested else policy.scopes)
+    if not policy.scopes.issuperset(scope.split()):
+        return create_error_response("invalid_scope", "Requested scope exceeds client registration")
+
+    result = start_device_authorization(
+        client["client_id"], scope,
+        current_app.config['DEVICE_CODE_TTL'], current_app.config['DEVICE_POLL_INTERVAL']
     )
-    return redirect(redirect_uri)
+    verification_uri = url_for(".device", _external=True)
+    response = jsonify({
+        **result,
+        "verification_uri": verification_uri,
+        "verification_uri_complete": f"{verification_uri}?{urlencode({'user_code': result['user_code']})}"
+    })
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+@bp.route("/device", methods=["GET", "POST"])
+def device():
+    """Verification page where the user enters the code shown on the device"""
+    user_code = (request.values.get("user_code") or "").strip()
+    device_request = get_device_request(user_code) if user_code else None
+    sso = get_sso_session()
+
+    # Without a valid code, (re)show the code entry form
+    if not device_request:
+        error = "Invalid or expired code" if user_code else None
+        return render_template(
+            "device.html", user_code=user_code, logged_in=bool(sso), error=error
+        ), 400 if error else 200
+    if request.method == "GET":
+        return render_template("device.html", user_code=user_code, device_request=device_request, logged_in=bool(sso))
+
+    if not sso:
+        username = (request.form.get("username") or "").strip()
+        user = users.get(username)
+        if not user or user['password'] != (request.form.get("password") or "").strip():
+            audit("login", "failure", user=username)
+            return render_template(
+                "device.html", user_code=user_code, device_request=device_request,
+                logged_in=False, error="Invalid username or password"
+            ), 401
+        sso = start_sso_session(username)
+        audit("login", user=username, client_id=device_request['client_id'])
+
+    approved = request.form.get("action") == "approve"
+    if not complete_device_authorization(user_code, sso['user'], sso['auth_time'], approved):
+        return render_template("device.html", user_code=user_code, logged_in=True, error="Invalid or expired code"), 400
+    audit(
+        "device_authorization", "success" if approved else "denied",
+        user=sso['user'], client_id=device_request['client_id'], scope=device_request['scope']
+    )
+    if approved:
+        record_rp_session(sso['user'], device_request['client_id'], sso['auth_time'], current_app.config['REFRESH_TOKEN_TTL'])
+    return render_template("device.html", done=True, approved=approved)
+
+@bp.route("/logout", methods=["GET", "POST"])
+def end_session():
+    """
+    RP-initiated logout (end_session_endpoint).
+    Ends the SSO session and notifies, via back-channel logout, every client
+    the user signed in to. Unless a valid id_token_hint for the signed-in user
+    shows the request comes from a client, the user has to confirm first, so
+    a cross-site link cannot log anyone out. Without a session, an unexpired
+    id_token_hint identifies the user, who always has to confirm.
+    """
+    # Everything is validated before the session is touched
+    hint = None
+    id_token_hint = request.values.get("id_token_hint")
+    if id_token_hint:
+        try:
+            hint = TokenService.decode_id_token_hint(id_token_hint)
+        except Exception:
+            return create_error_response("invalid_request", "Invalid id_token_hint")
+    hint_client_id = hint.get("aud") if hint else None
+
+    # Only redirect to URIs the client registered for this purpose
+    post_logout_redirect_uri = request.values.get("post_logout_redirect_uri")
+    if post_logout_redirect_uri:
+        client = get_client_config(request.values.get("client_id") or hint_client_id or "")
+        if not client or post_logout_redirect_uri not in client.get("post_logout_redirect_uris", []):
+            return create_error_response("invalid_request", "Unregistered post_logout_redirect_uri")
+
+    username = None
+    sso = get_sso_session()
+    if sso:
+        if hint and users[sso['user']]['sub'] != hint.get("sub"):
+            return create_error_response("invalid_request", "id_token_hint is for another user")
+        username = sso['user']
+    elif hint and hint.get("exp", 0) > time.time():
+        # Without a session the hint is the only authority, and only an unexpired one
+        username = users_by_sub.get(hint.get("sub"))
+
+    if username and not (sso and hint):
+        confirm = session.pop('logout_confirm', None)
+        if not (
+            request.method == "POST" and confirm and secrets.compare_digest(confirm, request.form.get("confirm", ""))
+        ):
+            session['logout_confirm'] = secrets.token_urlsafe(16)
+            return render_template(
+                "logout.html", username=username, client_id=hint_client_id, id_token_hint=id_token_hint,
+                confirm=session['logout_confirm'], post_logout_redirect_uri=post_logout_redirect_uri,
+                state=request.values.get("state"), client_id_param=request.values.get("client_id")
+            )
+    if sso:
+        sso_sessions.delete(session.pop('sid'))
+
+    if username:
+        with phase("backchannel_logout"):
+            delivered, undelivered = notify_logout(username)
+        audit("logout", user=username, delivered=delivered, undelivered=undelivered)
+
+    if post_logout_redirect_uri:
+        state = request.values.get("state")
+        return redirect(post_logout_redirect_uri + (f"?{urlencode({'state': state})}" if state else ""))
+    return "You have been logged out"
+
+def notify_logout(username: str) -> Tuple[int, int]:
+    """
+    Send back-channel logout tokens to every client username signed in to.
+    Deliveries run concurrently; waits up to BACKCHANNEL_LOGOUT_WAIT seconds
+    for them while retries of slow or failing clients continue in the background.
+    Returns (delivered, not yet delivered).
+    """
+    sub = users[username]["sub"]
+    deliveries = []
+    for client_id in pop_rp_sessions(username):
+        client = get_client_config(client_id)
+        if client and client.get("backchannel_logout_uri"):
+            deliveries.append((
+                client["backchannel_logout_uri"],
+                TokenService.generate_logout_token(sub, client_id),
+                client.get("backchannel_logout_timeout")
+            ))
+    futures = current_app.extensions["logout_dispatcher"].dispatch(deliveries)
+    return wait_for_deliveries(futures, current_app.config['BACKCHANNEL_LOGOUT_WAIT'])
 
-@app.route("/token", methods=["POST"])
+@bp.route("/token", methods=["POST"])
 def token():
     """Token endpoint"""
-    client, error = authenticate_client_request()
+    with phase("client_auth"):
+        client, error = authenticate_client_request()
+    grant_type = request.form.get("grant_type", "authorization_code")
     if error:
+        client_id = request.authorization.username if request.authorization else request.form.get("client_id")
+        audit("token_failed", "failure", client_id=client_id, grant_type=grant_type, error="invalid_client")
         return error
 
-    grant_type = request.form.get("grant_type", "authorization_code")
-    
     if grant_type == "authorization_code":
-        return handle_authorization_code_grant()
+        response = handle_authorization_code_grant()
     elif grant_type == "refresh_token":
-        return handle_refresh_token_grant()
+        response = handle_refresh_token_grant(client)
+    elif grant_type == "client_credentials":
+        response = handle_client_credentials_grant(client)
+    elif grant_type == DEVICE_CODE_GRANT:
+        response = handle_device_code_grant(client)
+    elif grant_type == TOKEN_EXCHANGE_GRANT:
+        response = handle_token_exchange_grant(client)
     else:
-        return create_error_response(
+        response = create_error_response(
             "unsupported_grant_type", 
             f"Grant type '{grant_type}' not supported"
         )
 
+    # Successful grants are audited where the subject is known
+    if isinstance(response, tuple) and response[1] >= 400:
+        error = response[0].get_json().get("error")
+        if error != "authorization_pending":
+            audit("token_failed", "failure", client_id=client["client_id"], grant_type=grant_type, error=error)
+    return response
+
+def redeem_authorization_code(code: str) -> Optional[Dict[str, Any]]:
+    """Single-use lookup of a sealed or stored authorization code"""
+    auth_code = None
+    if current_app.config['SEALED_AUTHORIZATION_CODES']:
+        auth_code = open_code(code, current_app.config['AUTHORIZATION_CODE_KEY'])
+    if auth_code is None:
+        # Stored codes (including those issued before sealing was turned on)
+        auth_code = authorization_codes.pop(code)
+    # Codes are only redeemable at the tenant that issued them
+    if auth_code and auth_code.get("tenant") != current_tenant_id():
+        return None
+    return auth_code
+
 def handle_authorization_code_grant() -> Tuple[Dict[str, Any], int]:
     """Handle authorization code grant type"""
     code = request.form.get("code")
@@ -249,52 +691,241 @@ def handle_authorization_code_grant() -> Tuple[Dict[str, Any], int]:
     code_verifier = request.form.get("code_verifier")
 
     # Validate authorization code
-    auth_code = authorization_codes.pop(code, None)
+    with phase("code_lookup"):
+        auth_code = redeem_authorization_code(code) if code else None
     if not auth_code or auth_code["client_id"] != client_id:
         return create_error_response("invalid_grant", "Invalid authorization code")
 
     # Verify PKCE
-    if not verify_code_challenge(
-        code_verifier,
-        auth_code['code_challenge'],
-        auth_code['code_challenge_method']
-    ):
+    with phase("pkce"):
+        verified = verify_code_challenge(
+            code_verifier,
+            auth_code['code_challenge'],
+            auth_code['code_challenge_method']
+        )
+    if not verified:
         return create_error_response("invalid_grant", "Invalid code verifier")
 
     # Generate tokens
     user = users[auth_code['user']]
-    tokens_response = generate_token_response(user, client_id, auth_code['scope'])
+    tokens_response = generate_token_response(
+        user, client_id, auth_code['scope'],
+        nonce=auth_code.get('nonce'),
+        auth_time=auth_code.get('auth_time')
+    )
     return jsonify(tokens_response)
 
-def handle_refresh_token_grant() -> Tuple[Dict[str, Any], int]:
+class RefreshFailed(Exception):
+    """A refresh grant answered with an error body"""
+
+    def __init__(self, body: Dict[str, Any], status: int):
+        super().__init__(body.get("error"))
+        self.body = body
+        self.status = status
+
+def handle_refresh_token_grant(client: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
     """Handle refresh token grant type"""
     refresh_token = request.form.get("refresh_token")
+    if not refresh_token:
+        return create_error_response("invalid_request", "Missing refresh_token")
+
+    def refresh():
+        body, status = refresh_access_token(refresh_token, client['client_id'])
+        if status != 200:
+            # SingleFlight keeps results for its window but never errors
+            raise RefreshFailed(body, status)
+        return body
+
+    # Duplicates of the same refresh (e.g. an expiry stampede) share one result
+    key = hashlib.sha256(f"{tenant_scoped(client['client_id'])}:{refresh_token}".encode()).hexdigest()
     try:
-        decoded = TokenService.decode_token(refresh_token)
-        if decoded.get("type") != "refresh":
-            return create_error_response("invalid_grant", "Invalid token type")
-        
-        new_access_token = TokenService.generate_access_token(
-            decoded["sub"], 
-            decoded.get("scope", "")
+        body, shared = current_app.extensions["refresh_flight"].do(key, refresh)
+    except RefreshFailed as e:
+        return jsonify(e.body), e.status
+    cache_requests.inc(REFRESH_SHARED if shared else REFRESH_LEADER)
+    return jsonify(body), 200
+
+def refresh_access_token(refresh_token: str, client_id: str) -> Tuple[Dict[str, Any], int]:
+    """Rotate a refresh token and mint a new access token; returns (body, status)"""
+    try:
+        with phase("rotate"):
+            new_refresh_token, family = rotate_refresh_token(refresh_token, client_id)
+        new_access_token = TokenService.generate_access_token(family["sub"], family["scope"], family["client_id"])
+        audit(
+            "token_issued", user=users_by_sub.get(family["sub"]), sub=family["sub"],
+            client_id=client_id, grant_type="refresh_token", scope=family["scope"]
         )
-        return jsonify({
+        return {
             "access_token": new_access_token,
+            "refresh_token": new_refresh_token,
             "token_type": "Bearer",
-            "expires_in": 1800
-        })
+            "expires_in": TokenService.ACCESS_TOKEN_TTL
+        }, 200
     except Exception as e:
-        return create_error_response("invalid_grant", str(e))
+        return {"error": "invalid_grant", "error_description": str(e)}, 400
+
+def handle_device_code_grant(client: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    """Handle device code grant type; pending polls are held until the user decides"""
+    device_code = request.form.get("device_code")
+    if not device_code:
+        return create_error_response("invalid_request", "Missing device_code")
+
+    # Held polls occupy a worker thread each; past the cap, pending polls are answered at
+    # once with slow_down until the device polls only every DEVICE_POLL_MAX_INTERVAL seconds
+    slots = current_app.extensions["held_device_polls"]
+    wait = current_app.config['DEVICE_POLL_WAIT']
+    held = wait > 0 and slots.acquire(blocking=False)
+    back_off_to = current_app.config['DEVICE_POLL_MAX_INTERVAL'] if wait > 0 and not held else 0
+    try:
+        with phase("device_poll"):
+            error, record = poll_device_code(device_code, client["client_id"], wait if held else 0, back_off_to)
+    finally:
+        if held:
+            slots.release()
+    if error:
+        if error == "slow_down":
+            rate_limit_rejections.inc(TOKEN_ENDPOINT)
+        return create_error_response(error, DEVICE_POLL_ERRORS[error])
+
+    user = users[record["user"]]
+    return jsonify(generate_token_response(user, client["client_id"], record["scope"], auth_time=record["auth_time"]))
+
+def handle_client_credentials_grant(client: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    """Handle client credentials grant type (machine-to-machine)"""
+    client_id = client["client_id"]
+    policy = get_client_policy(client_id)
+    if "client_credentials" not in policy.grant_types:
+        return create_error_response(
+            "unauthorized_client",
+            "Client is not allowed to use the client_credentials grant"
+        )
+
+    requested = request.form.get("scope")
+    scope = canonical_scope(requested if requested else policy.scopes)
+    if not policy.scopes.issuperset(scope.split()):
+        return create_error_response("invalid_scope", "Requested scope exceeds client registration")
+
+    # Hand back a previously minted token while it still has enough lifetime left
+    cache_key = f"{tenant_scoped(client_id)}|{scope}"
+    reuse = current_app.config['CLIENT_CREDENTIALS_TOKEN_REUSE']
+    if reuse:
+        cached = client_credentials_tokens.get(cache_key)
+        if cached and not is_revoked(cached["jti"]):
+            remaining = cached["expires_at"] - int(time.time())
+            if remaining > current_app.config['CLIENT_CREDENTIALS_MIN_REMAINING']:
+                cache_requests.inc(CLIENT_CREDENTIALS_HIT)
+                audit("token_issued", client_id=client_id, grant_type="client_credentials", scope=scope, reused=True)
+                return jsonify({
+                    "access_token": cached["access_token"],
+                    "token_type": "Bearer",
+                    "expires_in": remaining,
+                    "scope": scope
+                })
+
+        cache_requests.inc(CLIENT_CREDENTIALS_MISS)
+
+    jti = secrets.token_urlsafe(16)
+    access_token = TokenService.generate_access_token(client_id, scope, client_id, jti)
+    expires_at = int(time.time()) + TokenService.ACCESS_TOKEN_TTL
+    if reuse:
+        reuse_window = TokenService.ACCESS_TOKEN_TTL - current_app.config['CLIENT_CREDENTIALS_MIN_REMAINING']
+        if reuse_window > 0:
+            client_credentials_tokens.set(
+                cache_key,
+                {"access_token": access_token, "expires_at": expires_at, "jti": jti},
+                reuse_window
+            )
+
+    audit("token_issued", client_id=client_id, grant_type="client_credentials", scope=scope)
+    return jsonify({
+        "access_token": access_token,
+        "token_type": "Bearer",
+        "expires_in": TokenService.ACCESS_TOKEN_TTL,
+        "scope": scope
+    })
+
+def handle_token_exchange_grant(client: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    """Handle token exchange (RFC 8693): swap an access token for a narrower one for the next hop"""
+    client_id = client["client_id"]
+    policy = get_client_policy(client_id)
+    if TOKEN_EXCHANGE_GRANT not in policy.grant_types:
+        return create_error_response("unauthorized_client", "Client is not allowed to exchange tokens")
+
+    subject_token = request.form.get("subject_token")
+    if not subject_token or not request.form.get("subject_token_type"):
+        return create_error_response("invalid_request", "Missing subject_token or subject_token_type")
+    if request.form["subject_token_type"] != ACCESS_TOKEN_TYPE:
+        return create_error_response("invalid_request", "Only access tokens can be exchanged")
+    requested_type = request.form.get("requested_token_type")
+    if requested_type and requested_type != ACCESS_TOKEN_TYPE:
+        return create_error_response("invalid_request", "Only access tokens can be issued")
+
+    try:
+        with phase("token_verify"):
+            claims = verify_bearer_token(subject_token)
+    except Exception:
+        claims = None
+    # Unlike bearer calls, no expiry grace: the derived token must not outlive its subject
+    if (
+        claims is None or not is_access_token(claims)
+        or claims["exp"] <= time.time() or is_revoked(claims.get("jti"))
+    ):
+        return create_error_response("invalid_grant", "Subject token is invalid, expired or revoked")
+    # A token addressed to someone else cannot be re-addressed by exchanging it
+    subject_audience = claims.get("aud")
+    if subject_audience is not None and client_id not in (
+        subject_audience if isinstance(subject_audience, list) else [subject_audience]
+    ):
+        return create_error_response("invalid_grant", "Subject token is not addressed to this client")
+
+    # Both the subject token and the client's registration bound the scope
+    allowed = policy.scopes.intersection(claims["scope"].split())
+    requested = request.form.get("scope")
+    scope = canonical_scope(requested if requested else allowed)
+    if not scope or not allowed.issuperset(scope.split()):
+        return create_error_response("invalid_scope", "Requested scope exceeds the subject token's or the client's")
+    audience = request.form.get("audience") or request.form.get("resource")
+    if audience is not None and audience not in policy.exchange_audiences:
+        return create_error_response("invalid_target", "Audience is not allowed for this client")
+
+    with phase("exchange"):
+        access_token, expires_at, reused = exchange_token(
+            subject_token, claims, client_id, audience, scope,
+            current_app.config['TOKEN_EXCHANGE_MIN_REMAINING']
+        )
+    cache_requests.inc(TOKEN_EXCHANGE_HIT if reused else TOKEN_EXCHANGE_MISS)
+    audit(
+        "token_issued", user=users_by_sub.get(claims["sub"]), sub=claims["sub"], client_id=client_id,
+        grant_type=TOKEN_EXCHANGE_GRANT, scope=scope, audience=audience, reused=reused or None
+    )
+    return jsonify({
+        "access_token": access_token,
+        "issued_token_type": ACCESS_TOKEN_TYPE,
+        "token_type": "Bearer",
+        "expires_in": max(expires_at - int(time.time()), 0),
+        "scope": scope
+    })
 
-def generate_token_response(user: Dict, client_id: str, scope: str) -> Dict[str, Any]:
+def generate_token_response(
+    user: Dict,
+    client_id: str,
+    scope: str,
+    nonce: Optional[str] = None,
+    auth_time: Optional[int] = None
+) -> Dict[str, Any]:
     """Generate complete token response"""
-    id_token = TokenService.generate_id_token(user["sub"], client_id)
-    access_token = TokenService.generate_access_token(user["sub"], scope)
-    refresh_token = TokenService.generate_refresh_token(user["sub"])
+    id_token = TokenService.generate_id_token(user["sub"], client_id, nonce=nonce, auth_time=auth_time)
+    jti = secrets.token_urlsafe(16)
+    access_token = TokenService.generate_access_token(user["sub"], scope, client_id, jti)
+    refresh_token = issue_refresh_token(user["sub"], client_id, scope, current_app.config['REFRESH_TOKEN_TTL'])
 
     # Store token information
-    tokens[access_token] = {"user": user, "client_id": client_id}
-    tokens[refresh_token] = {"user": user, "client_id": client_id}
+    with phase("store"):
+        tokens[access_token] = {"user": user, "client_id": client_id, "scope": scope, "jti": jti}
+    audit(
+        "token_issued", user=users_by_sub.get(user["sub"]), sub=user["sub"], client_id=client_id,
+        grant_type=request.form.get("grant_type") if has_request_context() else None, scope=scope
+    )
 
     return {
         "access_token": access_token,
@@ -304,7 +935,62 @@ def generate_token_response(user: Dict, client_id: str, scope: str) -> Dict[str,
         "expires_in": 3600
     }
 
-@app.route("/userinfo")
+def verify_bearer_token(token: str) -> Dict[str, Any]:
+    """
+    Verify an access token, remembering the claims of recently verified tokens.
+    Raises if the token is invalid or past its lenient expiry.
+    """
+    # A token verified by one tenant's (or app's) keys says nothing about another
+    key = (get_keyring(), token)
+    claims = _verified_tokens.get(key)
+    if claims is not None and claims.get("exp", 0) + TokenService.LENIENT_LEEWAY > time.time():
+        return claims
+    claims = TokenService.decode_token_lenient(token)
+    if len(_verified_tokens) >= VERIFIED_TOKEN_CACHE_SIZE:
+        _verified_tokens.clear()
+    _verified_tokens[key] = claims
+    return claims
+
+def is_access_token(claims: Dict[str, Any]) -> bool:
+    """Refresh, ID and logout tokens share the signing key but are not bearer credentials"""
+    return claims.get("type") != "refresh" and "scope" in claims
+
+def build_userinfo_claims(user: Dict[str, Any], scope: str) -> Dict[str, Any]:
+    """Claims released for the granted scopes (OIDC Core 5.4)"""
+    claims = {"sub": user["sub"]}
+    scopes = scope.split()
+    if "profile" in scopes:
+        claims["name"] = user["name"]
+    if "email" in scopes:
+        claims["email"] = user["email"]
+        claims["email_verified"] = True
+    return claims
+
+def userinfo_response(user: Dict[str, Any], scope: str):
+    """Serve pre-encoded userinfo for (sub, scope set), honouring If-None-Match"""
+    key = (user["sub"], canonical_scope(scope))
+    version = user.get("version", 0)
+    cached = _userinfo_cache.get(key)
+    if cached is None or cached[0] != version:
+        cache_requests.inc(USERINFO_MISS)
+        body = json.dumps(build_userinfo_claims(user, key[1])).encode()
+        if len(_userinfo_cache) >= USERINFO_CACHE_SIZE:
+            _userinfo_cache.clear()
+        cached = _userinfo_cache[key] = (version, body, hashlib.sha256(body).hexdigest()[:32])
+    else:
+        cache_requests.inc(USERINFO_HIT)
+
+    _, body, etag = cached
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(body, mimetype="application/json")
+    response.set_etag(etag)
+    # Personal data: clients may keep it but must revalidate
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+@bp.route("/userinfo")
 def userinfo():
     """UserInfo endpoint"""
     auth_header = request.headers.get("Authorization", "")
@@ -314,39 +1000,17 @@ def userinfo():
     token = auth_header.replace("Bearer ", "")
     
     # First try to find token in stored tokens dictionary
-    token_data = tokens.get(token)
+    with phase("token_lookup"):
+        token_data = tokens.get(token)
     if token_data:
-        user = token_data["user"]
-        return jsonify({
-            "sub": user["sub"],
-            "name": user["name"],
-            "email": user["email"],
-            "email_verified": True
-        })
+        if is_revoked(token_data.get("jti")):
+            return create_error_response("invalid_token", "Token has been revoked", 401)
+        return userinfo_response(token_data["user"], token_data["scope"])
     
-    # If not found, try to decode the JWT token (with lenient expiration checking)
+    # If not found, verify the JWT (with lenient expiration checking)
     try:
-        decoded_token = TokenService.decode_token_lenient(token)
-        sub = decoded_token.get("sub")
-        print(f"Decoded token: {decoded_token}")
-        
-        # Find user by subject
-        user = None
-        for username, user_data in users.items():
-            if user_data["sub"] == sub:
-                user = user_data
-                break
-        
-        if not user:
-            return create_error_response("invalid_token", "User not found", 401)
-            
-        return jsonify({
-            "sub": user["sub"],
-            "name": user["name"],
-            "email": user["email"],
-            "email_verified": True
-        })
-        
+        with phase("token_verify"):
+            decoded_token = verify_bearer_token(token)
     except Exception as e:
         print(f"Token validation error: {e}")
         # Try to decode without verification for debugging
@@ -364,10 +1028,184 @@ def userinfo():
             print(f"Debug decode error: {debug_e}")
         return create_error_response("invalid_token", f"Token validation failed: {str(e)}", 401)
 
-@app.before_request
+    if not is_access_token(decoded_token):
+        return create_error_response("invalid_token", "Not an access token", 401)
+    if not is_token_active(decoded_token):
+        return create_error_response("invalid_token", "Token has been revoked", 401)
+
+    # Find user by subject
+    with phase("user_lookup"):
+        username = users_by_sub.get(decoded_token.get("sub"))
+    if not username:
+        return create_error_response("invalid_token", "User not found", 401)
+    return userinfo_response(users[username], decoded_token.get("scope", ""))
+
+@bp.route("/revoke", methods=["POST"])
+def revoke():
+    """Token revocation endpoint (RFC 7009)"""
+    client, error = authenticate_client_request()
+    if error:
+        return error
+
+    token = request.form.get("token")
+    if not token:
+        return create_error_response("invalid_request", "Missing token")
+
+    # Invalid or already expired tokens need no revocation (RFC 7009 section 2.2)
+    try:
+        claims = TokenService.decode_token_lenient(token)
+    except Exception:
+        return "", 200
+
+    # ID tokens name their client in aud rather than client_id
+    owner = claims.get("client_id", claims.get("aud"))
+    if claims.get("type") == "refresh":
+        family = refresh_families.get(claims.get("fid", ""))
+        owner = family["client_id"] if family else None
+    owners = owner if isinstance(owner, list) else [owner]
+    if owner and client["client_id"] not in owners:
+        return create_error_response("unauthorized_client", "Token was issued to another client")
+
+    with phase("revoke"):
+        revoke_token(claims)
+        tokens.pop(token, None)
+    audit("revoke", client_id=client["client_id"], sub=claims.get("sub"), token_type=claims.get("type", "access"))
+    return "", 200
+
+@bp.route("/introspect", methods=["POST"])
+def introspect():
+    """Token introspection endpoint (RFC 7662)"""
+    client, error = authenticate_client_request()
+    if error:
+        return error
+
+    token = request.form.get("token")
+    if not token:
+        return create_error_response("invalid_request", "Missing token")
+
+    try:
+        claims = TokenService.decode_token(token)
+    except Exception:
+        return jsonify({"active": False})
+    family = None
+    with phase("revocation_check"):
+        if claims.get("type") == "refresh":
+            # Fetched once: the family may be deleted between two lookups
+            family = refresh_families.get(claims.get("fid", ""))
+            active = bool(family) and family["current"] == claims.get("jti")
+        else:
+            active = is_token_active(claims)
+    if not active:
+        return jsonify({"active": False})
+
+    response = {
+        "active": True,
+        "token_type": "refresh_token" if claims.get("type") == "refresh" else "Bearer",
+        **{k: claims[k] for k in ("sub", "scope", "client_id", "exp", "iat", "iss", "jti") if k in claims}
+    }
+    if family is not None:
+        response.update(scope=family["scope"], client_id=family["client_id"])
+    return jsonify(response)
+
+@bp.route("/register", methods=["POST"])
+def register():
+    """Dynamic client registration endpoint (RFC 7591)"""
+    initial_token = current_app.config['REGISTRATION_ACCESS_TOKEN']
+    if initial_token:
+        auth_header = request.headers.get("Authorization", "")
+        token = auth_header.replace("Bearer ", "") if auth_header.startswith("Bearer ") else None
+        if not verify_admin_token(token, key=initial_token):
+            return create_error_response("invalid_token", "Initial access token required", 401)
+    elif not current_app.config['REGISTRATION_OPEN']:
+        return create_error_response("invalid_token", "Registration requires an initial access token", 401)
+
+    metadata = request.get_json(silent=True)
+    if not isinstance(metadata, dict):
+        return create_error_response("invalid_client_metadata", "Request body must be a JSON object")
+    try:
+        client = register_client(metadata, frozenset(current_app.config['REGISTRATION_SCOPES'].split()))
+    except RegistrationError as e:
+        return create_error_response(e.error, e.description)
+    return jsonify(client), 201
+
+@bp.route("/admin/clients/import", methods=["POST"])
+def admin_import_clients():
+    """
+    Bulk-register clients from an NDJSON request body.
+    Streams one NDJSON result (credentials or error) per input line.
+    """
+    if not verify_admin_token(request.headers.get("X-Admin-Token"), key=current_app.config['ADMIN_TOKEN']):
+        return create_error_response("forbidden", "Admin token required", 403)
+
+    batch_size = request.args.get("batch_size", type=int) or current_app.config['CLIENT_IMPORT_BATCH_SIZE']
+    results = import_clients(request.stream, batch_size=max(batch_size, 1))
+    body = (json.dumps(result) + "\n" for result in results)
+    return current_app.response_class(stream_with_context(body), mimetype="application/x-ndjson")
+
+@bp.before_app_request
 def cleanup():
     """Cleanup expired tokens before each request"""
     cleanup_expired_tokens()
 
+def clear_caches(app: Flask) -> None:
+    """Drop the bounded in-process response caches (memory diagnostics, tests)"""
+    _verified_tokens.clear()
+    _userinfo_cache.clear()
+    derived_tokens.clear()
+    app.extensions["refresh_flight"].purge_expired()
+
+def warm_up(app: Flask) -> None:
+    """
+    Do the per-process work that would otherwise land on the first requests.
+    Raises RuntimeError if key material is missing.
+    """
+    app.extensions["keyring"] = KeyRing.from_config(app.config)
+    for template in ("login.html", "consent.html", "device.html"):
+        app.jinja_env.get_template(template)
+    compile_client_policies()
+    issuer = app.config['ISSUER_URL'].rstrip("/")
+    app.extensions["discovery"][issuer + "/"] = build_discovery_document(issuer + "/", issuer)
+
+def create_app(config: object = Config) -> Flask:
+    """
+    Build and warm up the provider application.
+    With gunicorn --preload the warmed state is shared copy-on-write by workers.
+    """
+    app = Flask(__name__)
+    app.config.from_object(config)
+    app.secret_key = app.config['SECRET_KEY']  # Required for session management
+    # Concurrent refresh grants for the same token share one signing operation
+    app.extensions["refresh_flight"] = SingleFlight(window=app.config['REFRESH_COALESCE_WINDOW'])
+    app.extensions["discovery"] = {}
+
+    # Registered first so profiles cover the other request hooks too
+    init_profiler(app)
+    if app.config['METRICS_ENABLED']:
+        init_metrics(app)
+    if app.config['SERVER_TIMING_ENABLED']:
+        init_server_timing(app)
+    init_debug_stats(app, STORES)
+    init_audit(app)
+    app.extensions["tenants"] = TenantRegistry(
+        app.config['TENANTS_DIR'],
+        app.config['TENANT_ISSUER_TEMPLATE'],
+        app.config['ISSUER_URL'],
+        app.config['TENANT_CACHE_SIZE']
+    )
+    # The pool starts its threads on first use, so preloading before fork is safe
+    app.extensions["logout_dispatcher"] = LogoutDispatcher(
+        app.config['BACKCHANNEL_LOGOUT_WORKERS'],
+        app.config['BACKCHANNEL_LOGOUT_TIMEOUT'],
+        app.config['BACKCHANNEL_LOGOUT_RETRIES']
+    )
+    app.extensions["held_device_polls"] = threading.BoundedSemaphore(max(app.config['DEVICE_POLL_MAX_HELD'], 0))
+    app.register_blueprint(bp)
+    app.register_blueprint(bp, url_prefix="/t/<tenant_id>", name="tenant")
+
+    warm_up(app)
+    return app
+
+app = create_app()
+
 if __name__ == '__main__':
     app.run(debug=Config.DEBUG)
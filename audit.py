@@ -0,0 +1,335 @@
+# flask-oidc-provider/audit.py
+
+"""
+Append-only audit log.
+
+Request handlers call audit(event, ...), which appends the event to an
+in-memory ring buffer and returns without touching the disk. A background
+writer drains everything buffered so far, writes it with a single write()
+and makes it durable with a single fsync (group commit), so the cost of an
+fsync is shared by all events that arrived while the previous one ran.
+
+Events are NDJSON lines, timestamp first:
+
+    {"ts":1760000000.123,"event":"login","outcome":"success","user":"alice","ip":"10.0.0.5"}
+
+and go to segments named AUDIT_DIR/audit-<first event ms>-<pid>.ndjson; a
+new segment is started when the current one reaches AUDIT_SEGMENT_BYTES or
+AUDIT_SEGMENT_SECONDS. Each worker process writes its own segments.
+
+If the buffer fills up (the disk cannot keep up) the oldest unwritten events
+are dropped, and if a write fails its batch is lost; both are counted in
+oidc_audit_events_dropped_total by reason.
+
+Query segments with the reader, which memory-maps them and binary-searches
+the time range:
+
+    python audit.py --since 2026-10-01T00:00 --user alice
+    python audit.py --client client123 --event token_failed --limit 100
+"""
+
+import argparse
+import atexit
+import heapq
+import json
+import mmap
+import os
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+from flask import Flask, current_app, has_request_context, request
+
+from config import Config
+from metrics import audit_events_dropped, audit_fsync_duration
+from tenants import current_tenant_id
+
+SEGMENT_PREFIX = "audit-"
+SEGMENT_SUFFIX = ".ndjson"
+
+
+class AuditLog:
+    """Buffered, group-committed writer for one process"""
+
+    def __init__(
+        self,
+        directory: str,
+        buffer_size: int = 65536,
+        segment_bytes: int = 64 * 1024 * 1024,
+        segment_seconds: float = 3600
+    ):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self._buffer: Deque[bytes] = deque(maxlen=buffer_size)
+        self._cond = threading.Condition()
+        # Events recorded / taken by the writer / made durable so far, for flush()
+        self._recorded = 0
+        self._handled = 0
+        self._durable = 0
+        self._pid: Optional[int] = None
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        self._fd: Optional[int] = None
+        self._segment_size = 0
+        self._segment_started = 0.0
+
+    def _start(self) -> None:
+        # Started lazily so each (forked) worker runs its own writer
+        self._pid = os.getpid()
+        self._fd = None
+        self._stopping = False
+        os.makedirs(self.directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, event: str, **fields: Any) -> None:
+        """Buffer an event; never blocks on I/O"""
+        body = json.dumps({"event": event, **fields}, separators=(",", ":"))
+        with self._cond:
+            if self._pid != os.getpid():
+                self._start()
+            if len(self._buffer) == self._buffer.maxlen:
+                audit_events_dropped.inc(("buffer_full",))
+            # Stamped under the lock so lines are written in time order, which the reader relies on
+            self._buffer.append(f'{{"ts":{round(time.time(), 6)},{body[1:]}\n'.encode())
+            self._recorded += 1
+            self._cond.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every event recorded so far is on disk.
+        Returns False on timeout or when the write that should have made them durable failed.
+        """
+        with self._cond:
+            target = self._recorded
+            return self._cond.wait_for(lambda: self._handled >= target, timeout) and self._durable >= target
+
+    def close(self) -> None:
+        """Write out buffered events and stop the writer"""
+        with self._cond:
+            if self._thread is None or self._pid != os.getpid():
+                return
+            self._stopping = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._thread = None
+        self._pid = None
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._buffer or self._stopping)
+                if not self._buffer and self._stopping:
+                    break
+                batch = list(self._buffer)
+                self._buffer.clear()
+                # Events dropped from a full buffer are covered by this batch as well
+                handled = self._recorded
+            try:
+                self._write(b"".join(batch), _line_ts(batch[0]))
+                durable = True
+            except OSError as e:
+                print(f"Audit write failed, {len(batch)} events lost: {e}")
+                audit_events_dropped.inc(("write_failed",), len(batch))
+                durable = False
+            with self._cond:
+                self._handled = handled
+                if durable:
+                    self._durable = handled
+                self._cond.notify_all()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _open_segment(self, now: float) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+        name = f"{SEGMENT_PREFIX}{int(now * 1000):013d}-{os.getpid()}{SEGMENT_SUFFIX}"
+        self._fd = os.open(os.path.join(self.directory, name), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o640)
+        self._segment_size = 0
+        self._segment_started = now
+        # Make the new directory entry itself durable
+        dir_fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+    def _write(self, data: bytes, now: float) -> None:
+        # `now` is the first event's timestamp, which names the segment
+        if (
+            self._fd is None
+            or self._segment_size >= self.segment_bytes
+            or now - self._segment_started >= self.segment_seconds
+        ):
+            self._open_segment(now)
+        view = memoryview(data)
+        while view:
+            written = os.write(self._fd, view)
+            view = view[written:]
+        self._segment_size += len(data)
+        start = time.perf_counter()
+        os.fsync(self._fd)
+        audit_fsync_duration.observe(time.perf_counter() - start)
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+
+def init_audit(app: Flask) -> None:
+    """Create the audit log if AUDIT_ENABLED is set"""
+    if not app.config.get("AUDIT_ENABLED"):
+        return
+    app.extensions["audit"] = AuditLog(
+        app.config["AUDIT_DIR"],
+        app.config["AUDIT_BUFFER_SIZE"],
+        app.config["AUDIT_SEGMENT_BYTES"],
+        app.config["AUDIT_SEGMENT_SECONDS"]
+    )
+
+
+def audit(event: str, outcome: str = "success", **fields: Any) -> None:
+    """
+    Record an audit event for the current app; a no-op when auditing is disabled.
+    Fields that are None are left out. Inside a request the client IP is added.
+    """
+    log = current_app.extensions.get("audit")
+    if log is None:
+        return
+    fields = {k: v for k, v in fields.items() if v is not None}
+    tenant_id = current_tenant_id()
+    if tenant_id:
+        fields["tenant"] = tenant_id
+    if has_request_context():
+        fields.setdefault("ip", request.remote_addr)
+    log.record(event, outcome=outcome, **fields)
+
+
+# Reader
+
+def _line_ts(line: bytes) -> float:
+    # Lines start with {"ts":<number>, so the timestamp parses without the rest
+    return float(line[6:line.index(b",", 6)])
+
+
+def _segments(directory: str, since: Optional[float], until: Optional[float]) -> List[str]:
+    paths = []
+    for name in os.listdir(directory):
+        if not (name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)):
+            continue
+        path = os.path.join(directory, name)
+        started = int(name[len(SEGMENT_PREFIX):].split("-", 1)[0]) / 1000
+        # Segments start after `until`, or were last written before `since`, cannot match
+        if until is not None and started > until:
+            continue
+        if since is not None and os.path.getmtime(path) < since:
+            continue
+        paths.append(path)
+    return sorted(paths)
+
+
+def _first_at_or_after(data: mmap.mmap, since: float) -> int:
+    """Offset of the first line with ts >= since (lines are in time order)"""
+    # lo is always the start of a line
+    lo, hi = 0, len(data)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        newline = data.rfind(b"\n", lo, mid)
+        start = lo if newline == -1 else newline + 1
+        end = data.find(b"\n", start)
+        if end == -1:
+            # Partially written tail
+            hi = start
+        elif _line_ts(data[start:end]) < since:
+            lo = end + 1
+        else:
+            hi = start
+    return lo
+
+
+def read_segment(
+    path: str,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    needles: List[bytes] = ()
+) -> Iterator[Dict[str, Any]]:
+    """Yield the events of one segment in [since, until] whose lines contain every needle"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            data.seek(_first_at_or_after(data, since) if since is not None else 0)
+            for line in iter(data.readline, b""):
+                if not line.endswith(b"\n"):
+                    break  # partially written tail
+                if until is not None and _line_ts(line) > until:
+                    break
+                # Cheap byte match before parsing
+                if all(needle in line for needle in needles):
+                    yield json.loads(line)
+
+
+def query(
+    directory: str,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    user: Optional[str] = None,
+    client_id: Optional[str] = None,
+    event: Optional[str] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Events matching every given filter, in time order across all segments.
+    Args:
+        since/until: Unix time range (inclusive)
+        user: Username or subject
+        client_id: Client the event concerns
+        event: Event name, e.g. "login" or "token_issued"
+    """
+    needles = [json.dumps(value).encode() for value in (user, client_id, event) if value is not None]
+
+    def matches(entry: Dict[str, Any]) -> bool:
+        return (
+            (user is None or user in (entry.get("user"), entry.get("sub")))
+            and (client_id is None or entry.get("client_id") == client_id)
+            and (event is None or entry.get("event") == event)
+        )
+
+    readers = [read_segment(path, since, until, needles) for path in _segments(directory, since, until)]
+    return (entry for entry in heapq.merge(*readers, key=lambda e: e["ts"]) if matches(entry))
+
+
+def _parse_time(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Query the provider's audit log")
+    parser.add_argument("--dir", default=Config.AUDIT_DIR, help="Audit directory (default: AUDIT_DIR)")
+    parser.add_argument("--since", type=_parse_time, help="Start time (unix seconds or ISO 8601)")
+    parser.add_argument("--until", type=_parse_time, help="End time (unix seconds or ISO 8601)")
+    parser.add_argument("--user", help="Username or subject")
+    parser.add_argument("--client", help="Client id")
+    parser.add_argument("--event", help="Event name")
+    parser.add_argument("--limit", type=int, help="Stop after this many events")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.dir):
+        print(f"No audit log at {args.dir}", file=sys.stderr)
+        return 1
+    for count, entry in enumerate(query(args.dir, args.since, args.until, args.user, args.client, args.event)):
+        if args.limit is not None and count >= args.limit:
+            break
+        sys.stdout.write(json.dumps(entry, separators=(",", ":")) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
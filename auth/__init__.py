@@ -1,7 +1,16 @@
 from .client_auth import authenticate_client
 from .pkce import verify_code_challenge, create_code_verifier
 from .token import create_jwt, validate_token
-from .registration import register_client, get_client
+from .registration import register_client, get_client, import_clients
+from .consent import remember_consent, has_consent, revoke_consent
+from .refresh import issue_refresh_token, rotate_refresh_token, revoke_family
+from .codes import seal_code, open_code
+from .revocation import revoke_token, is_revoked, is_token_active
+from .admin import sign_admin_value, verify_admin_signature, verify_admin_token
+from .verifier import JWKSVerifier, require_token
+from .device import start_device_authorization, complete_device_authorization, poll_device_code
+from .logout import LogoutDispatcher, record_rp_session, pop_rp_sessions
+from .exchange import exchange_token
 
 __all__ = [
     'authenticate_client',
@@ -10,5 +19,29 @@ __all__ = [
     'create_jwt',
     'validate_token',
     'register_client',
-    'get_client'
+    'get_client',
+    'import_clients',
+    'remember_consent',
+    'has_consent',
+    'revoke_consent',
+    'issue_refresh_token',
+    'rotate_refresh_token',
+    'revoke_family',
+    'seal_code',
+    'open_code',
+    'revoke_token',
+    'is_revoked',
+    'is_token_active',
+    'sign_admin_value',
+    'verify_admin_signature',
+    'verify_admin_token',
+    'JWKSVerifier',
+    'require_token',
+    'start_device_authorization',
+    'complete_device_authorization',
+    'poll_device_code',
+    'LogoutDispatcher',
+    'record_rp_session',
+    'pop_rp_sessions',
+    'exchange_token'
 ]
\ No newline at end of file
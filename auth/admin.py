@@ -0,0 +1,37 @@
+import hashlib
+import hmac
+import time
+from typing import Optional
+from config import Config
+
+def sign_admin_value(value: str, key: Optional[str] = None) -> str:
+    """
+    HMAC-SHA256 a value with the admin token.
+    Returns the hex digest.
+    """
+    key = key if key is not None else Config.ADMIN_TOKEN
+    return hmac.new(key.encode(), value.encode(), hashlib.sha256).hexdigest()
+
+def verify_admin_signature(header: Optional[str], max_age: int = 60, key: Optional[str] = None) -> bool:
+    """
+    Verify a "<unix timestamp>:<hex signature>" admin header.
+    Returns False if admin access is disabled (no ADMIN_TOKEN), the
+    signature does not match or the timestamp is older than max_age seconds.
+    """
+    key = key if key is not None else Config.ADMIN_TOKEN
+    if not key or not header or ":" not in header:
+        return False
+
+    timestamp, signature = header.split(":", 1)
+    if not timestamp.isdigit() or abs(time.time() - int(timestamp)) > max_age:
+        return False
+    return hmac.compare_digest(sign_admin_value(timestamp, key), signature)
+
+def verify_admin_token(token: Optional[str], key: Optional[str] = None) -> bool:
+    """
+    Check a bearer admin token in constant time.
+    """
+    key = key if key is not None else Config.ADMIN_TOKEN
+    if not key or not token:
+        return False
+    return hmac.compare_digest(key.encode(), token.encode())
@@ -1,18 +1,78 @@
-from typing import Optional, Dict
+from typing import Dict, FrozenSet, MutableMapping, NamedTuple, Optional, Tuple
 from models import clients  # Import clients from models
+from tenants import current_tenant
+
+class ClientPolicy(NamedTuple):
+    """Pre-computed lookup sets for a client's registration"""
+    redirect_uris: FrozenSet[str]
+    grant_types: FrozenSet[str]
+    scopes: FrozenSet[str]
+    exchange_audiences: FrozenSet[str]
+
+# Compiled policies (client_id as key), per worker: compiled on first use from the shared registry
+client_policies: Dict[str, ClientPolicy] = {}
+
+def client_registry() -> Tuple[MutableMapping[str, Dict], Dict[str, ClientPolicy]]:
+    """
+    Client records and compiled policies of the current tenant.
+    Returns the default registry outside any tenant.
+    """
+    tenant = current_tenant()
+    if tenant is not None:
+        return tenant.clients, tenant.client_policies
+    return clients, client_policies
 
 def authenticate_client(client_id: str, client_secret: str) -> bool:
     """
     Authenticate a client using client_id and client_secret.
     Returns True if authentication successful, False otherwise.
     """
-    if client_id in clients:
-        return clients[client_id]["client_secret"] == client_secret
-    return False
+    registry, _ = client_registry()
+    client = registry.get(client_id)
+    return client is not None and client["client_secret"] == client_secret
 
 def get_client_config(client_id: str) -> Optional[Dict]:
     """
     Get client configuration.
     Returns client config dict if found, None otherwise.
     """
-    return clients.get(client_id)
\ No newline at end of file
+    registry, _ = client_registry()
+    return registry.get(client_id)
+
+def compile_client_policy(client: Dict) -> ClientPolicy:
+    """
+    Compile a client registration into a ClientPolicy and cache it.
+    """
+    policy = ClientPolicy(
+        redirect_uris=frozenset(client.get("redirect_uris", [])),
+        grant_types=frozenset(client.get("grant_types", [])),
+        scopes=frozenset(client.get("scope", "").split()),
+        exchange_audiences=frozenset(client.get("token_exchange_audiences", []))
+    )
+    _, policies = client_registry()
+    policies[client["client_id"]] = policy
+    return policy
+
+def compile_client_policies() -> int:
+    """
+    Compile policies for every registered client.
+    Returns the number of clients compiled.
+    """
+    registry, _ = client_registry()
+    for client in list(registry.values()):
+        compile_client_policy(client)
+    return len(registry)
+
+def get_client_policy(client_id: str) -> Optional[ClientPolicy]:
+    """
+    Get the compiled policy for a client, compiling it on first use.
+    Returns None if the client is unknown.
+    """
+    registry, policies = client_registry()
+    policy = policies.get(client_id)
+    if policy is None:
+        client = registry.get(client_id)
+        if client is None:
+            return None
+        policy = compile_client_policy(client)
+    return policy
@@ -0,0 +1,76 @@
+import base64
+import binascii
+import hashlib
+import json
+import os
+import time
+from functools import lru_cache
+from typing import Any, Dict, Optional
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from store import create_store
+
+# Digests of redeemed sealed codes, each kept only until its code expires
+redeemed_codes = create_store("redeemed_codes")
+
+# Binds ciphertexts to their purpose; bump to invalidate all outstanding codes
+CODE_AAD = b"oidc-authorization-code-v1"
+NONCE_SIZE = 12
+
+@lru_cache(maxsize=4)
+def _aead(secret: str) -> AESGCM:
+    """
+    AES-256-GCM cipher for a configured secret.
+    A 32-byte base64url key is used as is; anything else is stretched with HKDF.
+    """
+    try:
+        key = base64.urlsafe_b64decode(secret + "=" * (-len(secret) % 4))
+    except (binascii.Error, ValueError):
+        key = b""
+    if len(key) != 32:
+        key = HKDF(
+            algorithm=hashes.SHA256(), length=32, salt=None, info=b"authorization-code"
+        ).derive(secret.encode())
+    return AESGCM(key)
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+def seal_code(claims: Dict[str, Any], ttl: int, secret: str) -> str:
+    """
+    Encrypt and authenticate authorization code claims into the code itself.
+    Args:
+        claims: Everything the token endpoint needs to redeem the code
+        ttl: Code lifetime in seconds
+        secret: Sealing key shared by every node
+    Returns:
+        URL-safe code string
+    """
+    payload = json.dumps({**claims, "exp": int(time.time()) + ttl}, separators=(",", ":")).encode()
+    nonce = os.urandom(NONCE_SIZE)
+    return _b64encode(nonce + _aead(secret).encrypt(nonce, payload, CODE_AAD))
+
+def open_code(code: str, secret: str) -> Optional[Dict[str, Any]]:
+    """
+    Decrypt a sealed code and mark it redeemed.
+    Returns the claims, or None if the code is forged, expired or replayed.
+    """
+    try:
+        blob = base64.urlsafe_b64decode(code + "=" * (-len(code) % 4))
+        # The decoder tolerates padding and junk; only the canonical spelling is a code
+        if _b64encode(blob) != code:
+            return None
+        claims = json.loads(_aead(secret).decrypt(blob[:NONCE_SIZE], blob[NONCE_SIZE:], CODE_AAD))
+    except (binascii.Error, ValueError, InvalidTag):
+        return None
+
+    remaining = claims.pop("exp", 0) - int(time.time())
+    if remaining <= 0:
+        return None
+    # Single use: only the first redemption of a nonce gets through
+    digest = hashlib.sha256(blob[:NONCE_SIZE]).hexdigest()[:32]
+    if not redeemed_codes.add(digest, True, remaining + 1):
+        return None
+    return claims
@@ -0,0 +1,53 @@
+from typing import Iterable, Optional, Union
+from config import Config
+from store import create_store
+
+# Consent grants keyed by (user, client_id, canonical scope set)
+consent_grants = create_store("consent_grants")
+
+def canonical_scope(scope: Union[str, Iterable[str]]) -> str:
+    """
+    Normalize a scope string or list into a sorted, de-duplicated string.
+    """
+    if isinstance(scope, str):
+        scope = scope.split()
+    return ' '.join(sorted({s.strip() for s in scope if s.strip()}))
+
+def _grant_key(user: str, client_id: str, scope: str) -> str:
+    return f"{user}|{client_id}|{canonical_scope(scope)}"
+
+def _index_key(user: str, client_id: str) -> str:
+    return f"{user}|{client_id}"
+
+def remember_consent(user: str, client_id: str, scope: str, ttl: Optional[int] = None) -> None:
+    """
+    Record that user approved client_id for scope.
+    Args:
+        user: Username that granted consent
+        client_id: Client the consent applies to
+        scope: Approved scopes
+        ttl: Grant lifetime in seconds (default: Config.CONSENT_TTL)
+    """
+    ttl = ttl or Config.CONSENT_TTL
+    scope = canonical_scope(scope)
+    consent_grants.set(_grant_key(user, client_id, scope), True, ttl)
+
+    # Index the scope sets per (user, client) so they can be revoked together
+    index = consent_grants.get(_index_key(user, client_id)) or []
+    if scope not in index:
+        index.append(scope)
+    consent_grants.set(_index_key(user, client_id), index, ttl)
+
+def has_consent(user: str, client_id: str, scope: str) -> bool:
+    """
+    Check whether user has an unexpired consent for exactly this scope set.
+    """
+    return bool(consent_grants.get(_grant_key(user, client_id, scope)))
+
+def revoke_consent(user: str, client_id: str) -> int:
+    """
+    Revoke all remembered consents user gave to client_id.
+    Returns the number of grants removed.
+    """
+    index = consent_grants.pop(_index_key(user, client_id)) or []
+    return sum(consent_grants.delete(_grant_key(user, client_id, scope)) for scope in index)
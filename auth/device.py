@@ -0,0 +1,156 @@
+import hashlib
+import secrets
+import time
+from typing import Any, Dict, Optional, Tuple
+from store import create_notifier, create_store
+from tenants import current_tenant_id
+
+DEVICE_CODE_GRANT = "urn:ietf:params:oauth:grant-type:device_code"
+
+# RFC 8628 6.1: base-20 without vowels, so codes cannot spell words
+USER_CODE_ALPHABET = "BCDFGHJKLMNPQRSTVWXZ"
+USER_CODE_LENGTH = 8
+# RFC 8628 3.5: every slow_down adds 5 seconds to the polling interval
+SLOW_DOWN_STEP = 5
+
+# Pending device authorizations (sha256(device_code): record); the device code itself is never stored
+device_codes = create_store("device_codes")
+# User codes awaiting approval (user code: device code digest)
+user_codes = create_store("user_codes")
+# Polling schedule per device code (digest: {interval, next_poll})
+device_polls = create_store("device_polls")
+# Wakes long-polling token requests when their device code is approved or denied
+device_decisions = create_notifier("device_decisions")
+
+def _digest(device_code: str) -> str:
+    return hashlib.sha256(device_code.encode()).hexdigest()
+
+def normalize_user_code(user_code: str) -> str:
+    """Uppercase a user code and drop separators and other typed noise"""
+    return "".join(c for c in user_code.upper() if c in USER_CODE_ALPHABET)
+
+def format_user_code(user_code: str) -> str:
+    half = len(user_code) // 2
+    return f"{user_code[:half]}-{user_code[half:]}"
+
+def start_device_authorization(client_id: str, scope: str, ttl: int, interval: int) -> Dict[str, Any]:
+    """
+    Create a device code and the user code shown on the device.
+    Args:
+        client_id: Client the device code is bound to
+        scope: Canonical scope being requested
+        ttl: Lifetime of both codes in seconds
+        interval: Minimum seconds between token polls
+    Returns:
+        Dict with device_code, user_code, expires_in and interval
+    """
+    device_code = secrets.token_urlsafe(32)
+    key = _digest(device_code)
+    while True:
+        user_code = "".join(secrets.choice(USER_CODE_ALPHABET) for _ in range(USER_CODE_LENGTH))
+        if user_codes.add(user_code, key, ttl):
+            break
+
+    device_codes.set(key, {
+        "client_id": client_id,
+        "scope": scope,
+        "user_code": user_code,
+        "status": "pending",
+        "expires_at": int(time.time()) + ttl,
+        "tenant": current_tenant_id()
+    }, ttl)
+    device_polls.set(key, {"interval": interval, "next_poll": 0}, ttl)
+    return {
+        "device_code": device_code,
+        "user_code": format_user_code(user_code),
+        "expires_in": ttl,
+        "interval": interval
+    }
+
+def get_device_request(user_code: str) -> Optional[Dict[str, Any]]:
+    """
+    Look up the pending device authorization a user code belongs to.
+    Returns None if the code is unknown, expired or already used.
+    """
+    key = user_codes.get(normalize_user_code(user_code))
+    record = device_codes.get(key) if key else None
+    if not record or record["status"] != "pending" or record.get("tenant") != current_tenant_id():
+        return None
+    return record
+
+def complete_device_authorization(user_code: str, username: str, auth_time: int, approved: bool) -> bool:
+    """
+    Approve or deny a device authorization on behalf of a logged-in user and
+    wake the device's pending token request.
+    Returns False if the user code is unknown, expired or already used.
+    """
+    # User codes are single-use
+    key = user_codes.pop(normalize_user_code(user_code))
+    record = device_codes.get(key) if key else None
+    if not record or record["status"] != "pending" or record.get("tenant") != current_tenant_id():
+        return False
+
+    record.update(status="approved" if approved else "denied", user=username, auth_time=auth_time)
+    device_codes.set(key, record, max(record["expires_at"] - int(time.time()), 1))
+    device_decisions.notify(key)
+    return True
+
+def poll_device_code(
+    device_code: str,
+    client_id: str,
+    wait: float = 0,
+    back_off_to: int = 0
+) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """
+    Handle one token request for a device code.
+    While the authorization is pending the request is held for up to `wait`
+    seconds and answered as soon as the user decides. Polls that arrive
+    before the interval has passed since the previous answer get slow_down.
+    A pending poll whose interval is below `back_off_to` seconds gets
+    slow_down as well, so devices that cannot be held poll less often.
+    Returns:
+        Tuple of (RFC 8628 error code, None) or (None, approved record)
+    """
+    key = _digest(device_code)
+    record = device_codes.get(key)
+    if not record or record["client_id"] != client_id or record.get("tenant") != current_tenant_id():
+        return "invalid_grant", None
+
+    now = time.time()
+    ttl = max(record["expires_at"] - int(now), 1)
+    poll = device_polls.get(key) or {"interval": 0, "next_poll": 0}
+    if now < poll["next_poll"]:
+        poll["interval"] += SLOW_DOWN_STEP
+        device_polls.set(key, {"interval": poll["interval"], "next_poll": now + poll["interval"]}, ttl)
+        return "slow_down", None
+
+    if record["status"] == "pending" and wait > 0:
+        wait = min(wait, record["expires_at"] - now)
+        # Concurrent polls while this one is held are too early as well
+        device_polls.set(key, {"interval": poll["interval"], "next_poll": now + wait + poll["interval"]}, ttl)
+        with device_decisions.subscribe(key) as decided:
+            record = device_codes.get(key)
+            if record and record["status"] == "pending":
+                decided.wait(wait)
+                record = device_codes.get(key)
+        if not record:
+            return "expired_token", None
+
+    pending = record["status"] == "pending"
+    backing_off = pending and poll["interval"] < back_off_to
+    if backing_off:
+        poll["interval"] = min(poll["interval"] + SLOW_DOWN_STEP, back_off_to)
+    # The interval runs from when this answer is sent
+    device_polls.set(key, {"interval": poll["interval"], "next_poll": time.time() + poll["interval"]}, ttl)
+    if backing_off:
+        return "slow_down", None
+    if pending:
+        return "authorization_pending", None
+
+    # Approved and denied codes are answered once
+    if device_codes.pop(key) is None:
+        return "invalid_grant", None
+    device_polls.delete(key)
+    if record["status"] == "denied":
+        return "access_denied", None
+    return None, record
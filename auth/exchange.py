@@ -0,0 +1,56 @@
+import hashlib
+import secrets
+import time
+from typing import Any, Dict, Optional, Tuple
+from cache import LRUCache
+from config import Config
+from tenants import current_tenant_id
+from .revocation import is_revoked
+from .token import TokenService
+
+TOKEN_EXCHANGE_GRANT = "urn:ietf:params:oauth:grant-type:token-exchange"
+ACCESS_TOKEN_TYPE = "urn:ietf:params:oauth:token-type:access_token"
+
+# Recently derived tokens ((tenant, sha256(subject token), client, audience, scope): (token, exp, jti)),
+# so every hop of a fan-out exchanging the same token gets one signed result
+derived_tokens = LRUCache(Config.TOKEN_EXCHANGE_CACHE_SIZE)
+
+def exchange_token(
+    subject_token: str,
+    subject_claims: Dict[str, Any],
+    client_id: str,
+    audience: Optional[str],
+    scope: str,
+    min_remaining: int = 0
+) -> Tuple[str, int, bool]:
+    """
+    Derive an access token for the next hop from a verified subject token.
+    Args:
+        subject_token: The incoming access token
+        subject_claims: Its verified, unexpired and unrevoked claims
+        client_id: Client making the exchange
+        audience: Intended recipient of the derived token, if any
+        scope: Canonical scope, a subset of the subject token's
+        min_remaining: Only reuse a cached token with more seconds left than this
+    Returns:
+        Tuple of (access token, expiry, reused)
+    """
+    key = (
+        current_tenant_id(),
+        hashlib.sha256(subject_token.encode()).digest(),
+        client_id,
+        audience,
+        scope
+    )
+    cached = derived_tokens.get(key)
+    if cached is not None:
+        access_token, expires_at, jti = cached
+        if expires_at - time.time() > min_remaining and not is_revoked(jti):
+            return access_token, expires_at, True
+        derived_tokens.pop(key)
+
+    jti = secrets.token_urlsafe(16)
+    access_token = TokenService.generate_exchanged_token(subject_claims, scope, client_id, audience, jti)
+    expires_at = min(int(time.time()) + TokenService.ACCESS_TOKEN_TTL, subject_claims["exp"])
+    derived_tokens.set(key, (access_token, expires_at, jti))
+    return access_token, expires_at, False
@@ -0,0 +1,116 @@
+import random
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, List, Optional, Tuple
+from config import Config
+from store import create_store
+from tenants import current_tenant_id
+
+# Clients each user has signed in to (user: {client_id: signed-in-at}), for logout fan-out
+rp_sessions = create_store("rp_sessions")
+
+def _user_key(username: str) -> str:
+    tenant_id = current_tenant_id()
+    return f"{tenant_id}/{username}" if tenant_id else username
+
+def record_rp_session(username: str, client_id: str, signed_in_at: int, ttl: Optional[int] = None) -> None:
+    """
+    Remember that username signed in to client_id.
+    Args:
+        ttl: How long the entry is kept (default: Config.REFRESH_TOKEN_TTL,
+            the longest a client can keep the session alive)
+    """
+    key = _user_key(username)
+    sessions = rp_sessions.get(key) or {}
+    sessions[client_id] = signed_in_at
+    rp_sessions.set(key, sessions, ttl or Config.REFRESH_TOKEN_TTL)
+
+def pop_rp_sessions(username: str) -> Dict[str, int]:
+    """
+    Forget and return every client username has signed in to.
+    """
+    return rp_sessions.pop(_user_key(username)) or {}
+
+class LogoutDispatcher:
+    """
+    Delivers back-channel logout tokens concurrently.
+    Deliveries run on a fixed-size thread pool sharing one pooled HTTP
+    session; failed deliveries are retried with exponential backoff and
+    jitter without holding a worker while they wait.
+    """
+
+    def __init__(self, workers: int = 64, timeout: float = 5.0, retries: int = 3, backoff: float = 0.5):
+        """
+        Args:
+            workers: Maximum concurrent deliveries (also the connection pool size per host)
+            timeout: Default per-client HTTP timeout in seconds
+            retries: Attempts after the first one before a delivery is dropped
+            backoff: Delay before the first retry in seconds; doubles per attempt
+        """
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="backchannel-logout")
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+    def _post(self, uri: str, logout_token: str, timeout: float) -> None:
+        response = self._session.post(uri, data={"logout_token": logout_token}, timeout=timeout)
+        # Section 2.8: 200 or 204 on success; anything else may be retried
+        response.raise_for_status()
+
+    def _attempt(self, uri: str, logout_token: str, timeout: float, attempt: int, done: Future) -> None:
+        try:
+            self._post(uri, logout_token, timeout)
+        except Exception as e:
+            if attempt >= self.retries:
+                print(f"Back-channel logout to {uri} failed after {attempt + 1} attempts: {e}")
+                done.set_result(False)
+                return
+            delay = self.backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+            timer = threading.Timer(delay, self._submit, (uri, logout_token, timeout, attempt + 1, done))
+            timer.daemon = True
+            timer.start()
+            return
+        done.set_result(True)
+
+    def _submit(self, uri: str, logout_token: str, timeout: float, attempt: int, done: Future) -> None:
+        try:
+            self._pool.submit(self._attempt, uri, logout_token, timeout, attempt, done)
+        except RuntimeError:
+            # Pool shut down while a retry was pending
+            done.set_result(False)
+
+    def dispatch(self, deliveries: Iterable[Tuple[str, str, Optional[float]]]) -> List[Future]:
+        """
+        Start delivering logout tokens.
+        Args:
+            deliveries: (backchannel_logout_uri, logout token, timeout or None) per client
+        Returns:
+            One future per delivery, resolving to True once delivered or False
+            once retries are exhausted
+        """
+        futures = []
+        for uri, logout_token, timeout in deliveries:
+            done: Future = Future()
+            self._submit(uri, logout_token, timeout or self.timeout, 0, done)
+            futures.append(done)
+        return futures
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False)
+
+def wait_for_deliveries(futures: List[Future], timeout: float) -> Tuple[int, int]:
+    """
+    Wait up to timeout seconds for deliveries to finish; stragglers keep retrying.
+    Returns:
+        Tuple of (delivered, still pending or failed)
+    """
+    finished, _ = wait(futures, timeout=timeout) if futures else (set(), set())
+    delivered = sum(1 for future in finished if future.result())
+    return delivered, len(futures) - delivered
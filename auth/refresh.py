@@ -0,0 +1,89 @@
+import secrets
+import time
+from typing import Any, Dict, Optional, Tuple
+from config import Config
+from store import create_store
+from .token import TokenService
+
+# One entry per token family: family id -> owner, scope and the id of the
+# only refresh token in the family that may still be redeemed
+refresh_families = create_store("refresh_families")
+# Refresh token ids (jti) being redeemed right now; claiming one with add()
+# makes redemption single-use across workers while the family stays readable.
+# A claim only has to outlive the rotation, so it is removed afterwards and
+# otherwise expires after REDEMPTION_CLAIM_TTL seconds
+refresh_redemptions = create_store("refresh_redemptions")
+REDEMPTION_CLAIM_TTL = 10
+
+def issue_refresh_token(sub: str, client_id: str, scope: str, ttl: Optional[int] = None) -> str:
+    """
+    Start a new token family and return its first refresh token.
+    Args:
+        sub: Subject the tokens are issued for
+        client_id: Client the family is bound to
+        scope: Scope granted to the family
+        ttl: Absolute family lifetime in seconds (default: Config.REFRESH_TOKEN_TTL)
+    """
+    ttl = ttl or Config.REFRESH_TOKEN_TTL
+    family_id = secrets.token_urlsafe(16)
+    jti = secrets.token_urlsafe(16)
+    expires_at = int(time.time()) + ttl
+    refresh_families.set(family_id, {
+        "sub": sub,
+        "client_id": client_id,
+        "scope": scope,
+        "current": jti,
+        "expires_at": expires_at
+    }, ttl)
+    return TokenService.generate_refresh_token(sub, family_id, jti, expires_at)
+
+def rotate_refresh_token(refresh_token: str, client_id: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    Redeem a refresh token and issue its successor in the same family.
+    Presenting a token that was already rotated revokes the whole family.
+    Returns:
+        Tuple of (new refresh token, family record)
+    Raises:
+        ValueError: If the token is invalid, expired, revoked or reused
+    """
+    claims = TokenService.decode_token(refresh_token)
+    if claims.get("type") != "refresh":
+        raise ValueError("Invalid token type")
+
+    family_id, jti = claims.get("fid"), claims.get("jti")
+    family = refresh_families.get(family_id) if family_id else None
+    if family is None:
+        raise ValueError("Refresh token has been revoked")
+    if family["current"] != jti:
+        # Every token the family issued is now unusable
+        revoke_family(family_id)
+        raise ValueError("Refresh token reuse detected; token family revoked")
+    if family["client_id"] != client_id:
+        raise ValueError("Refresh token was issued to another client")
+
+    if not refresh_redemptions.add(jti, family_id, REDEMPTION_CLAIM_TTL):
+        # Another worker is rotating this token right now; it keeps the family
+        raise ValueError("Refresh token has already been redeemed")
+    try:
+        # Re-read under the claim: a rotation that finished since the first read wins
+        family = refresh_families.get(family_id)
+        if family is None:
+            raise ValueError("Refresh token has been revoked")
+        if family["current"] != jti:
+            raise ValueError("Refresh token has already been redeemed")
+        # Only the worker holding the claim writes the family, so this cannot lose an update
+        family = {**family, "current": secrets.token_urlsafe(16)}
+        refresh_families.set(family_id, family, family["expires_at"] - int(time.time()))
+    finally:
+        refresh_redemptions.delete(jti)
+    new_token = TokenService.generate_refresh_token(
+        family["sub"], family_id, family["current"], family["expires_at"]
+    )
+    return new_token, family
+
+def revoke_family(family_id: str) -> bool:
+    """
+    Revoke every refresh token in a family.
+    Returns True if the family existed.
+    """
+    return refresh_families.delete(family_id)
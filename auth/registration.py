@@ -1,39 +1,172 @@
-import uuid
-from datetime import datetime
-from typing import Dict, Optional
+import json
+import secrets
+import time
+from typing import AbstractSet, Any, Dict, Iterable, Iterator, List, Optional
+from urllib.parse import urlparse
+from .client_auth import client_registry, compile_client_policy
+from .device import DEVICE_CODE_GRANT
+from .exchange import TOKEN_EXCHANGE_GRANT
 
-# In-memory storage for registered clients
-registered_clients: Dict[str, Dict] = {}
+SUPPORTED_GRANT_TYPES = frozenset({
+    "authorization_code", "refresh_token", "client_credentials", DEVICE_CODE_GRANT, TOKEN_EXCHANGE_GRANT
+})
+SUPPORTED_RESPONSE_TYPES = frozenset({"code"})
+SUPPORTED_AUTH_METHODS = frozenset({"client_secret_basic", "client_secret_post"})
+DEFAULT_BATCH_SIZE = 1000
+# Client metadata kept from a registration (RFC 7591 2, OIDC Registration, Back-Channel Logout);
+# anything else the caller sends is dropped
+CLIENT_METADATA_FIELDS = frozenset({
+    "redirect_uris", "token_endpoint_auth_method", "grant_types", "response_types", "client_name",
+    "client_uri", "logo_uri", "scope", "contacts", "tos_uri", "policy_uri", "jwks_uri", "software_id",
+    "software_version", "post_logout_redirect_uris", "backchannel_logout_uri",
+    "backchannel_logout_session_required", "backchannel_logout_timeout"
+})
 
-def register_client(metadata: Dict) -> Dict:
+class RegistrationError(ValueError):
+    """Invalid client metadata; `error` is the RFC 7591 error code"""
+
+    def __init__(self, error: str, description: str):
+        super().__init__(description)
+        self.error = error
+        self.description = description
+
+def _string_list(metadata: Dict, field: str, default: List[str]) -> List[str]:
+    value = metadata.get(field, default)
+    if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+        raise RegistrationError("invalid_client_metadata", f"{field} must be a list of strings")
+    return value
+
+def build_client(metadata: Dict[str, Any], allowed_scopes: Optional[AbstractSet[str]] = None) -> Dict[str, Any]:
+    """
+    Validate client metadata and apply RFC 7591 defaults.
+    Args:
+        metadata: Client metadata; client_id and client_secret are kept if present
+        allowed_scopes: Scopes the client may register (default: any)
+    Returns:
+        Client record ready to be stored
+    Raises:
+        RegistrationError: If the metadata is invalid
+    """
+    if not isinstance(metadata, dict):
+        raise RegistrationError("invalid_client_metadata", "Client metadata must be a JSON object")
+
+    grant_types = _string_list(metadata, "grant_types", ["authorization_code"])
+    response_types = _string_list(
+        metadata, "response_types", ["code"] if "authorization_code" in grant_types else []
+    )
+    redirect_uris = _string_list(metadata, "redirect_uris", [])
+    unsupported = set(grant_types) - SUPPORTED_GRANT_TYPES or set(response_types) - SUPPORTED_RESPONSE_TYPES
+    if unsupported:
+        raise RegistrationError("invalid_client_metadata", f"Unsupported value(s): {', '.join(sorted(unsupported))}")
+
+    if "authorization_code" in grant_types and not redirect_uris:
+        raise RegistrationError("invalid_redirect_uri", "redirect_uris is required for authorization_code")
+    for uri in redirect_uris:
+        parsed = urlparse(uri)
+        if parsed.scheme not in ("http", "https") or not parsed.netloc or parsed.fragment:
+            raise RegistrationError("invalid_redirect_uri", f"Invalid redirect URI: {uri}")
+
+    post_logout_redirect_uris = _string_list(metadata, "post_logout_redirect_uris", [])
+    logout_uri = metadata.get("backchannel_logout_uri")
+    for uri in post_logout_redirect_uris + ([logout_uri] if logout_uri is not None else []):
+        parsed = urlparse(uri) if isinstance(uri, str) else None
+        if not parsed or parsed.scheme not in ("http", "https") or not parsed.netloc or parsed.fragment:
+            raise RegistrationError("invalid_client_metadata", f"Invalid logout URI: {uri}")
+
+    auth_method = metadata.get("token_endpoint_auth_method", "client_secret_basic")
+    if auth_method not in SUPPORTED_AUTH_METHODS:
+        raise RegistrationError("invalid_client_metadata", f"Unsupported token_endpoint_auth_method: {auth_method}")
+    scope = metadata.get("scope", "openid")
+    if not isinstance(scope, str):
+        raise RegistrationError("invalid_client_metadata", "scope must be a string")
+    if allowed_scopes is not None and not allowed_scopes.issuperset(scope.split()):
+        denied = set(scope.split()) - allowed_scopes
+        raise RegistrationError("invalid_client_metadata", f"Scope(s) not allowed: {' '.join(sorted(denied))}")
+
+    client_id = metadata.get("client_id") or secrets.token_urlsafe(16)
+    if not isinstance(client_id, str):
+        raise RegistrationError("invalid_client_metadata", "client_id must be a string")
+
+    return {
+        **{k: v for k, v in metadata.items() if k in CLIENT_METADATA_FIELDS},
+        "client_id": client_id,
+        "client_secret": metadata.get("client_secret") or secrets.token_urlsafe(32),
+        "client_id_issued_at": int(time.time()),
+        "client_secret_expires_at": 0,
+        "redirect_uris": redirect_uris,
+        "post_logout_redirect_uris": post_logout_redirect_uris,
+        "grant_types": grant_types,
+        "response_types": response_types,
+        "token_endpoint_auth_method": auth_method,
+        "scope": scope
+    }
+
+def register_client(metadata: Dict, allowed_scopes: Optional[AbstractSet[str]] = None) -> Dict:
     """
     Register a new OAuth client.
     Args:
         metadata: Client metadata including redirect URIs
+        allowed_scopes: Scopes the client may register (default: any)
     Returns:
         Dict containing client credentials and metadata
+    Raises:
+        RegistrationError: If the metadata is invalid or the client_id is taken
     """
-    client_id = str(uuid.uuid4())
-    client_secret = str(uuid.uuid4())
-    
-    required_fields = ['redirect_uris', 'grant_types', 'response_types']
-    for field in required_fields:
-        if field not in metadata:
-            raise ValueError(f"Missing required field: {field}")
-    
-    client_info = {
-        "client_id": client_id,
-        "client_secret": client_secret,
-        "registration_time": datetime.utcnow().isoformat(),
-        **metadata
-    }
-    
-    registered_clients[client_id] = client_info
-    return client_info
+    metadata = {k: v for k, v in metadata.items() if k not in ("client_id", "client_secret")}
+    client = build_client(metadata, allowed_scopes)
+    clients, _ = client_registry()
+    if client["client_id"] in clients:
+        raise RegistrationError("invalid_client_metadata", "client_id already registered")
+    clients[client["client_id"]] = client
+    compile_client_policy(client)
+    return client
 
 def get_client(client_id: str) -> Optional[Dict]:
     """
     Retrieve registered client information.
     Returns None if client_id not found.
     """
-    return registered_clients.get(client_id)
\ No newline at end of file
+    clients, _ = client_registry()
+    return clients.get(client_id)
+
+def import_clients(lines: Iterable, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[Dict[str, Any]]:
+    """
+    Stream clients from NDJSON lines into the client registry.
+    Validated clients are written batch_size at a time; one result per
+    non-blank line is yielded after its batch has been written.
+    Args:
+        lines: NDJSON lines (str or bytes), e.g. an open file or request stream
+        batch_size: Clients per registry write
+    Yields:
+        {"line", "client_id", "client_secret"} or {"line", "error", "error_description"}
+    """
+    clients, _ = client_registry()
+    batch: Dict[str, Dict] = {}
+    results: List[Dict[str, Any]] = []
+
+    def flush() -> Iterator[Dict[str, Any]]:
+        clients.update(batch)
+        for client in batch.values():
+            compile_client_policy(client)
+        batch.clear()
+        yield from results
+        results.clear()
+
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            client = build_client(json.loads(line))
+            if client["client_id"] in clients or client["client_id"] in batch:
+                raise RegistrationError("invalid_client_metadata", "client_id already registered")
+        except RegistrationError as e:
+            results.append({"line": number, "error": e.error, "error_description": e.description})
+        except ValueError as e:
+            results.append({"line": number, "error": "invalid_client_metadata", "error_description": str(e)})
+        else:
+            batch[client["client_id"]] = client
+            results.append({"line": number, "client_id": client["client_id"], "client_secret": client["client_secret"]})
+
+        if len(batch) >= batch_size:
+            yield from flush()
+    yield from flush()
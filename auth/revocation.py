@@ -0,0 +1,45 @@
+import time
+from typing import Any, Dict, Optional
+from store import create_store
+from .refresh import refresh_families, revoke_family
+from .token import TokenService
+
+# Revoked token ids (jti). Each entry lives only as long as the token it
+# revokes could still be accepted, so the set is bounded by live revocations.
+revoked_tokens = create_store("revoked_tokens")
+
+def revoke_jti(jti: str, exp: int) -> bool:
+    """
+    Revoke a token id until the token would have expired anyway.
+    Returns False if the token is already past its (lenient) expiry.
+    """
+    ttl = int(exp) - int(time.time()) + TokenService.LENIENT_LEEWAY
+    if not jti or ttl <= 0:
+        return False
+    revoked_tokens.set(jti, True, ttl)
+    return True
+
+def is_revoked(jti: Optional[str]) -> bool:
+    """
+    Check whether a token id has been revoked.
+    """
+    return bool(jti) and revoked_tokens.get(jti) is not None
+
+def revoke_token(claims: Dict[str, Any]) -> bool:
+    """
+    Revoke a decoded token. Revoking a refresh token revokes its whole family.
+    Returns True if something was revoked.
+    """
+    if claims.get("type") == "refresh":
+        return revoke_family(claims.get("fid", ""))
+    return revoke_jti(claims.get("jti"), claims.get("exp", 0))
+
+def is_token_active(claims: Dict[str, Any]) -> bool:
+    """
+    Check a decoded (signature and expiry verified) token against revocation.
+    A refresh token is active only while it is the current one in its family.
+    """
+    if claims.get("type") == "refresh":
+        family = refresh_families.get(claims.get("fid", ""))
+        return bool(family) and family["current"] == claims.get("jti")
+    return not is_revoked(claims.get("jti"))
@@ -1,11 +1,16 @@
 # flask-oidc-provider/auth/token.py
 
+import json
 import jwt
+import secrets
+import time
 from datetime import datetime, timezone, timedelta
-from typing import Dict, Optional
-from flask import current_app
+from typing import Dict, Mapping, Optional
+from flask import current_app, has_app_context
 from cryptography.hazmat.primitives import serialization
 from config import Config
+from metrics import jwt_sign_duration, jwt_verify_duration, phase, tokens_issued
+from tenants import current_tenant
 
 def create_jwt(
     payload: Dict,
@@ -25,17 +30,24 @@ def create_jwt(
     payload.update({
         'iat': now,
         'exp': now + timedelta(hours=expiry_hours),
-        'iss': 'http://localhost:5000'  # Match your ISSUER_URL
+        'iss': get_issuer()
     })
     return jwt.encode(payload, private_key, algorithm=algorithm)
 
 def validate_token(
     token: str,
     public_key: str,
-    algorithm: str = 'RS256'
+    algorithm: str = 'RS256',
+    issuer: Optional[str] = None,
+    leeway: int = 0,
+    audience: Optional[str] = None
 ) -> Optional[Dict]:
     """
     Validate and decode a JWT token.
+    Args:
+        issuer: Expected issuer (default: this provider's issuer)
+        leeway: Clock skew tolerated on exp/iat in seconds
+        audience: Required aud claim; without it, tokens carrying an aud are invalid
     Returns decoded payload if valid, None if invalid.
     """
     try:
@@ -43,79 +55,209 @@ def validate_token(
             token,
             public_key,
             algorithms=[algorithm],
-            issuer='http://localhost:5000'  # Match your ISSUER_URL
+            issuer=issuer or get_issuer(),
+            leeway=leeway,
+            audience=audience
         )
     except jwt.InvalidTokenError:
         return None
 
+class KeyRing:
+    """Parsed signing keys and pre-encoded JWKS, loaded once per process"""
+
+    def __init__(self, private_pem: bytes, public_pem: bytes, jwks: str):
+        self.private_key = serialization.load_pem_private_key(private_pem, password=None)
+        self.public_key = serialization.load_pem_public_key(public_pem)
+        self.jwks_bytes = jwks.encode()
+        keys = json.loads(jwks).get("keys", [])
+        self.kid = keys[0].get("kid") if keys else None
+        self.headers = {"kid": self.kid} if self.kid else None
+
+    @classmethod
+    def from_config(cls, config: Mapping) -> "KeyRing":
+        """
+        Load key material from the configured paths.
+        Raises RuntimeError if any file is missing.
+        """
+        paths = {}
+        for name in ("PRIVATE_KEY_PATH", "PUBLIC_KEY_PATH", "JWKS_PATH"):
+            try:
+                with open(config[name], "rb") as f:
+                    paths[name] = f.read()
+            except FileNotFoundError:
+                raise RuntimeError(f"{name} not found at {config[name]}")
+        return cls(paths["PRIVATE_KEY_PATH"], paths["PUBLIC_KEY_PATH"], paths["JWKS_PATH"].decode())
+
+# Used outside any application context (scripts, tests); loaded from Config on first use
+_default_keyring: Optional[KeyRing] = None
+
+def get_keyring() -> KeyRing:
+    """
+    Return the key ring of the current tenant, else the one create_app loaded
+    into app.extensions["keyring"], else the Config one.
+    """
+    global _default_keyring
+    tenant = current_tenant()
+    if tenant is not None:
+        return tenant.keyring
+    if has_app_context():
+        keyring = current_app.extensions.get("keyring")
+        if keyring is not None:
+            return keyring
+    if _default_keyring is None:
+        _default_keyring = KeyRing.from_config({
+            "PRIVATE_KEY_PATH": Config.PRIVATE_KEY_PATH,
+            "PUBLIC_KEY_PATH": Config.PUBLIC_KEY_PATH,
+            "JWKS_PATH": Config.JWKS_PATH
+        })
+    return _default_keyring
+
+def get_issuer() -> str:
+    """Issuer identifier of the current tenant, or ISSUER_URL"""
+    tenant = current_tenant()
+    if tenant is not None:
+        return tenant.issuer
+    issuer = current_app.config["ISSUER_URL"] if has_app_context() else Config.ISSUER_URL
+    return issuer.rstrip("/")
+
 class TokenService:
+    # Access token lifetime in seconds
+    ACCESS_TOKEN_TTL = 1800
+    # Expiry grace period accepted by decode_token_lenient (seconds)
+    LENIENT_LEEWAY = 300
+
     @staticmethod
-    def generate_id_token(sub, aud, nonce=None):
+    def _sign(payload, token_type):
+        with phase("key_load"):
+            keyring = get_keyring()
+        start = time.perf_counter()
+        with phase("sign"):
+            token = jwt.encode(payload, keyring.private_key, algorithm="RS256", headers=keyring.headers)
+        jwt_sign_duration.observe(time.perf_counter() - start)
+        tokens_issued.inc((token_type,))
+        return token
+
+    @staticmethod
+    def _verify(token, leeway=0, verify_exp=True):
+        with phase("key_load"):
+            key = get_keyring().public_key
+        start = time.perf_counter()
+        try:
+            with phase("verify"):
+                return jwt.decode(
+                    token, key=key, algorithms=["RS256"], issuer=get_issuer(),
+                    options={"verify_aud": False, "verify_exp": verify_exp}, leeway=leeway
+                )
+        finally:
+            jwt_verify_duration.observe(time.perf_counter() - start)
+
+    @staticmethod
+    def generate_id_token(sub, aud, nonce=None, auth_time=None):
         now = datetime.now(timezone.utc)
         iat = int(now.timestamp())
         exp = int((now + timedelta(minutes=10)).timestamp())
-        auth_time = iat
+        if auth_time is None:
+            auth_time = iat
         
         payload = {
-            "iss": "http://localhost:5000",
+            "iss": get_issuer(),
             "sub": sub,
             "aud": aud,
             "iat": iat,
             "exp": exp,
             "auth_time": auth_time,
+            "jti": secrets.token_urlsafe(16),
         }
         if nonce:
             payload["nonce"] = nonce
 
-        private_key = Config.load_private_key()
-        key = serialization.load_pem_private_key(private_key, password=None)
-        return jwt.encode(payload, key, algorithm="RS256")
+        return TokenService._sign(payload, "id")
 
     @staticmethod
-    def generate_access_token(sub, scope):
+    def generate_access_token(sub, scope, client_id=None, jti=None):
         now = datetime.now(timezone.utc)
         iat = int(now.timestamp())
-        exp = int((now + timedelta(minutes=30)).timestamp())
+        exp = iat + TokenService.ACCESS_TOKEN_TTL
         
         payload = {
-            "iss": "http://localhost:5000",
+            "iss": get_issuer(),
             "sub": sub,
             "scope": scope,
             "iat": iat,
-            "exp": exp
+            "exp": exp,
+            "jti": jti or secrets.token_urlsafe(16)
         }
+        if client_id:
+            payload["client_id"] = client_id
 
-        private_key = Config.load_private_key()
-        key = serialization.load_pem_private_key(private_key, password=None)
-        return jwt.encode(payload, key, algorithm="RS256")
+        return TokenService._sign(payload, "access")
 
     @staticmethod
-    def generate_refresh_token(sub):
-        now = datetime.now(timezone.utc)
-        iat = int(now.timestamp())
-        exp = int((now + timedelta(days=30)).timestamp())
-        
+    def generate_exchanged_token(subject_claims, scope, client_id, audience=None, jti=None):
+        """
+        Access token derived from a verified subject token (RFC 8693).
+        It never outlives the subject token, and `act` names the client that
+        made the exchange, nesting any earlier actors.
+        """
+        iat = int(datetime.now(timezone.utc).timestamp())
+        act = {"sub": client_id}
+        if "act" in subject_claims:
+            act["act"] = subject_claims["act"]
         payload = {
-            "iss": "http://localhost:5000",
+            "iss": get_issuer(),
+            "sub": subject_claims["sub"],
+            "scope": scope,
+            "iat": iat,
+            "exp": min(iat + TokenService.ACCESS_TOKEN_TTL, subject_claims["exp"]),
+            "jti": jti or secrets.token_urlsafe(16),
+            "client_id": client_id,
+            "act": act
+        }
+        if audience:
+            payload["aud"] = audience
+
+        return TokenService._sign(payload, "access")
+
+    @staticmethod
+    def generate_logout_token(sub, aud):
+        """Back-channel logout token (OpenID Connect Back-Channel Logout 1.0, section 2.4)"""
+        iat = int(datetime.now(timezone.utc).timestamp())
+        payload = {
+            "iss": get_issuer(),
             "sub": sub,
+            "aud": aud,
             "iat": iat,
+            "exp": iat + 120,
+            "jti": secrets.token_urlsafe(16),
+            "events": {"http://schemas.openid.net/event/backchannel-logout": {}}
+        }
+
+        return TokenService._sign(payload, "logout")
+
+    @staticmethod
+    def generate_refresh_token(sub, family_id, jti, exp):
+        payload = {
+            "iss": get_issuer(),
+            "sub": sub,
+            "iat": int(datetime.now(timezone.utc).timestamp()),
             "exp": exp,
-            "type": "refresh"
+            "type": "refresh",
+            "fid": family_id,
+            "jti": jti
         }
 
-        private_key = Config.load_private_key()
-        key = serialization.load_pem_private_key(private_key, password=None)
-        return jwt.encode(payload, key, algorithm="RS256")
+        return TokenService._sign(payload, "refresh")
 
     @staticmethod
     def decode_token(token):
-        public_key = Config.load_public_key()
-        key = serialization.load_pem_public_key(public_key)
-        return jwt.decode(token, key=key, algorithms=["RS256"], options={"verify_aud": False})
+        return TokenService._verify(token)
 
     @staticmethod
     def decode_token_lenient(token):
         """Decode token with lenient expiration checking (5 minute grace period)"""
-        public_key = Config.load_public_key()
-        key = serialization.load_pem_public_key(public_key)
-        return jwt.decode(token, key=key, algorithms=["RS256"], options={"verify_aud": False}, leeway=300)  # 5 minute grace period
+        return TokenService._verify(token, leeway=TokenService.LENIENT_LEEWAY)
+
+    @staticmethod
+    def decode_id_token_hint(token):
+        """Decode an id_token_hint; RPs commonly send expired ID tokens, so exp is not checked"""
+        return TokenService._verify(token, verify_exp=False)
@@ -0,0 +1,220 @@
+"""
+Local token verification for resource servers.
+
+Downstream APIs verify this provider's access tokens against its published
+JWKS instead of calling /userinfo on every request:
+
+    verifier = JWKSVerifier.from_issuer("https://idp.example.com")
+    verifier.start()
+
+    @app.route("/reports")
+    @require_token(verifier, scope="reports.read")
+    def reports():
+        return jsonify(owner=g.token_claims["sub"])
+
+Keys are fetched once, indexed by kid and refreshed in the background; a
+token signed with an unknown kid (key rotation) triggers an immediate,
+rate-limited refresh. Revocation is not visible locally: APIs that must
+honour it before expiry should call /introspect instead.
+"""
+
+import random
+import threading
+import time
+from functools import wraps
+from typing import Any, Callable, Dict, Optional, Tuple
+import jwt
+from flask import g, jsonify, request
+from cache import SingleFlight
+from .token import validate_token
+
+class JWKSVerifier:
+    """Verifies RS256 access tokens with keys from a JWKS endpoint"""
+
+    def __init__(
+        self,
+        jwks_uri: str,
+        issuer: str,
+        refresh_interval: float = 300.0,
+        jitter: float = 0.1,
+        min_refresh_interval: float = 30.0,
+        cache_size: int = 4096,
+        leeway: int = 0,
+        timeout: float = 5.0,
+        audience: Optional[str] = None
+    ):
+        """
+        Args:
+            jwks_uri: URL of the provider's JWKS document
+            issuer: Expected iss claim
+            refresh_interval: Seconds between background refreshes
+            jitter: Fraction of refresh_interval to randomise by, so a fleet of
+                verifiers does not refresh in lockstep
+            min_refresh_interval: Minimum seconds between unknown-kid refreshes
+            cache_size: Maximum number of remembered verified tokens
+            leeway: Clock skew tolerated on exp/iat in seconds
+            timeout: HTTP timeout for JWKS fetches in seconds
+            audience: This API's identifier. When set, tokens must name it in aud
+                (tokens obtained by token exchange for this API); otherwise
+                tokens carrying any aud are rejected
+        """
+        self.jwks_uri = jwks_uri
+        self.issuer = issuer.rstrip("/")
+        self.refresh_interval = refresh_interval
+        self.jitter = jitter
+        self.min_refresh_interval = min_refresh_interval
+        self.cache_size = cache_size
+        self.leeway = leeway
+        self.timeout = timeout
+        self.audience = audience
+
+        self._keys: Dict[str, Any] = {}
+        self._fetched_at = 0.0
+        # Concurrent unknown-kid misses share one fetch
+        self._refreshes = SingleFlight()
+        # Verified tokens (token: (kid, claims)); cleared when full
+        self._verified: Dict[str, Tuple[Optional[str], Dict[str, Any]]] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_issuer(cls, issuer: str, **kwargs) -> "JWKSVerifier":
+        """Build a verifier from the issuer's discovery document"""
+        import requests
+
+        response = requests.get(f"{issuer.rstrip('/')}/.well-known/openid-configuration",
+                                timeout=kwargs.get("timeout", 5.0))
+        response.raise_for_status()
+        return cls(response.json()["jwks_uri"], issuer, **kwargs)
+
+    def _fetch(self) -> Dict[str, Any]:
+        import requests
+
+        response = requests.get(self.jwks_uri, timeout=self.timeout)
+        response.raise_for_status()
+        keys = {}
+        for jwk in response.json().get("keys", []):
+            if jwk.get("kty") != "RSA" or jwk.get("use", "sig") != "sig":
+                continue
+            keys[jwk.get("kid")] = jwt.PyJWK(jwk, algorithm="RS256").key
+        return keys
+
+    def refresh(self) -> Dict[str, Any]:
+        """
+        Fetch the JWKS and replace the key set.
+        Raises if the fetch fails; the previous keys stay in use.
+        """
+        keys = self._fetch()
+        # Swap the whole mapping so readers never see a partial key set
+        self._keys = keys
+        self._fetched_at = time.monotonic()
+        return keys
+
+    def _refresh_for_unknown_kid(self) -> None:
+        if time.monotonic() - self._fetched_at < self.min_refresh_interval:
+            return
+        try:
+            self._refreshes.do("jwks", self.refresh)
+        except Exception as e:
+            print(f"JWKS refresh failed: {e}")
+
+    def _next_delay(self, failed: bool) -> float:
+        base = self.min_refresh_interval if failed else self.refresh_interval
+        return base * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _run(self) -> None:
+        failed = False
+        while not self._stop.wait(self._next_delay(failed)):
+            try:
+                self.refresh()
+                failed = False
+            except Exception as e:
+                print(f"Background JWKS refresh failed: {e}")
+                failed = True
+
+    def start(self) -> "JWKSVerifier":
+        """Load the keys and start refreshing them in a daemon thread"""
+        self.refresh()
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="jwks-refresh", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop the background refresh thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _key_for(self, kid: Optional[str]) -> Optional[Any]:
+        keys = self._keys
+        if kid is None and len(keys) == 1:
+            return next(iter(keys.values()))
+        key = keys.get(kid)
+        if key is None:
+            self._refresh_for_unknown_kid()
+            key = self._keys.get(kid)
+        return key
+
+    def verify(self, token: str) -> Optional[Dict[str, Any]]:
+        """
+        Verify an access token locally.
+        Returns the claims if valid, None if invalid, expired, signed with an
+        unknown key or not an access token.
+        """
+        cached = self._verified.get(token)
+        if cached is not None:
+            kid, claims = cached
+            # Drop tokens whose key was withdrawn from the JWKS since
+            if claims["exp"] + self.leeway > time.time() and (kid is None or kid in self._keys):
+                return claims
+
+        try:
+            kid = jwt.get_unverified_header(token).get("kid")
+        except jwt.InvalidTokenError:
+            return None
+        key = self._key_for(kid)
+        if key is None:
+            return None
+        claims = validate_token(token, key, issuer=self.issuer, leeway=self.leeway, audience=self.audience)
+        # Refresh tokens share the signing keys (ID tokens fail the aud check, their aud being a client id)
+        if claims is None or claims.get("type") == "refresh" or "exp" not in claims:
+            return None
+
+        if len(self._verified) >= self.cache_size:
+            self._verified.clear()
+        self._verified[token] = (kid, claims)
+        return claims
+
+def _bearer_error(error: str, description: str, status: int):
+    response = jsonify({"error": error, "error_description": description})
+    response.headers["WWW-Authenticate"] = f'Bearer error="{error}", error_description="{description}"'
+    return response, status
+
+def require_token(verifier: JWKSVerifier, scope: Optional[str] = None) -> Callable:
+    """
+    Flask view decorator that requires a valid bearer access token.
+    The verified claims are available as g.token_claims.
+    Args:
+        verifier: Verifier for the provider that issued the tokens
+        scope: Space-separated scopes the token must all carry
+    """
+    required = frozenset(scope.split()) if scope else frozenset()
+
+    def decorator(view: Callable) -> Callable:
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            auth_header = request.headers.get("Authorization", "")
+            if not auth_header.startswith("Bearer "):
+                return _bearer_error("invalid_request", "Missing bearer token", 401)
+            claims = verifier.verify(auth_header[7:])
+            if claims is None:
+                return _bearer_error("invalid_token", "Invalid or expired token", 401)
+            if not required <= set(claims.get("scope", "").split()):
+                return _bearer_error("insufficient_scope", f"Requires scope: {scope}", 403)
+            g.token_claims = claims
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,116 @@
+# benchmarks/conftest.py
+"""
+Micro-benchmark harness for the provider's hot primitives.
+
+    pytest benchmarks/                               # report against baseline.json
+    BENCH_ENFORCE=1 pytest benchmarks/               # fail on regressions (opt-in gate)
+    BENCH_UPDATE_BASELINE=1 pytest benchmarks/       # record a new baseline
+    BENCH_MAX_REGRESSION=25 pytest benchmarks/       # threshold, +25% (default 50)
+
+Timings are compared relative to a fixed reference workload measured in the
+same run, so a slower machine or a busy one (e.g. the test suite running
+alongside) scales baseline and measurement alike. Without BENCH_ENFORCE,
+regressions are only reported as warnings.
+"""
+
+import gc
+import hashlib
+import json
+import os
+import time
+import warnings
+from typing import Tuple
+import pytest
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+MAX_REGRESSION = float(os.environ.get("BENCH_MAX_REGRESSION", 50))
+UPDATE_BASELINE = os.environ.get("BENCH_UPDATE_BASELINE") == "1"
+ENFORCE = os.environ.get("BENCH_ENFORCE") == "1"
+REFERENCE = "_reference"
+
+def _calibrate(fn, min_time: float) -> int:
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if time.perf_counter() - start >= min_time or number >= 1_000_000:
+            return number
+        number *= 2
+
+def _round(fn, number: int) -> float:
+    start = time.perf_counter()
+    for _ in range(number):
+        fn()
+    return (time.perf_counter() - start) / number
+
+def measure(fn, reference, min_time: float = 0.2, repeat: int = 5) -> Tuple[float, float]:
+    """
+    Time fn and the reference workload in alternating rounds, so both see the
+    same machine load, and return the best mean seconds per call of each.
+    The number of calls per round is calibrated to take about min_time/repeat.
+    Garbage collection is paused while timing, as timeit does.
+    """
+    enabled = gc.isenabled()
+    gc.collect()
+    gc.disable()
+    try:
+        number = _calibrate(fn, min_time / repeat)
+        reference_number = _calibrate(reference, min_time / repeat)
+        best = best_reference = float("inf")
+        for _ in range(repeat):
+            best = min(best, _round(fn, number))
+            best_reference = min(best_reference, _round(reference, reference_number))
+    finally:
+        if enabled:
+            gc.enable()
+    return best, best_reference
+
+def reference_workload() -> None:
+    """Fixed mix of interpreter and C work that machine speed and load scale like the primitives"""
+    digest = b"reference"
+    for _ in range(20):
+        digest = hashlib.sha256(digest * 32).digest()
+    sorted(str(i) for i in range(100))
+
+@pytest.fixture(scope="session")
+def baseline():
+    try:
+        with open(BASELINE_PATH) as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        data = {}
+    yield data
+    if UPDATE_BASELINE:
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(dict(sorted(data.items())), f, indent=2)
+            f.write("\n")
+
+@pytest.fixture
+def benchmark(baseline):
+    """
+    Measure a primitive and fail if it regressed beyond BENCH_MAX_REGRESSION
+    percent of its recorded baseline.
+    """
+    def run(name, fn, **kwargs):
+        seconds, reference = measure(fn, reference_workload, **kwargs)
+        print(f"{name}: {seconds * 1e6:.1f} us/call ({seconds / reference:.2f}x reference)")
+        if UPDATE_BASELINE:
+            baseline[name] = seconds / reference
+            baseline[REFERENCE] = reference
+            return seconds
+
+        recorded = baseline.get(name)
+        if recorded is None:
+            pytest.skip(f"No baseline recorded for {name}")
+        regression = (seconds / reference / recorded - 1) * 100
+        if regression > MAX_REGRESSION:
+            message = (
+                f"{name} regressed {regression:.0f}%: "
+                f"{seconds / reference:.2f}x reference vs baseline {recorded:.2f}x"
+            )
+            if ENFORCE:
+                pytest.fail(message)
+            warnings.warn(message)
+        return seconds
+    return run
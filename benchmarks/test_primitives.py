@@ -0,0 +1,63 @@
+# benchmarks/test_primitives.py
+import time
+import pytest
+from app import app, generate_token_response
+from auth.client_auth import authenticate_client
+from auth.pkce import create_code_challenge, create_code_verifier, verify_code_challenge
+from auth.refresh import refresh_families
+from auth.token import TokenService
+from models import cleanup_expired_tokens, tokens, users
+
+@pytest.fixture(autouse=True)
+def app_context():
+    # As in a request: the key ring and caches create_app warmed
+    with app.app_context():
+        yield
+
+def test_generate_id_token(benchmark):
+    benchmark("generate_id_token", lambda: TokenService.generate_id_token("user-alice", "client123", nonce="n"))
+
+def test_generate_access_token(benchmark):
+    benchmark("generate_access_token", lambda: TokenService.generate_access_token("user-alice", "openid profile"))
+
+def test_generate_refresh_token(benchmark):
+    benchmark("generate_refresh_token", lambda: TokenService.generate_refresh_token("user-alice", "family", "jti", int(time.time()) + 3600))
+
+def test_decode_token(benchmark):
+    token = TokenService.generate_access_token("user-alice", "openid")
+    benchmark("decode_token", lambda: TokenService.decode_token(token))
+
+@pytest.mark.parametrize("method", ["S256", "plain"])
+def test_verify_code_challenge(benchmark, method):
+    verifier = create_code_verifier()
+    challenge = create_code_challenge(verifier, method)
+    benchmark(f"verify_code_challenge[{method}]", lambda: verify_code_challenge(verifier, challenge, method))
+
+def test_authenticate_client(benchmark):
+    benchmark("authenticate_client", lambda: authenticate_client("client123", "secret123"))
+
+@pytest.mark.parametrize("size", [100, 10_000])
+def test_cleanup_expired_tokens(benchmark, size):
+    # Live entries only: measures the scan cost paid on every request
+    now = int(time.time())
+    saved = dict(tokens)
+    tokens.clear()
+    tokens.update({f"token-{i}": {"issued_at": now, "expires_in": 3600} for i in range(size)})
+    try:
+        benchmark(f"cleanup_expired_tokens[{size}]", cleanup_expired_tokens)
+    finally:
+        tokens.clear()
+        tokens.update(saved)
+
+def test_generate_token_response(benchmark):
+    issued = []
+    try:
+        benchmark(
+            "generate_token_response",
+            lambda: issued.append(generate_token_response(users["alice"], "client123", "openid profile email"))
+        )
+    finally:
+        # Leave the global stores as they were
+        for response in issued:
+            tokens.pop(response["access_token"], None)
+            refresh_families.delete(TokenService.decode_token(response["refresh_token"])["fid"])
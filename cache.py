@@ -0,0 +1,126 @@
+# flask-oidc-provider/cache.py
+
+"""
+In-process caching primitives shared by the provider.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Call:
+    __slots__ = ("event", "result", "error", "done_at")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.done_at: Optional[float] = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key.
+    The first caller runs the function; callers that arrive while it is
+    running, or within `window` seconds after it finished, get the same result.
+    """
+
+    # Number of calls between sweeps of finished entries
+    SWEEP_INTERVAL = 256
+
+    def __init__(self, window: float = 0.0):
+        self.window = window
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self._count = 0
+
+    def _sweep(self, now: float) -> None:
+        stale = [
+            key for key, call in self._calls.items()
+            if call.done_at is not None and now - call.done_at > self.window
+        ]
+        for key in stale:
+            del self._calls[key]
+
+    def purge_expired(self) -> int:
+        """Drop finished calls whose window has passed. Returns the number removed."""
+        with self._lock:
+            before = len(self._calls)
+            self._sweep(time.monotonic())
+            return before - len(self._calls)
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run fn once per key.
+        Returns (result, shared) where shared is True if the result came
+        from another caller's execution.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._count += 1
+            if self._count % self.SWEEP_INTERVAL == 0:
+                self._sweep(now)
+
+            call = self._calls.get(key)
+            if call and (call.done_at is None or now - call.done_at <= self.window):
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            call.done_at = time.monotonic()
+            if self.window <= 0 or call.error is not None:
+                with self._lock:
+                    if self._calls.get(key) is call:
+                        del self._calls[key]
+            call.event.set()
+        return call.result, False
+
+
+class LRUCache:
+    """Thread-safe mapping that evicts the least recently used entry beyond `capacity`"""
+
+    def __init__(self, capacity: int = 4096):
+        self.capacity = capacity
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            return self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
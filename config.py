@@ -8,10 +8,107 @@ class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY", "change-me-in-production")
     DEBUG = os.environ.get("FLASK_DEBUG", False)
 
-    # Key locations
-    PRIVATE_KEY_PATH = os.path.join(basedir, "private.pem")
-    PUBLIC_KEY_PATH = os.path.join(basedir, "public.pem")
-    JWKS_PATH = os.path.join(basedir, "jwks.json")
+    ISSUER_URL = os.environ.get("ISSUER_URL", "http://localhost:5000")
+
+    # Key locations (relative paths are resolved against the project root)
+    PRIVATE_KEY_PATH = os.path.join(basedir, os.environ.get("PRIVATE_KEY_PATH", "private.pem"))
+    PUBLIC_KEY_PATH = os.path.join(basedir, os.environ.get("PUBLIC_KEY_PATH", "public.pem"))
+    JWKS_PATH = os.path.join(basedir, os.environ.get("JWKS_PATH", "jwks.json"))
+
+    # Multi-tenant issuers (see tenants.py): one directory of keys and clients per tenant
+    TENANTS_DIR = os.path.join(basedir, os.environ.get("TENANTS_DIR", "tenants"))
+    TENANT_CACHE_SIZE = int(os.environ.get("TENANT_CACHE_SIZE", 128))
+    TENANT_ISSUER_TEMPLATE = os.environ.get("TENANT_ISSUER_TEMPLATE", "{base}/t/{tenant}")
+    # Serve tenants from "<tenant><suffix>" hosts, e.g. ".idp.example.com" (empty: path-based only)
+    TENANT_HOST_SUFFIX = os.environ.get("TENANT_HOST_SUFFIX", "")
+
+    # Shared state (see store.py); empty means in-process memory
+    STORE_URL = os.environ.get("STORE_URL", "")
+
+    # Lifetime of a pending authorization request (seconds)
+    AUTHORIZATION_REQUEST_TTL = int(os.environ.get("AUTHORIZATION_REQUEST_TTL", 600))
+
+    # Unredeemed authorization codes are discarded after this many seconds
+    AUTHORIZATION_CODE_TTL = int(os.environ.get("AUTHORIZATION_CODE_TTL", 600))
+
+    # Carry authorization code state inside an AES-GCM sealed code instead of the store.
+    # AUTHORIZATION_CODE_KEY must match on every node (default: derived from SECRET_KEY).
+    SEALED_AUTHORIZATION_CODES = os.environ.get("SEALED_AUTHORIZATION_CODES", "false").lower() == "true"
+    AUTHORIZATION_CODE_KEY = os.environ.get("AUTHORIZATION_CODE_KEY") or SECRET_KEY
+
+    # How long an approved consent is remembered (seconds)
+    CONSENT_TTL = int(os.environ.get("CONSENT_TTL", 30 * 24 * 3600))
+
+    # Maximum age of a provider SSO session before re-authentication (seconds)
+    SSO_SESSION_MAX_AGE = int(os.environ.get("SSO_SESSION_MAX_AGE", 8 * 3600))
+
+    # Reuse client_credentials tokens while more than MIN_REMAINING seconds are left
+    CLIENT_CREDENTIALS_TOKEN_REUSE = os.environ.get("CLIENT_CREDENTIALS_TOKEN_REUSE", "true").lower() == "true"
+    CLIENT_CREDENTIALS_MIN_REMAINING = int(os.environ.get("CLIENT_CREDENTIALS_MIN_REMAINING", 300))
+
+    # Token exchange: derived tokens kept per (subject token, client, audience, scope),
+    # reused while more than MIN_REMAINING seconds are left
+    TOKEN_EXCHANGE_CACHE_SIZE = int(os.environ.get("TOKEN_EXCHANGE_CACHE_SIZE", 4096))
+    TOKEN_EXCHANGE_MIN_REMAINING = int(os.environ.get("TOKEN_EXCHANGE_MIN_REMAINING", 60))
+
+    # Absolute lifetime of a refresh token family (seconds); rotation does not extend it
+    REFRESH_TOKEN_TTL = int(os.environ.get("REFRESH_TOKEN_TTL", 30 * 24 * 3600))
+
+    # Identical refresh grants within this many seconds share one result
+    REFRESH_COALESCE_WINDOW = float(os.environ.get("REFRESH_COALESCE_WINDOW", 2.0))
+
+    # Device authorization grant (RFC 8628): code lifetime, minimum polling interval and
+    # how long a pending token poll is held open waiting for the user (0 answers at once)
+    DEVICE_CODE_TTL = int(os.environ.get("DEVICE_CODE_TTL", 600))
+    DEVICE_POLL_INTERVAL = int(os.environ.get("DEVICE_POLL_INTERVAL", 5))
+    DEVICE_POLL_WAIT = float(os.environ.get("DEVICE_POLL_WAIT", 20))
+    # Polls held at once per process; each holds a worker thread, so keep this well below the
+    # thread count (launcher.py sizes it per profile: 0 for sync). Polls that cannot be held
+    # get slow_down until the device polls only every DEVICE_POLL_MAX_INTERVAL seconds
+    DEVICE_POLL_MAX_HELD = int(os.environ.get("DEVICE_POLL_MAX_HELD", 2))
+    DEVICE_POLL_MAX_INTERVAL = int(os.environ.get("DEVICE_POLL_MAX_INTERVAL", 60))
+
+    # Back-channel logout fan-out: concurrent deliveries, per-client HTTP timeout (clients may
+    # override it with backchannel_logout_timeout), retries, and how long /logout waits for them
+    BACKCHANNEL_LOGOUT_WORKERS = int(os.environ.get("BACKCHANNEL_LOGOUT_WORKERS", 64))
+    BACKCHANNEL_LOGOUT_TIMEOUT = float(os.environ.get("BACKCHANNEL_LOGOUT_TIMEOUT", 5))
+    BACKCHANNEL_LOGOUT_RETRIES = int(os.environ.get("BACKCHANNEL_LOGOUT_RETRIES", 3))
+    BACKCHANNEL_LOGOUT_WAIT = float(os.environ.get("BACKCHANNEL_LOGOUT_WAIT", 2))
+
+    # Bearer token required by /register; without one, registration is closed unless REGISTRATION_OPEN
+    REGISTRATION_ACCESS_TOKEN = os.environ.get("REGISTRATION_ACCESS_TOKEN", "")
+    REGISTRATION_OPEN = os.environ.get("REGISTRATION_OPEN", "false").lower() == "true"
+    # Scopes a dynamically registered client may ask for (the bulk import API is not limited)
+    REGISTRATION_SCOPES = os.environ.get("REGISTRATION_SCOPES", "openid profile email")
+    # Clients written to the registry per batch by the bulk import API
+    CLIENT_IMPORT_BATCH_SIZE = int(os.environ.get("CLIENT_IMPORT_BATCH_SIZE", 1000))
+
+    # Audit log (see audit.py): buffered events, group-committed to rotating NDJSON segments
+    AUDIT_ENABLED = os.environ.get("AUDIT_ENABLED", "false").lower() == "true"
+    AUDIT_DIR = os.environ.get("AUDIT_DIR", os.path.join(basedir, "audit"))
+    AUDIT_BUFFER_SIZE = int(os.environ.get("AUDIT_BUFFER_SIZE", 65536))
+    AUDIT_SEGMENT_BYTES = int(os.environ.get("AUDIT_SEGMENT_BYTES", 64 * 1024 * 1024))
+    AUDIT_SEGMENT_SECONDS = float(os.environ.get("AUDIT_SEGMENT_SECONDS", 3600))
+
+    # Expose Prometheus metrics at /metrics
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+
+    # Add a Server-Timing header with per-phase durations to responses
+    SERVER_TIMING_ENABLED = os.environ.get("SERVER_TIMING_ENABLED", "false").lower() == "true"
+
+    # Shared secret for admin-only endpoints and signed admin headers; empty disables them
+    ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+
+    # On-demand request profiling (see profiling.py)
+    PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILING_DIR = os.environ.get("PROFILING_DIR", os.path.join(basedir, "profiles"))
+    PROFILING_SAMPLE_RATE = float(os.environ.get("PROFILING_SAMPLE_RATE", 0.1))
+    PROFILING_WINDOW = float(os.environ.get("PROFILING_WINDOW", 60))
+    PROFILING_SIGNAL = os.environ.get("PROFILING_SIGNAL", "SIGUSR2")
+
+    # tracemalloc snapshots for /debug/stats?snapshot=1 (adds allocation overhead)
+    TRACEMALLOC_ENABLED = os.environ.get("TRACEMALLOC_ENABLED", "false").lower() == "true"
+    TRACEMALLOC_FRAMES = int(os.environ.get("TRACEMALLOC_FRAMES", 1))
 
     @classmethod
     def load_private_key(cls):
@@ -0,0 +1,133 @@
+# flask-oidc-provider/diagnostics.py
+
+"""
+Memory accounting for the provider's in-memory stores.
+
+GET /debug/stats (X-Admin-Token: <ADMIN_TOKEN>) reports entry counts and
+approximate bytes per store plus process RSS. With TRACEMALLOC_ENABLED,
+?snapshot=1 takes a tracemalloc snapshot and returns the top allocation
+growth since the previous snapshot.
+"""
+
+import itertools
+import os
+import sys
+import threading
+import tracemalloc
+from typing import Any, Dict, Iterable, Mapping, Optional, Tuple
+
+from flask import Flask, jsonify, request
+
+from auth.admin import verify_admin_token
+
+# Entries sampled per store when estimating its size
+SAMPLE_SIZE = 256
+
+_snapshot_lock = threading.Lock()
+_last_snapshot: Optional[tracemalloc.Snapshot] = None
+
+
+def approx_size(obj: Any, _seen: Optional[set] = None) -> int:
+    """Recursive sys.getsizeof over containers, counting shared objects once"""
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(approx_size(k, seen) + approx_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(approx_size(item, seen) for item in obj)
+    return size
+
+
+def _entries(store) -> Optional[Iterable[Tuple[Any, Any]]]:
+    """Iterate (key, value) pairs of a dict or MemoryStore; None if not in-process"""
+    if isinstance(store, Mapping):
+        return store.items()
+    data = getattr(store, "_data", None)
+    return data.items() if isinstance(data, dict) else None
+
+
+def store_stats(store) -> Dict[str, Any]:
+    """
+    Entry count and approximate size of a store.
+    Size is extrapolated from up to SAMPLE_SIZE entries.
+    """
+    count = len(store)
+    entries = _entries(store)
+    if entries is None:
+        return {"entries": count, "approx_bytes": None}
+
+    try:
+        sample = list(itertools.islice(entries, SAMPLE_SIZE))
+    except RuntimeError:
+        # Resized by another thread mid-iteration
+        sample = []
+    table = sys.getsizeof(store if isinstance(store, Mapping) else store._data)
+    if not sample:
+        return {"entries": count, "approx_bytes": table}
+    per_entry = sum(approx_size(k) + approx_size(v) for k, v in sample) / len(sample)
+    return {"entries": count, "approx_bytes": int(table + per_entry * count)}
+
+
+def rss_bytes() -> Optional[int]:
+    """Current resident set size, or peak RSS where /proc is unavailable"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        return None
+
+
+def tracemalloc_diff(limit: int = 20) -> Dict[str, Any]:
+    """Snapshot tracemalloc and diff against the previous snapshot"""
+    global _last_snapshot
+    if not tracemalloc.is_tracing():
+        return {"enabled": False}
+
+    with _snapshot_lock:
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+        ))
+        previous, _last_snapshot = _last_snapshot, snapshot
+
+    current, peak = tracemalloc.get_traced_memory()
+    report: Dict[str, Any] = {"enabled": True, "traced_bytes": current, "peak_bytes": peak}
+    if previous is not None:
+        report["top_growth"] = [
+            {"location": str(stat.traceback), "size_diff": stat.size_diff, "count_diff": stat.count_diff}
+            for stat in snapshot.compare_to(previous, "lineno")[:limit]
+        ]
+    return report
+
+
+def collect_stats(stores: Mapping[str, Any]) -> Dict[str, Any]:
+    return {
+        "rss_bytes": rss_bytes(),
+        "stores": {name: store_stats(store) for name, store in stores.items()}
+    }
+
+
+def init_debug_stats(app: Flask, stores: Mapping[str, Any]) -> None:
+    """Expose GET /debug/stats for admins and start tracemalloc if configured"""
+    if app.config.get("TRACEMALLOC_ENABLED") and not tracemalloc.is_tracing():
+        tracemalloc.start(app.config.get("TRACEMALLOC_FRAMES", 1))
+
+    def debug_stats():
+        if not verify_admin_token(request.headers.get("X-Admin-Token"), key=app.config["ADMIN_TOKEN"]):
+            return jsonify({"error": "forbidden", "error_description": "Admin token required"}), 403
+
+        report = collect_stats(stores)
+        if request.args.get("snapshot"):
+            report["tracemalloc"] = tracemalloc_diff()
+        return jsonify(report)
+
+    app.add_url_rule("/debug/stats", "debug_stats", debug_stats)
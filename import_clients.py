@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Bulk client import
+
+Streams an NDJSON file of client metadata to a running provider's
+/admin/clients/import endpoint and writes the issued credentials as NDJSON.
+Each line may carry its own client_id/client_secret when migrating existing
+clients; otherwise both are generated.
+
+    python import_clients.py tenants.ndjson --url http://127.0.0.1:5000 \
+        --admin-token $ADMIN_TOKEN --output credentials.ndjson
+"""
+
+import argparse
+import json
+import sys
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk import OAuth clients into a running provider")
+    parser.add_argument("file", help="NDJSON file of client metadata ('-' for stdin)")
+    parser.add_argument("--url", default="http://127.0.0.1:5000", help="Base URL of the provider")
+    parser.add_argument("--admin-token", required=True, help="The provider's ADMIN_TOKEN")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Clients per registry write")
+    parser.add_argument("--output", help="Write issued credentials here instead of stdout")
+    args = parser.parse_args(argv)
+
+    import requests
+
+    source = sys.stdin.buffer if args.file == "-" else open(args.file, "rb")
+    output = open(args.output, "w") if args.output else sys.stdout
+    imported = failed = 0
+    with source, requests.post(
+        f"{args.url.rstrip('/')}/admin/clients/import",
+        params={"batch_size": args.batch_size},
+        data=source,  # streamed upload
+        headers={"X-Admin-Token": args.admin_token, "Content-Type": "application/x-ndjson"},
+        stream=True
+    ) as response:
+        if response.status_code != 200:
+            print(f"Import failed: {response.status_code} {response.text}", file=sys.stderr)
+            return 1
+        for line in response.iter_lines():
+            if not line:
+                continue
+            result = json.loads(line)
+            if "error" in result:
+                failed += 1
+                print(f"line {result['line']}: {result['error_description']}", file=sys.stderr)
+            else:
+                imported += 1
+            output.write(line.decode() + "\n")
+
+    if output is not sys.stdout:
+        output.close()
+    print(f"Imported {imported} clients, {failed} failed", file=sys.stderr)
+    return 0 if not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Production launcher for the OIDC provider (gunicorn).
+
+Named profiles:
+    sync     One process per CPU. Best for CPU-bound token signing.
+    gthread  Processes x threads. Overlaps store I/O (Redis) and slow clients.
+    gevent   Cooperative workers for I/O-heavy traffic (requires gevent).
+
+    python launcher.py serve --profile gthread --bind 0.0.0.0:5000
+    python launcher.py reload --pidfile /tmp/oidc.pid      # graceful reload
+    python launcher.py bench --profiles sync,gthread --users 20 --duration 15
+
+The app is preloaded in the master so the warmed state from create_app()
+is shared copy-on-write. Without STORE_URL provider state lives in each
+process, so multi-process profiles fall back to a single worker.
+"""
+
+import argparse
+import json
+import math
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from config import Config
+
+# Matches the CPU limit of the oidc_provider service in docker-compose.yml
+DEFAULT_CPU_LIMIT = 0.5
+
+
+def available_cpus() -> float:
+    """CPUs this process may use, honouring a cgroup v2 quota"""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    return float(os.cpu_count() or 1)
+
+
+def build_profile(name: str, cpus: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Gunicorn settings for a named profile.
+    Args:
+        name: One of sync, gthread, gevent
+        cpus: CPU budget to size workers for (default: available_cpus())
+    """
+    cpus = cpus or available_cpus()
+    cores = max(1, math.ceil(cpus))
+    common = {
+        "preload_app": True,
+        "timeout": 30,
+        "graceful_timeout": 30,
+        "keepalive": 5,
+        # Recycle workers periodically to bound slow leaks; jitter avoids synchronized restarts
+        "max_requests": 10000,
+        "max_requests_jitter": 1000,
+    }
+
+    if name == "sync":
+        # Signing holds the GIL; more processes than cores only adds context switches
+        profile = {"worker_class": "sync", "workers": cores + (1 if cpus >= 1 else 0), "threads": 1}
+    elif name == "gthread":
+        profile = {"worker_class": "gthread", "workers": cores, "threads": 8}
+    elif name == "gevent":
+        try:
+            import gevent  # noqa: F401
+        except ImportError:
+            raise RuntimeError("The gevent profile requires the 'gevent' package.")
+        profile = {"worker_class": "gevent", "workers": cores, "worker_connections": 1000}
+    else:
+        raise ValueError(f"Unknown profile: {name}")
+
+    if not Config.STORE_URL and profile["workers"] > 1:
+        print("STORE_URL not set: provider state is per-process, running a single worker", file=sys.stderr)
+        profile["workers"] = 1
+    return {**common, **profile}
+
+
+def held_device_polls(settings: Dict[str, Any]) -> int:
+    """
+    Device polls a worker may hold open at once without starving other requests.
+    Only gevent can hold enough for long-polling to matter; with the others, polls
+    beyond this back off to DEVICE_POLL_MAX_INTERVAL instead.
+    """
+    if settings["worker_class"] == "gevent":
+        return settings["worker_connections"] // 2
+    return settings.get("threads", 1) // 4
+
+
+def _post_worker_init(worker) -> None:
+    # Each worker handles the profiling signal itself (see profiling.py)
+    from profiling import install_signal_handler
+    install_signal_handler()
+
+
+def serve(profile: str, bind: str, pidfile: Optional[str] = None, cpus: Optional[float] = None) -> None:
+    """Run gunicorn in-process with the given profile"""
+    from gunicorn.app.base import BaseApplication
+
+    settings = build_profile(profile, cpus)
+    settings.update({"bind": bind, "post_worker_init": _post_worker_init})
+    if pidfile:
+        settings["pidfile"] = pidfile
+
+    class ProviderApplication(BaseApplication):
+        def load_config(self):
+            for key, value in settings.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            import threading
+            from app import create_app
+            app = create_app()
+            slots = held_device_polls(settings)
+            app.config["DEVICE_POLL_MAX_HELD"] = slots
+            app.extensions["held_device_polls"] = threading.BoundedSemaphore(slots)
+            return app
+
+    ProviderApplication().run()
+
+
+def reload(pidfile: str) -> None:
+    """Gracefully reload workers: gunicorn starts new workers before stopping old ones on HUP"""
+    with open(pidfile) as f:
+        os.kill(int(f.read().strip()), signal.SIGHUP)
+
+
+def wait_until_ready(url: str, timeout: float = 30) -> None:
+    import requests
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{url}/.well-known/openid-configuration", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Provider at {url} did not become ready")
+
+
+def bench(
+    profiles: List[str],
+    users: int,
+    duration: float,
+    cpus: float = DEFAULT_CPU_LIMIT,
+    port: int = 5055
+) -> Dict[str, Any]:
+    """
+    Run the load generator against each profile and report throughput per CPU core.
+    Workers are sized for `cpus`; to enforce the limit, run inside the
+    container (or under a cgroup) that applies it.
+    """
+    from loadgen import HttpTransport, run_load
+
+    results = {}
+    for name in profiles:
+        url = f"http://127.0.0.1:{port}"
+        try:
+            settings = build_profile(name, cpus)
+        except (RuntimeError, ValueError) as e:
+            results[name] = {"error": str(e)}
+            continue
+        server = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "serve", "--profile", name,
+             "--bind", f"127.0.0.1:{port}", "--cpus", str(cpus)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            wait_until_ready(url)
+            report = run_load(lambda: HttpTransport(url), users=users, duration=duration)
+        except Exception as e:
+            results[name] = {"error": str(e)}
+            continue
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=60)
+
+        requests_per_second = sum(e["throughput_rps"] for e in report["endpoints"].values())
+        results[name] = {
+            "settings": {k: v for k, v in settings.items() if k in ("worker_class", "workers", "threads")},
+            "flows_per_second": report["flows_per_second"],
+            "flows_per_second_per_cpu": round(report["flows_per_second"] / cpus, 2),
+            "requests_per_second": round(requests_per_second, 2),
+            "requests_per_second_per_cpu": round(requests_per_second / cpus, 2),
+            "flows_failed": report["flows_failed"],
+            "token_p99_ms": report["endpoints"].get("token", {}).get("p99_ms")
+        }
+    return {"cpus": cpus, "users": users, "duration_s": duration, "profiles": results}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run the OIDC provider under gunicorn")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_cmd = commands.add_parser("serve", help="Start the server")
+    serve_cmd.add_argument("--profile", default=os.environ.get("GUNICORN_PROFILE", "gthread"))
+    serve_cmd.add_argument("--bind", default=os.environ.get("GUNICORN_BIND", "0.0.0.0:5000"))
+    serve_cmd.add_argument("--pidfile")
+    serve_cmd.add_argument("--cpus", type=float, help="CPU budget to size workers for")
+
+    reload_cmd = commands.add_parser("reload", help="Gracefully reload a running server")
+    reload_cmd.add_argument("--pidfile", required=True)
+
+    bench_cmd = commands.add_parser("bench", help="Benchmark each profile with loadgen")
+    bench_cmd.add_argument("--profiles", default="sync,gthread")
+    bench_cmd.add_argument("--users", type=int, default=20)
+    bench_cmd.add_argument("--duration", type=float, default=15)
+    bench_cmd.add_argument("--cpus", type=float, default=DEFAULT_CPU_LIMIT)
+    bench_cmd.add_argument("--port", type=int, default=5055)
+    bench_cmd.add_argument("--output", help="Write the JSON report to this file")
+
+    args = parser.parse_args(argv)
+    if args.command == "serve":
+        serve(args.profile, args.bind, args.pidfile, args.cpus)
+    elif args.command == "reload":
+        reload(args.pidfile)
+    else:
+        report = bench(args.profiles.split(","), args.users, args.duration, args.cpus, args.port)
+        output = json.dumps(report, indent=2)
+        if args.output:
+            with open(args.output, "w") as f:
+                f.write(output)
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+OIDC Provider Load Generator
+
+Drives the complete flow (discovery -> authorize -> login -> consent ->
+token -> userinfo -> refresh) with N concurrent virtual users and reports
+per-endpoint throughput and latency percentiles as JSON.
+
+Runs in-process against the Flask test client by default, or against a
+live server (e.g. gunicorn) with --url.
+
+    python loadgen.py --users 20 --iterations 50
+    python loadgen.py --url http://127.0.0.1:5000 --users 50 --duration 60
+    OIDC_PASSWORD=... python loadgen.py --url https://idp.example.com --client-id probe --username probe-user
+"""
+
+import argparse
+import base64
+import contextlib
+import hashlib
+import json
+import math
+import os
+import re
+import secrets
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+from urllib.parse import urlparse, parse_qs
+
+CLIENT_ID = "client123"
+CLIENT_SECRET = "secret123"
+REDIRECT_URI = "http://localhost:8080/callback"
+SCOPE = "openid profile email"
+USERNAME = "alice"
+PASSWORD = "alicepassword"
+
+
+
+class Credentials(NamedTuple):
+    """Client and end-user the flow signs in as"""
+    client_id: str = CLIENT_ID
+    client_secret: str = CLIENT_SECRET
+    username: str = USERNAME
+    password: str = PASSWORD
+    redirect_uri: str = REDIRECT_URI
+
+
+# Seeded demo client and user (models.py)
+DEMO_CREDENTIALS = Credentials()
+
+AUTH_REQUEST_RE = re.compile(r'name="auth_request" value="([^"]*)"')
+SERVER_TIMING_RE = re.compile(r'([\w-]+);dur=([\d.]+)')
+
+
+class Response:
+    """Minimal response shared by both transports"""
+
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self) -> Dict[str, Any]:
+        return json.loads(self.body)
+
+
+class FlaskTransport:
+    """In-process transport using the Flask test client (one cookie jar per user)"""
+
+    def __init__(self, app):
+        self._client = app.test_client()
+
+    def request(self, method: str, path: str, params=None, data=None, headers=None) -> Response:
+        response = self._client.open(
+            path, method=method, query_string=params, data=data, headers=headers
+        )
+        return Response(response.status_code, dict(response.headers), response.get_data())
+
+
+class HttpTransport:
+    """Live transport using a pooled requests.Session (one cookie jar per user)"""
+
+    def __init__(self, base_url: str):
+        import requests
+        self._base_url = base_url.rstrip("/")
+        self._session = requests.Session()
+
+    def request(self, method: str, path: str, params=None, data=None, headers=None) -> Response:
+        response = self._session.request(
+            method, self._base_url + path, params=params, data=data,
+            headers=headers, allow_redirects=False, timeout=30
+        )
+        return Response(response.status_code, dict(response.headers), response.content)
+
+
+class Recorder:
+    """Per-user latency samples; merged after the run to avoid lock contention"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.phases: Dict[str, Dict[str, List[float]]] = {}
+
+    def call(self, name: str, transport, method: str, path: str, expect=(200,), **kwargs) -> Response:
+        start = time.perf_counter()
+        response = transport.request(method, path, **kwargs)
+        self.samples.setdefault(name, []).append(time.perf_counter() - start)
+
+        # Phase breakdown when the provider runs with SERVER_TIMING_ENABLED
+        server_timing = response.headers.get("Server-Timing")
+        if server_timing:
+            phases = self.phases.setdefault(name, {})
+            for phase, dur in SERVER_TIMING_RE.findall(server_timing):
+                phases.setdefault(phase, []).append(float(dur))
+        if response.status not in expect:
+            self.errors[name] = self.errors.get(name, 0) + 1
+            raise FlowError(f"{name} returned {response.status}")
+        return response
+
+
+class FlowError(Exception):
+    pass
+
+
+def run_flow(transport, recorder: Recorder, credentials: Credentials = DEMO_CREDENTIALS) -> None:
+    """Run one complete authorization code flow; raises FlowError on failure"""
+    code_verifier = base64.urlsafe_b64encode(os.urandom(32)).rstrip(b'=').decode()
+    code_challenge = base64.urlsafe_b64encode(
+        hashlib.sha256(code_verifier.encode()).digest()
+    ).rstrip(b'=').decode()
+    basic = base64.b64encode(f"{credentials.client_id}:{credentials.client_secret}".encode()).decode()
+    token_headers = {"Authorization": f"Basic {basic}"}
+
+    recorder.call("discovery", transport, "GET", "/.well-known/openid-configuration")
+
+    response = recorder.call("authorize", transport, "GET", "/authorize", expect=(200, 302), params={
+        "response_type": "code",
+        "client_id": credentials.client_id,
+        "redirect_uri": credentials.redirect_uri,
+        "scope": SCOPE,
+        "state": secrets.token_urlsafe(8),
+        "nonce": secrets.token_urlsafe(8),
+        "code_challenge": code_challenge,
+        "code_challenge_method": "S256"
+    })
+
+    # An SSO session or remembered consent can skip the login and consent pages
+    if response.status == 200 and b'name="password"' in response.body:
+        match = AUTH_REQUEST_RE.search(response.body.decode())
+        response = recorder.call("login", transport, "POST", "/authorize", expect=(200, 302), data={
+            "username": credentials.username,
+            "password": credentials.password,
+            "auth_request": match.group(1) if match else ""
+        })
+    if response.status == 200:
+        match = AUTH_REQUEST_RE.search(response.body.decode())
+        response = recorder.call("consent", transport, "POST", "/consent", expect=(302,), data={
+            "action": "approve",
+            "auth_request": match.group(1) if match else ""
+        })
+
+    location = response.headers.get("Location", "")
+    code = parse_qs(urlparse(location).query).get("code", [None])[0]
+    if not code:
+        raise FlowError(f"no authorization code in redirect: {location}")
+
+    tokens = recorder.call("token", transport, "POST", "/token", headers=token_headers, data={
+        "grant_type": "authorization_code",
+        "code": code,
+        "client_id": credentials.client_id,
+        "code_verifier": code_verifier
+    }).json()
+
+    recorder.call("userinfo", transport, "GET", "/userinfo", headers={
+        "Authorization": f"Bearer {tokens['access_token']}"
+    })
+
+    recorder.call("refresh", transport, "POST", "/token", headers=token_headers, data={
+        "grant_type": "refresh_token",
+        "refresh_token": tokens["refresh_token"]
+    })
+
+
+def percentile(sorted_samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_samples:
+        return 0.0
+    rank = max(math.ceil(pct / 100.0 * len(sorted_samples)) - 1, 0)
+    return sorted_samples[min(rank, len(sorted_samples) - 1)]
+
+
+def summarize(recorders: List[Recorder], elapsed: float) -> Dict[str, Dict[str, Any]]:
+    merged: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    phases: Dict[str, Dict[str, List[float]]] = {}
+    for recorder in recorders:
+        for name, samples in recorder.samples.items():
+            merged.setdefault(name, []).extend(samples)
+        for name, by_phase in recorder.phases.items():
+            for phase, durations in by_phase.items():
+                phases.setdefault(name, {}).setdefault(phase, []).extend(durations)
+        for name, count in recorder.errors.items():
+            errors[name] = errors.get(name, 0) + count
+
+    endpoints = {}
+    for name, samples in merged.items():
+        samples.sort()
+        endpoints[name] = {
+            "count": len(samples),
+            "errors": errors.get(name, 0),
+            "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+            "mean_ms": round(sum(samples) / len(samples) * 1000, 3),
+            "p50_ms": round(percentile(samples, 50) * 1000, 3),
+            "p95_ms": round(percentile(samples, 95) * 1000, 3),
+            "p99_ms": round(percentile(samples, 99) * 1000, 3),
+            "max_ms": round(samples[-1] * 1000, 3)
+        }
+        if name in phases:
+            endpoints[name]["phases_mean_ms"] = {
+                phase: round(sum(durations) / len(durations), 3)
+                for phase, durations in phases[name].items()
+            }
+    return endpoints
+
+
+def run_load(
+    transport_factory: Callable[[], Any],
+    users: int = 10,
+    iterations: int = 10,
+    duration: Optional[float] = None,
+    fresh_session: bool = True,
+    credentials: Credentials = DEMO_CREDENTIALS
+) -> Dict[str, Any]:
+    """
+    Run the flow with `users` concurrent virtual users.
+    Args:
+        transport_factory: Returns a new transport (cookie jar) per call
+        users: Number of concurrent virtual users
+        iterations: Flows per user (ignored when duration is set)
+        duration: Run for this many seconds instead of a fixed iteration count
+        fresh_session: Start every flow with new cookies (full login each time)
+        credentials: Client and user to sign in as
+    Returns:
+        JSON-serializable report
+    """
+    recorders = [Recorder() for _ in range(users)]
+    completed = [0] * users
+    failed = [0] * users
+    failures: List[str] = []
+    start_barrier = threading.Barrier(users + 1)
+
+    def virtual_user(i: int) -> None:
+        transport = transport_factory()
+        start_barrier.wait()
+        deadline = time.monotonic() + duration if duration else None
+        n = 0
+        while (deadline and time.monotonic() < deadline) or (not deadline and n < iterations):
+            n += 1
+            if fresh_session and n > 1:
+                transport = transport_factory()
+            try:
+                run_flow(transport, recorders[i], credentials)
+                completed[i] += 1
+            except Exception as e:
+                failed[i] += 1
+                if len(failures) < 20:
+                    failures.append(str(e))
+
+    threads = [threading.Thread(target=virtual_user, args=(i,), daemon=True) for i in range(users)]
+    for t in threads:
+        t.start()
+    start_barrier.wait()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "users": users,
+        "duration_s": round(elapsed, 3),
+        "flows_completed": sum(completed),
+        "flows_failed": sum(failed),
+        "flows_per_second": round(sum(completed) / elapsed, 2) if elapsed else 0.0,
+        "failures": failures,
+        "endpoints": summarize(recorders, elapsed)
+    }
+
+
+def add_credential_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Options for the client and user the flow signs in as. Each falls back to
+    an OIDC_* environment variable (keeping secrets out of the process list),
+    then to the seeded demo data.
+    """
+    for option, env, default, help in (
+        ("--client-id", "OIDC_CLIENT_ID", CLIENT_ID, "Client running the authorization code flow"),
+        ("--client-secret", "OIDC_CLIENT_SECRET", CLIENT_SECRET, "Its secret"),
+        ("--redirect-uri", "OIDC_REDIRECT_URI", REDIRECT_URI, "A redirect URI registered for the client"),
+        ("--username", "OIDC_USERNAME", USERNAME, "User signing in"),
+        ("--password", "OIDC_PASSWORD", PASSWORD, "Their password")
+    ):
+        parser.add_argument(option, default=os.environ.get(env, default), help=f"{help} (env {env})")
+
+
+def credentials_from_args(args: argparse.Namespace) -> Credentials:
+    return Credentials(args.client_id, args.client_secret, args.username, args.password, args.redirect_uri)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Load test the OIDC provider")
+    parser.add_argument("--url", help="Base URL of a live provider (default: in-process test client)")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent virtual users")
+    parser.add_argument("--iterations", type=int, default=10, help="Flows per user")
+    parser.add_argument("--duration", type=float, help="Run for N seconds instead of --iterations")
+    parser.add_argument("--reuse-session", action="store_true",
+                        help="Keep cookies between flows (exercises SSO reuse)")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    add_credential_arguments(parser)
+    args = parser.parse_args(argv)
+
+    quiet = contextlib.ExitStack()
+    if args.url:
+        factory = lambda: HttpTransport(args.url)
+    else:
+        from app import app
+        factory = lambda: FlaskTransport(app)
+        # The provider logs to stdout; keep the report readable
+        quiet.enter_context(contextlib.redirect_stdout(quiet.enter_context(open(os.devnull, "w"))))
+
+    with quiet:
+        report = run_load(
+            factory, users=args.users, iterations=args.iterations,
+            duration=args.duration, fresh_session=not args.reuse_session,
+            credentials=credentials_from_args(args)
+        )
+    report["target"] = args.url or "in-process"
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+    return 0 if report["flows_failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+# flask-oidc-provider/metrics.py
+
+"""
+Low-overhead Prometheus-style metrics.
+
+Series are created once per label tuple and reused; recording a sample is a
+dict lookup, a bisect and two increments under a per-metric lock. Labels are
+passed as tuples in the order of `labelnames`.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+from flask import Flask, Response, g, has_request_context, request
+
+# Latency buckets in seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _label_string(labelnames: Sequence[str], labels: Tuple[str, ...]) -> str:
+    return ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(labelnames, labels))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._labels: Dict[Tuple[str, ...], str] = {}
+        self._lock = threading.Lock()
+
+    def _series(self, labels: Tuple[str, ...]) -> List[float]:
+        with self._lock:
+            if labels not in self._values:
+                self._labels[labels] = _label_string(self.labelnames, labels)
+                self._values[labels] = [0.0]
+            return self._values[labels]
+
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1) -> None:
+        series = self._values.get(labels) or self._series(labels)
+        with self._lock:
+            series[0] += amount
+
+    def value(self, labels: Tuple[str, ...] = ()) -> float:
+        series = self._values.get(labels)
+        return series[0] if series else 0.0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, series in list(self._values.items()):
+            label_str = self._labels[labels]
+            lines.append(f"{self.name}{{{label_str}}} {series[0]}" if label_str else f"{self.name} {series[0]}")
+        return lines
+
+
+class _HistogramSeries:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series_map: Dict[Tuple[str, ...], _HistogramSeries] = {}
+        self._labels: Dict[Tuple[str, ...], str] = {}
+        self._lock = threading.Lock()
+
+    def _series(self, labels: Tuple[str, ...]) -> _HistogramSeries:
+        with self._lock:
+            if labels not in self._series_map:
+                self._labels[labels] = _label_string(self.labelnames, labels)
+                # One slot per bucket plus +Inf
+                self._series_map[labels] = _HistogramSeries(len(self.buckets) + 1)
+            return self._series_map[labels]
+
+    def observe(self, value: float, labels: Tuple[str, ...] = ()) -> None:
+        series = self._series_map.get(labels) or self._series(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series.counts[index] += 1
+            series.sum += value
+            series.count += 1
+
+    def count(self, labels: Tuple[str, ...] = ()) -> int:
+        series = self._series_map.get(labels)
+        return series.count if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, series in list(self._series_map.items()):
+            label_str = self._labels[labels]
+            prefix = f"{label_str}," if label_str else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{prefix}le="{le}"}} {cumulative}')
+            suffix = f"{{{label_str}}}" if label_str else ""
+            lines.append(f"{self.name}_sum{suffix} {series.sum}")
+            lines.append(f"{self.name}_count{suffix} {series.count}")
+        return lines
+
+
+class Gauge:
+    """Gauge whose values are read from callbacks at scrape time"""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._functions: Dict[Tuple[str, ...], Callable[[], float]] = {}
+
+    def set_function(self, fn: Callable[[], float], labels: Tuple[str, ...] = ()) -> None:
+        self._functions[labels] = fn
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for labels, fn in list(self._functions.items()):
+            label_str = _label_string(self.labelnames, labels)
+            lines.append(f"{self.name}{{{label_str}}} {fn()}" if label_str else f"{self.name} {fn()}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_duration = registry.register(Histogram(
+    "oidc_http_request_duration_seconds",
+    "HTTP request latency by route and status",
+    ("route", "method", "status")
+))
+tokens_issued = registry.register(Counter(
+    "oidc_tokens_issued_total",
+    "Tokens minted by type",
+    ("type",)
+))
+jwt_sign_duration = registry.register(Histogram(
+    "oidc_jwt_sign_seconds",
+    "Time spent signing JWTs"
+))
+jwt_verify_duration = registry.register(Histogram(
+    "oidc_jwt_verify_seconds",
+    "Time spent verifying JWTs"
+))
+cache_requests = registry.register(Counter(
+    "oidc_cache_requests_total",
+    "Cache lookups by cache and result (hit/miss)",
+    ("cache", "result")
+))
+rate_limit_rejections = registry.register(Counter(
+    "oidc_rate_limit_rejections_total",
+    "Requests rejected by rate limiting",
+    ("endpoint",)
+))
+phase_duration = registry.register(Histogram(
+    "oidc_phase_duration_seconds",
+    "Time spent in each request processing phase",
+    ("phase",)
+))
+audit_events_dropped = registry.register(Counter(
+    "oidc_audit_events_dropped_total",
+    "Audit events dropped because the audit buffer was full or their write failed",
+    ("reason",)
+))
+audit_fsync_duration = registry.register(Histogram(
+    "oidc_audit_fsync_seconds",
+    "Time spent in each group-commit fsync of the audit log"
+))
+store_entries = registry.register(Gauge(
+    "oidc_store_entries",
+    "Entries held in each provider store",
+    ("store",)
+))
+
+_phase_labels: Dict[str, Tuple[str]] = {}
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """
+    Time a processing phase.
+    The duration feeds oidc_phase_duration_seconds and, inside a request,
+    the Server-Timing header.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        labels = _phase_labels.get(name) or _phase_labels.setdefault(name, (name,))
+        phase_duration.observe(elapsed, labels)
+        if has_request_context():
+            timings = g.get("_server_timing")
+            if timings is None:
+                timings = g._server_timing = {}
+            timings[name] = timings.get(name, 0.0) + elapsed
+
+
+def register_store(name: str, store) -> None:
+    """Report len(store) under oidc_store_entries{store=name}"""
+    store_entries.set_function(lambda: len(store), (name,))
+
+
+def init_metrics(app: Flask, registry: Registry = registry) -> None:
+    """Time every request and expose the registry at /metrics"""
+    status_labels: Dict[int, str] = {}
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop("_metrics_start", None)
+        if start is not None:
+            rule = request.url_rule.rule if request.url_rule else "<unmatched>"
+            status = status_labels.get(response.status_code)
+            if status is None:
+                status = status_labels.setdefault(response.status_code, str(response.status_code))
+            http_request_duration.observe(time.perf_counter() - start, (rule, request.method, status))
+        return response
+
+    def metrics_view():
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+    app.add_url_rule("/metrics", "metrics", metrics_view)
+
+
+def init_server_timing(app: Flask) -> None:
+    """Emit recorded phases as a Server-Timing header (durations in ms)"""
+
+    @app.after_request
+    def _server_timing_header(response):
+        timings = g.pop("_server_timing", None)
+        if timings:
+            response.headers["Server-Timing"] = ", ".join(
+                f"{name};dur={elapsed * 1000:.3f}" for name, elapsed in timings.items()
+            )
+        return response
@@ -6,9 +6,11 @@ For production, replace with persistent database/storage.
 """
 
 import time
+from store import StoreMapping, create_store
 
-# Registered OAuth clients (client_id as key)
-clients = {
+# OAuth clients (client_id as key): the seeded ones below, plus clients
+# registered at runtime, which live in the shared store
+clients = StoreMapping(create_store("clients"), {
     "client123": {
         "client_id": "client123",
         "client_secret": "secret123",
@@ -16,8 +18,34 @@ clients = {
         "grant_types": ["authorization_code", "refresh_token"],
         "response_types": ["code"],
         "scope": "openid profile email"
+    },
+    "service123": {
+        "client_id": "service123",
+        "client_secret": "servicesecret123",
+        "redirect_uris": [],
+        "grant_types": ["client_credentials"],
+        "response_types": [],
+        "scope": "api.read api.write"
+    },
+    "device123": {
+        "client_id": "device123",
+        "client_secret": "devicesecret123",
+        "redirect_uris": [],
+        "grant_types": ["urn:ietf:params:oauth:grant-type:device_code", "refresh_token"],
+        "response_types": [],
+        "scope": "openid profile email"
+    },
+    "gateway123": {
+        "client_id": "gateway123",
+        "client_secret": "gatewaysecret123",
+        "redirect_uris": [],
+        "grant_types": ["urn:ietf:params:oauth:grant-type:token-exchange"],
+        "response_types": [],
+        "scope": "openid profile email",
+        # Audiences this client may exchange tokens for (provisioned only, not registrable)
+        "token_exchange_audiences": ["https://orders.example.com"]
     }
-}
+})
 
 # User store keyed by username
 users = {
@@ -35,8 +63,32 @@ users = {
     }
 }
 
-# Authorization codes store (code: {details})
-authorization_codes = {}
+# Username by subject identifier, for token lookups
+users_by_sub = {user["sub"]: username for username, user in users.items()}
+
+def update_user(username, **fields):
+    """
+    Update a user record in place.
+    Bumps its version so responses cached from the old record are rebuilt.
+    """
+    user = users[username]
+    users_by_sub.pop(user["sub"], None)
+    user.update(fields)
+    user["version"] = user.get("version", 0) + 1
+    users_by_sub[user["sub"]] = username
+    return user
+
+# Pending authorization requests (handle: {request parameters})
+authorization_requests = create_store("authorization_requests")
+
+# Provider-side SSO sessions (sid: {user, auth_time})
+sso_sessions = create_store("sso_sessions")
+
+# Reusable client credentials access tokens ("client_id|scope": {access_token, expires_at})
+client_credentials_tokens = create_store("client_credentials_tokens")
+
+# Authorization codes store (code: {details}); unredeemed codes expire with the store TTL
+authorization_codes = create_store("authorization_codes")
 
 # Access and refresh tokens store (token: {details})
 tokens = {}
@@ -0,0 +1,105 @@
+# flask-oidc-provider/profiling.py
+
+"""
+On-demand request profiling for live workers.
+
+Disabled unless PROFILING_ENABLED is set; when disabled no hooks are
+installed. When enabled, a request is profiled with cProfile if either:
+
+- it carries an X-Profile header of the form "<timestamp>:<signature>",
+  where signature is HMAC-SHA256(ADMIN_TOKEN, timestamp), or
+- the worker was armed with PROFILING_SIGNAL (SIGUSR2 by default) and the
+  request falls in the PROFILING_SAMPLE_RATE sample. Arming lasts
+  PROFILING_WINDOW seconds.
+
+Profiles are written to PROFILING_DIR/<endpoint>/<ms>-<pid>-<n>.prof and can
+be read with `python -m pstats` or snakeviz.
+
+Under gunicorn, call install_signal_handler() from a post_worker_init hook
+so each worker handles the signal itself.
+"""
+
+import cProfile
+import itertools
+import os
+import random
+import signal
+import threading
+import time
+from typing import Optional
+
+from flask import Flask, g, request
+
+from auth.admin import verify_admin_signature
+from config import Config
+
+PROFILE_HEADER = "X-Profile"
+
+# cProfile cannot run two profilers at once; only one request is profiled at a time
+_profile_lock = threading.Lock()
+_armed_until = 0.0
+_sequence = itertools.count()
+
+
+def arm(window: float) -> None:
+    """Sample requests for the next `window` seconds"""
+    global _armed_until
+    _armed_until = time.monotonic() + window
+
+
+def install_signal_handler(window: Optional[float] = None, signum: Optional[int] = None) -> bool:
+    """
+    Arm sampling when the process receives the profiling signal.
+    Must be called from the main thread. Returns False if not possible.
+    """
+    window = window if window is not None else Config.PROFILING_WINDOW
+    signum = signum if signum is not None else getattr(signal, Config.PROFILING_SIGNAL, None)
+    if signum is None or threading.current_thread() is not threading.main_thread():
+        return False
+    signal.signal(signum, lambda *_: arm(window))
+    return True
+
+
+def _profile_path(directory: str, endpoint: str) -> str:
+    target = os.path.join(directory, endpoint.replace("/", "_"))
+    os.makedirs(target, exist_ok=True)
+    return os.path.join(target, f"{int(time.time() * 1000)}-{os.getpid()}-{next(_sequence)}.prof")
+
+
+def init_profiler(app: Flask) -> None:
+    """Install the profiling hooks if PROFILING_ENABLED is set"""
+    if not app.config.get("PROFILING_ENABLED"):
+        return
+
+    directory = app.config["PROFILING_DIR"]
+    sample_rate = app.config["PROFILING_SAMPLE_RATE"]
+    admin_token = app.config["ADMIN_TOKEN"]
+    install_signal_handler(app.config["PROFILING_WINDOW"])
+
+    def should_profile() -> bool:
+        if PROFILE_HEADER in request.headers:
+            return verify_admin_signature(request.headers[PROFILE_HEADER], key=admin_token)
+        return time.monotonic() < _armed_until and random.random() < sample_rate
+
+    @app.before_request
+    def _start_profile():
+        if should_profile() and _profile_lock.acquire(blocking=False):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler (e.g. a coverage tool) is active
+                _profile_lock.release()
+                return
+            g._profiler = profiler
+
+    @app.teardown_request
+    def _stop_profile(exc):
+        profiler = g.pop("_profiler", None)
+        if profiler is None:
+            return
+        try:
+            profiler.disable()
+            profiler.dump_stats(_profile_path(directory, request.endpoint or "unmatched"))
+        finally:
+            _profile_lock.release()
@@ -0,0 +1,12 @@
+# flask-oidc-provider/run.py
+
+"""
+Development entry point. Production servers can load `run:app` (or
+`app:create_app()`) the same way.
+"""
+
+from app import app
+from config import Config
+
+if __name__ == '__main__':
+    app.run(host="0.0.0.0", port=5000, debug=Config.DEBUG)
@@ -1,131 +1,382 @@
 #!/usr/bin/env python3
 """
-OIDC Provider Status Report and Test Summary
+OIDC Provider Status Probe
+
+Exercises a running provider and checks it against latency and error SLOs:
+
+1. Endpoint checks: discovery metadata, JWKS keys, every advertised
+   endpoint is routed, error responses for bad requests and the
+   client_credentials grant.
+2. A short timed run of the full authorization code flow (see loadgen.py)
+   measuring per-endpoint latency percentiles.
+3. /metrics scraped before and after the run for the server-side view:
+   request counts, mean latency per route and the 5xx rate.
+
+Exits 0 when healthy, 1 when a check fails or an SLO is breached and 2 when
+the provider is unreachable, so it can gate a deployment as a canary.
+
+    python status_report.py --url https://idp.example.com --duration 10
+    python status_report.py --slo token=150 --slo-file slos.json --json
+
+Against a real deployment, point it at a dedicated probe client and user
+with --client-id/--client-secret/--username/--password and
+--service-client-id/--service-client-secret (or the OIDC_* variables).
 """
 
-import requests
+import argparse
+import base64
+import contextlib
+import json
+import os
+import re
 import sys
+import time
 from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from loadgen import (
+    DEMO_CREDENTIALS, Credentials, FlaskTransport, HttpTransport,
+    add_credential_arguments, credentials_from_args, run_load
+)
+
+# p95 latency objectives per flow step, in milliseconds
+DEFAULT_SLOS = {
+    "discovery": 50,
+    "jwks": 50,
+    "authorize": 150,
+    "login": 150,
+    "consent": 150,
+    "token": 250,
+    "userinfo": 100,
+    "refresh": 250,
+    "client_credentials": 250
+}
+DEFAULT_MAX_ERROR_RATE = 0.01
+
+SERVICE_CLIENT_ID = "service123"
+SERVICE_CLIENT_SECRET = "servicesecret123"
+
+REQUIRED_METADATA = (
+    "issuer", "authorization_endpoint", "token_endpoint", "userinfo_endpoint",
+    "jwks_uri", "response_types_supported", "id_token_signing_alg_values_supported"
+)
+REQUEST_METRIC = "oidc_http_request_duration_seconds"
+METRIC_LINE_RE = re.compile(r'^([a-zA-Z_:][\w:]*)(?:\{(.*)\})? (\S+)$')
+METRIC_LABEL_RE = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+class ProviderUnreachable(Exception):
+    pass
+
+
+def _check(name: str, ok: bool, detail: str = "", latency: Optional[float] = None) -> Dict[str, Any]:
+    result = {"name": name, "ok": bool(ok), "detail": detail}
+    if latency is not None:
+        result["latency_ms"] = round(latency * 1000, 3)
+    return result
+
+
+def _timed(transport, method: str, path: str, **kwargs):
+    start = time.perf_counter()
+    response = transport.request(method, path, **kwargs)
+    return response, time.perf_counter() - start
 
-def check_service_status():
-    """Check if the OIDC provider is running"""
+
+def check_endpoints(transport) -> List[Dict[str, Any]]:
+    """
+    Probe each endpoint once.
+    Raises ProviderUnreachable if discovery cannot be fetched at all.
+    """
+    checks = []
     try:
-        response = requests.get("http://127.0.0.1:5000/.well-known/openid-configuration", timeout=5)
-        return response.status_code == 200
-    except:
-        return False
-
-def print_status_report():
-    """Print comprehensive status report"""
-    print("🏆 OIDC PROVIDER STATUS REPORT")
-    print("="*60)
-    print()
-    
-    # Check service status
-    service_running = check_service_status()
-    status_emoji = "🟢" if service_running else "🔴"
-    status_text = "RUNNING" if service_running else "STOPPED"
-    
-    print(f"📊 Service Status: {status_emoji} {status_text}")
-    print(f"🌐 Provider URL: http://127.0.0.1:5000")
-    print(f"📅 Report Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print()
-    
-    if service_running:
-        print("✅ AVAILABLE ENDPOINTS:")
-        endpoints = [
-            ("Discovery", "/.well-known/openid-configuration"),
-            ("JWKS", "/.well-known/jwks.json"),
-            ("Authorization", "/authorize"),
-            ("Token Exchange", "/token"),
-            ("User Info", "/userinfo"),
-            ("Client Registration", "/register"),
-            ("Consent", "/consent"),
-        ]
-        
-        for name, path in endpoints:
-            print(f"   • {name}: http://127.0.0.1:5000{path}")
-        print()
-    
-    print("🔧 IMPLEMENTED FEATURES:")
-    features = [
-        "✅ OpenID Connect 1.0 Compliance",
-        "✅ PKCE (Proof Key for Code Exchange)",
-        "✅ Authorization Code Flow",
-        "✅ JWT Token Generation (RS256)",
-        "✅ Dynamic Client Registration",
-        "✅ User Authentication & Consent",
-        "✅ Token Introspection",
-        "✅ UserInfo Endpoint",
-        "✅ JWKS Key Publishing",
-        "✅ Session Management",
-        "✅ Error Handling (RFC 6749)",
-        "✅ CORS Support",
-    ]
-    
-    for feature in features:
-        print(f"   {feature}")
-    print()
-    
-    print("🧪 TESTING STATUS:")
-    test_results = [
-        ("✅ Automated End-to-End Test", "PASSED - All flows working"),
-        ("✅ Unit Test Suite", "PASSED - 2/2 tests"),
-        ("✅ Discovery Endpoint", "PASSED - Metadata correct"),
-        ("✅ JWKS Endpoint", "PASSED - Keys published"),
-        ("✅ Authorization Flow", "PASSED - Login & consent"),
-        ("✅ Token Exchange", "PASSED - JWT generation"),
-        ("✅ UserInfo Access", "PASSED - Claims returned"),
-        ("✅ PKCE Validation", "PASSED - Security verified"),
-    ]
-    
-    for test, status in test_results:
-        print(f"   {test}: {status}")
-    print()
-    
-    print("👥 DEMO USERS:")
-    users = [
-        ("alice", "alicepassword", "Alice", "alice@example.com"),
-        ("bob", "bobpassword", "Bob", "bob@example.com"),
+        response, latency = _timed(transport, "GET", "/.well-known/openid-configuration")
+    except Exception as e:
+        raise ProviderUnreachable(str(e))
+
+    try:
+        metadata = response.json() if response.status == 200 else {}
+    except ValueError:
+        metadata = {}
+    missing = [key for key in REQUIRED_METADATA if key not in metadata]
+    checks.append(_check(
+        "discovery", response.status == 200 and not missing,
+        f"status {response.status}" + (f", missing {', '.join(missing)}" if missing else ""),
+        latency
+    ))
+
+    # Every advertised endpoint must be routed, whatever URL root the provider sees
+    for key in sorted(k for k in metadata if k.endswith("_endpoint")):
+        path = urlparse(metadata[key]).path or "/"
+        method = "POST" if key in ("token_endpoint", "registration_endpoint", "revocation_endpoint",
+                                   "introspection_endpoint") else "GET"
+        response, latency = _timed(transport, method, path)
+        checks.append(_check(
+            f"routed:{key}", response.status != 404 and response.status < 500,
+            f"{method} {path} -> {response.status}", latency
+        ))
+
+    response, latency = _timed(transport, "GET", urlparse(metadata.get("jwks_uri", "")).path
+                               or "/.well-known/jwks.json")
+    try:
+        keys = response.json().get("keys", []) if response.status == 200 else []
+    except ValueError:
+        keys = []
+    checks.append(_check(
+        "jwks", bool(keys) and all("kid" in key for key in keys),
+        f"status {response.status}, {len(keys)} key(s)", latency
+    ))
+
+    response, latency = _timed(transport, "GET", "/userinfo")
+    checks.append(_check("userinfo_rejects_anonymous", response.status == 401,
+                         f"status {response.status}", latency))
+
+    response, latency = _timed(transport, "POST", "/token", data={"grant_type": "password"})
+    checks.append(_check("token_rejects_bad_request", response.status in (400, 401),
+                         f"status {response.status}", latency))
+    return checks
+
+
+def check_client_credentials(transport, client_id: str, client_secret: str) -> Dict[str, Any]:
+    basic = base64.b64encode(f"{client_id}:{client_secret}".encode()).decode()
+    response, latency = _timed(transport, "POST", "/token", headers={"Authorization": f"Basic {basic}"},
+                               data={"grant_type": "client_credentials"})
+    try:
+        ok = response.status == 200 and "access_token" in response.json()
+    except ValueError:
+        ok = False
+    return _check("client_credentials", ok, f"status {response.status}", latency)
+
+
+def parse_metrics(text: str) -> Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float]:
+    """Parse Prometheus text exposition into {(name, sorted labels): value}"""
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        match = METRIC_LINE_RE.match(line)
+        if not match:
+            continue
+        name, labels, value = match.groups()
+        try:
+            samples[(name, tuple(sorted(METRIC_LABEL_RE.findall(labels or ""))))] = float(value)
+        except ValueError:
+            continue
+    return samples
+
+
+def scrape_metrics(transport) -> Optional[Dict]:
+    """Current metrics, or None when the provider does not expose /metrics"""
+    response = transport.request("GET", "/metrics")
+    if response.status != 200:
+        return None
+    return parse_metrics(response.body.decode())
+
+
+def metrics_delta(before: Dict, after: Dict) -> Dict[str, Any]:
+    """Server-side request counts, mean latency per route and 5xx rate between two scrapes"""
+    routes: Dict[str, Dict[str, float]] = {}
+    total = server_errors = 0.0
+    for (name, labels), value in after.items():
+        if name not in (f"{REQUEST_METRIC}_count", f"{REQUEST_METRIC}_sum"):
+            continue
+        delta = value - before.get((name, labels), 0.0)
+        label_map = dict(labels)
+        route = routes.setdefault(label_map.get("route", ""), {"count": 0.0, "sum": 0.0})
+        if name.endswith("_count"):
+            route["count"] += delta
+            total += delta
+            if label_map.get("status", "").startswith("5"):
+                server_errors += delta
+        else:
+            route["sum"] += delta
+
+    return {
+        "requests": int(total),
+        "server_error_rate": round(server_errors / total, 4) if total else 0.0,
+        "routes": {
+            route: {"count": int(v["count"]), "mean_ms": round(v["sum"] / v["count"] * 1000, 3)}
+            for route, v in sorted(routes.items()) if v["count"]
+        }
+    }
+
+
+def evaluate_slos(
+    endpoints: Dict[str, Dict[str, Any]],
+    slos: Dict[str, float],
+    max_error_rate: float
+) -> List[Dict[str, Any]]:
+    """Compare measured p95 latency and error rate per endpoint with the objectives"""
+    results = []
+    for name, stats in sorted(endpoints.items()):
+        error_rate = stats["errors"] / stats["count"] if stats["count"] else 0.0
+        target = slos.get(name)
+        ok = error_rate <= max_error_rate and (target is None or stats["p95_ms"] <= target)
+        results.append({
+            "endpoint": name,
+            "ok": ok,
+            "p95_ms": stats["p95_ms"],
+            "slo_p95_ms": target,
+            "error_rate": round(error_rate, 4)
+        })
+    return results
+
+
+def run_probe(
+    transport_factory: Callable[[], Any],
+    duration: float = 5.0,
+    users: int = 2,
+    slos: Optional[Dict[str, float]] = None,
+    max_error_rate: float = DEFAULT_MAX_ERROR_RATE,
+    credentials: Credentials = DEMO_CREDENTIALS,
+    service_client: Tuple[str, str] = (SERVICE_CLIENT_ID, SERVICE_CLIENT_SECRET)
+) -> Dict[str, Any]:
+    """
+    Run all checks and the timed flow against a provider.
+    `credentials` sign in for the timed flow and `service_client`
+    (client_id, client_secret) is used for the client_credentials check.
+    Returns a JSON-serializable report whose "status" is healthy,
+    degraded or unreachable.
+    """
+    slos = {**DEFAULT_SLOS, **(slos or {})}
+    transport = transport_factory()
+    report: Dict[str, Any] = {"generated_at": datetime.now().isoformat(timespec="seconds")}
+
+    try:
+        checks = check_endpoints(transport)
+    except ProviderUnreachable as e:
+        report.update(status="unreachable", error=str(e))
+        return report
+    client_credentials = check_client_credentials(transport, *service_client)
+    checks.append(client_credentials)
+
+    before = scrape_metrics(transport)
+    load = run_load(transport_factory, users=users, duration=duration, credentials=credentials)
+    after = scrape_metrics(transport) if before is not None else None
+
+    endpoints = dict(load["endpoints"])
+    if "latency_ms" in client_credentials:
+        latency = client_credentials["latency_ms"]
+        endpoints["client_credentials"] = {
+            "count": 1, "errors": 0 if client_credentials["ok"] else 1,
+            "p50_ms": latency, "p95_ms": latency, "p99_ms": latency
+        }
+    slo_results = evaluate_slos(endpoints, slos, max_error_rate)
+
+    flow_error_rate = load["flows_failed"] / max(load["flows_completed"] + load["flows_failed"], 1)
+    checks.append(_check(
+        "flow", load["flows_completed"] > 0 and flow_error_rate <= max_error_rate,
+        f"{load['flows_completed']} completed, {load['flows_failed']} failed, "
+        f"{load['flows_per_second']} flows/s"
+    ))
+
+    server = metrics_delta(before, after) if after is not None else None
+    if server is not None:
+        checks.append(_check(
+            "server_error_rate", server["server_error_rate"] <= max_error_rate,
+            f"{server['server_error_rate']:.2%} of {server['requests']} requests"
+        ))
+
+    healthy = all(c["ok"] for c in checks) and all(s["ok"] for s in slo_results)
+    report.update(
+        status="healthy" if healthy else "degraded",
+        checks=checks,
+        slos=slo_results,
+        flow={k: load[k] for k in ("duration_s", "flows_completed", "flows_failed",
+                                   "flows_per_second", "failures")},
+        server_metrics=server
+    )
+    return report
+
+
+def format_report(report: Dict[str, Any], target: str) -> str:
+    lines = [
+        "OIDC PROVIDER STATUS REPORT",
+        "=" * 60,
+        f"Provider: {target}",
+        f"Generated: {report['generated_at']}",
+        f"Status: {report['status'].upper()}",
     ]
-    
-    for username, password, name, email in users:
-        print(f"   • {username} / {password} ({name} - {email})")
-    print()
-    
-    print("🔑 PRE-REGISTERED CLIENT:")
-    print(f"   • Client ID: client123")
-    print(f"   • Client Secret: secret123")
-    print(f"   • Redirect URI: http://localhost:8080/callback")
-    print(f"   • Scopes: openid profile email")
-    print()
-    
-    print("🚀 QUICK START COMMANDS:")
-    print("   # Start the provider:")
-    print("   python app.py")
-    print()
-    print("   # Run automated test:")
-    print("   python test_flow_complete.py")
-    print()
-    print("   # Run interactive browser test:")
-    print("   python test_client_enhanced.py")
-    print()
-    print("   # Run unit tests:")
-    print("   pytest tests/ -v")
-    print()
-    
-    if service_running:
-        print("🌟 READY FOR PRODUCTION DEPLOYMENT!")
-        print("   • All core OIDC features implemented")
-        print("   • Security best practices followed")
-        print("   • Comprehensive test coverage")
-        print("   • Standards compliant (OAuth 2.0 + OIDC 1.0)")
+    if report["status"] == "unreachable":
+        lines.append(f"Error: {report['error']}")
+        return "\n".join(lines)
+
+    lines += ["", "CHECKS:"]
+    for check in report["checks"]:
+        latency = f" ({check['latency_ms']} ms)" if "latency_ms" in check else ""
+        lines.append(f"   [{'PASS' if check['ok'] else 'FAIL'}] {check['name']}: {check['detail']}{latency}")
+
+    lines += ["", "LATENCY SLOs (p95):"]
+    for slo in report["slos"]:
+        target_ms = f"{slo['slo_p95_ms']} ms" if slo["slo_p95_ms"] is not None else "none"
+        lines.append(
+            f"   [{'PASS' if slo['ok'] else 'FAIL'}] {slo['endpoint']:<20} "
+            f"{slo['p95_ms']:>9.3f} ms  (slo {target_ms}, errors {slo['error_rate']:.2%})"
+        )
+
+    server = report["server_metrics"]
+    lines += ["", "SERVER METRICS (during probe):"]
+    if server is None:
+        lines.append("   /metrics not exposed (METRICS_ENABLED=false)")
+    else:
+        lines.append(f"   {server['requests']} requests, {server['server_error_rate']:.2%} 5xx")
+        for route, stats in server["routes"].items():
+            lines.append(f"   {route:<40} {stats['count']:>6}  mean {stats['mean_ms']} ms")
+    lines += ["", "=" * 60]
+    return "\n".join(lines)
+
+
+def load_slos(path: Optional[str], overrides: List[str]) -> Dict[str, float]:
+    """SLOs from a JSON file ({"token": 200, ...}) and name=ms overrides"""
+    slos: Dict[str, float] = {}
+    if path:
+        with open(path) as f:
+            slos.update({name: float(ms) for name, ms in json.load(f).items()})
+    for override in overrides:
+        name, _, ms = override.partition("=")
+        slos[name] = float(ms)
+    return slos
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Probe a running OIDC provider against its SLOs")
+    parser.add_argument("--url", default="http://127.0.0.1:5000", help="Base URL of the provider")
+    parser.add_argument("--in-process", action="store_true", help="Probe the app in-process instead of --url")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds of timed flows")
+    parser.add_argument("--users", type=int, default=2, help="Concurrent virtual users during the timed run")
+    parser.add_argument("--slo", action="append", default=[], metavar="ENDPOINT=MS",
+                        help="p95 latency objective override (repeatable)")
+    parser.add_argument("--slo-file", help="JSON file of p95 objectives in ms")
+    parser.add_argument("--max-error-rate", type=float, default=DEFAULT_MAX_ERROR_RATE)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    add_credential_arguments(parser)
+    parser.add_argument("--service-client-id", default=os.environ.get("OIDC_SERVICE_CLIENT_ID", SERVICE_CLIENT_ID),
+                        help="Client for the client_credentials check (env OIDC_SERVICE_CLIENT_ID)")
+    parser.add_argument("--service-client-secret",
+                        default=os.environ.get("OIDC_SERVICE_CLIENT_SECRET", SERVICE_CLIENT_SECRET),
+                        help="Its secret (env OIDC_SERVICE_CLIENT_SECRET)")
+    args = parser.parse_args(argv)
+
+    quiet = contextlib.ExitStack()
+    if args.in_process:
+        from app import app
+        factory, target = (lambda: FlaskTransport(app)), "in-process"
+        # The provider logs to stdout; keep the report readable
+        quiet.enter_context(contextlib.redirect_stdout(quiet.enter_context(open(os.devnull, "w"))))
     else:
-        print("⚠️  SERVICE NOT RUNNING")
-        print("   Start the provider with: python app.py")
-    
-    print()
-    print("="*60)
+        factory, target = (lambda: HttpTransport(args.url)), args.url
+
+    with quiet:
+        report = run_probe(
+            factory, duration=args.duration, users=args.users,
+            slos=load_slos(args.slo_file, args.slo), max_error_rate=args.max_error_rate,
+            credentials=credentials_from_args(args),
+            service_client=(args.service_client_id, args.service_client_secret)
+        )
+    report["target"] = target
+    print(json.dumps(report, indent=2) if args.json else format_report(report, target))
+    return {"healthy": 0, "degraded": 1}.get(report["status"], 2)
+
 
 if __name__ == "__main__":
-    print_status_report()
+    sys.exit(main())
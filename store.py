@@ -0,0 +1,326 @@
+# flask-oidc-provider/store.py
+
+"""
+Pluggable TTL key/value stores for short-lived provider state
+(pending authorization requests, sessions, caches), a dict-like view of a
+store for long-lived records (registered clients), and notifiers that wake
+requests waiting for a key to change.
+
+The in-memory implementations are used by default. Set STORE_URL to a
+redis:// URL to share state (and notifications) between workers and nodes.
+"""
+
+import json
+import math
+import threading
+import time
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Mapping, Optional, Set, Tuple
+
+from config import Config
+
+
+class MemoryStore:
+    """Thread-safe in-process store with per-key expiry."""
+
+    # Number of writes between sweeps of expired entries
+    PURGE_INTERVAL = 1024
+
+    def __init__(self, namespace: str = ""):
+        self.namespace = namespace
+        self._data: Dict[str, Tuple[Any, float]] = {}
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _maybe_purge(self, now: float) -> None:
+        self._writes += 1
+        if self._writes % self.PURGE_INTERVAL == 0:
+            self._purge(now)
+
+    def _purge(self, now: float) -> int:
+        expired = [k for k, (_, exp) in self._data.items() if exp <= now]
+        for key in expired:
+            del self._data[key]
+        return len(expired)
+
+    def set(self, key: str, value: Any, ttl: Optional[int]) -> None:
+        """Store value under key for ttl seconds (None: until deleted)."""
+        now = time.time()
+        with self._lock:
+            self._data[key] = (value, now + ttl if ttl is not None else math.inf)
+            self._maybe_purge(now)
+
+    def set_many(self, items: Mapping[str, Any], ttl: Optional[int]) -> None:
+        """Store several values at once, each for ttl seconds (None: until deleted)."""
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else math.inf
+        with self._lock:
+            for key, value in items.items():
+                self._data[key] = (value, expires_at)
+            self._maybe_purge(now)
+
+    def add(self, key: str, value: Any, ttl: Optional[int]) -> bool:
+        """Store value only if key is absent. Returns True if stored."""
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry and entry[1] > now:
+                return False
+            self._data[key] = (value, now + ttl if ttl is not None else math.inf)
+            self._maybe_purge(now)
+            return True
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the value for key, or None if missing or expired."""
+        entry = self._data.get(key)
+        if not entry:
+            return None
+        if entry[1] <= time.time():
+            self.delete(key)
+            return None
+        return entry[0]
+
+    def pop(self, key: str) -> Optional[Any]:
+        """Atomically remove and return the value for key."""
+        with self._lock:
+            entry = self._data.pop(key, None)
+        if not entry or entry[1] <= time.time():
+            return None
+        return entry[0]
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def purge_expired(self) -> int:
+        """Drop all expired entries. Returns the number removed."""
+        with self._lock:
+            return self._purge(time.time())
+
+    def keys(self, prefix: str = "") -> Iterator[str]:
+        """Live keys starting with prefix."""
+        now = time.time()
+        with self._lock:
+            keys = [k for k, (_, exp) in self._data.items() if k.startswith(prefix) and exp > now]
+        return iter(keys)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class RedisStore:
+    """Redis-backed store; values are serialized as JSON."""
+
+    def __init__(self, client, namespace: str):
+        self.namespace = namespace
+        self._redis = client
+        self._prefix = f"oidc:{namespace}:"
+
+    def set(self, key: str, value: Any, ttl: Optional[int]) -> None:
+        self._redis.set(self._prefix + key, json.dumps(value), ex=ttl)
+
+    def set_many(self, items: Mapping[str, Any], ttl: Optional[int]) -> None:
+        # One round trip for the whole batch
+        pipeline = self._redis.pipeline(transaction=False)
+        for key, value in items.items():
+            pipeline.set(self._prefix + key, json.dumps(value), ex=ttl)
+        pipeline.execute()
+
+    def add(self, key: str, value: Any, ttl: Optional[int]) -> bool:
+        return bool(self._redis.set(self._prefix + key, json.dumps(value), ex=ttl, nx=True))
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self._redis.get(self._prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def pop(self, key: str) -> Optional[Any]:
+        raw = self._redis.getdel(self._prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def delete(self, key: str) -> bool:
+        return bool(self._redis.delete(self._prefix + key))
+
+    def purge_expired(self) -> int:
+        # Redis expires keys on its own
+        return 0
+
+    def keys(self, prefix: str = "") -> Iterator[str]:
+        start = len(self._prefix)
+        for key in self._redis.scan_iter(match=self._prefix + prefix + "*", count=1000):
+            yield key.decode()[start:] if isinstance(key, bytes) else key[start:]
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self._redis.scan_iter(match=self._prefix + "*", count=1000))
+
+
+class StoreMapping(MutableMapping):
+    """
+    Dict-like view of the keys of a store under `prefix`, layered over fixed
+    in-process entries (`base`, e.g. seeded or provisioned records). New keys
+    go to the store, never expire and are visible to every worker sharing it;
+    base entries stay per process, as every worker starts with the same ones.
+    """
+
+    def __init__(self, store, base: Optional[Mapping[str, Any]] = None, prefix: str = ""):
+        self.store = store
+        self.prefix = prefix
+        self._base: Dict[str, Any] = dict(base or {})
+
+    def get(self, key: str, default: Any = None) -> Any:
+        # On every client lookup, so no KeyError round trip through __getitem__
+        value = self._base.get(key)
+        if value is None:
+            value = self.store.get(self.prefix + key)
+        return default if value is None else value
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self.get(key) is not None
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key in self._base:
+            self._base[key] = value
+        else:
+            self.store.set(self.prefix + key, value, None)
+
+    def update(self, items=(), **kwargs) -> None:
+        """Write every item with a single store call."""
+        items = dict(items, **kwargs)
+        self.store.set_many({self.prefix + key: value for key, value in items.items()}, None)
+
+    def __delitem__(self, key: str) -> None:
+        if self._base.pop(key, None) is None and not self.store.delete(self.prefix + key):
+            raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from list(self._base)
+        start = len(self.prefix)
+        for key in self.store.keys(self.prefix):
+            if key[start:] not in self._base:
+                yield key[start:]
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+class MemoryNotifier:
+    """Wakes waiters in this process when a key is notified."""
+
+    def __init__(self):
+        self._waiters: Dict[str, Set[threading.Event]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def subscribe(self, key: str) -> Iterator[threading.Event]:
+        """
+        Listen for notifications of key.
+        Subscribe before re-checking the state being waited for, so a
+        notification sent in between is not missed.
+        """
+        event = threading.Event()
+        with self._lock:
+            self._waiters.setdefault(key, set()).add(event)
+        try:
+            yield event
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(key)
+                if waiters is not None:
+                    waiters.discard(event)
+                    if not waiters:
+                        del self._waiters[key]
+
+    def notify(self, key: str) -> None:
+        with self._lock:
+            waiters = list(self._waiters.get(key, ()))
+        for event in waiters:
+            event.set()
+
+    def __len__(self) -> int:
+        return len(self._waiters)
+
+
+class RedisNotifier:
+    """Redis pub/sub notifier; one listener thread per process wakes local waiters."""
+
+    def __init__(self, client, channel: str):
+        self._redis = client
+        self._channel = f"oidc:{channel}"
+        self._local = MemoryNotifier()
+        self._listener: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _listen(self) -> None:
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self._channel)
+                for message in pubsub.listen():
+                    self._local.notify(message["data"].decode())
+            except Exception as e:
+                print(f"Notifier {self._channel} disconnected: {e}")
+                time.sleep(1)
+
+    @contextmanager
+    def subscribe(self, key: str) -> Iterator[threading.Event]:
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name=f"notifier-{self._channel}", daemon=True)
+                self._listener.start()
+        with self._local.subscribe(key) as event:
+            yield event
+
+    def notify(self, key: str) -> None:
+        # Delivered to this process through its own subscription as well
+        self._redis.publish(self._channel, key)
+
+    def __len__(self) -> int:
+        return len(self._local)
+
+
+_redis_client = None
+
+
+def _redis_from_config():
+    """Shared Redis client for Config.STORE_URL, or None for in-process state."""
+    global _redis_client
+    url = Config.STORE_URL
+    if not url or not url.startswith(("redis://", "rediss://")):
+        return None
+    if _redis_client is None:
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("STORE_URL requires the 'redis' package.")
+        _redis_client = redis.Redis.from_url(url)
+    return _redis_client
+
+
+def create_store(namespace: str):
+    """
+    Create a store for the given namespace.
+    Returns a RedisStore when Config.STORE_URL is a redis:// URL,
+    a MemoryStore otherwise.
+    """
+    client = _redis_from_config()
+    if client is not None:
+        return RedisStore(client, namespace)
+    return MemoryStore(namespace)
+
+
+def create_notifier(channel: str):
+    """
+    Create a notifier for the given channel.
+    Returns a RedisNotifier when Config.STORE_URL is a redis:// URL,
+    a MemoryNotifier otherwise.
+    """
+    client = _redis_from_config()
+    if client is not None:
+        return RedisNotifier(client, channel)
+    return MemoryNotifier()
@@ -0,0 +1,142 @@
+# flask-oidc-provider/tenants.py
+
+"""
+Multi-tenant issuers.
+
+Each tenant is a directory under TENANTS_DIR holding its own key material
+and clients:
+
+    tenants/<tenant_id>/private.pem
+    tenants/<tenant_id>/public.pem
+    tenants/<tenant_id>/jwks.json
+    tenants/<tenant_id>/clients.json     (optional: list of client records)
+
+Tenants are served under /t/<tenant_id>/... or, with TENANT_HOST_SUFFIX set,
+from <tenant_id><suffix> hosts. A tenant is loaded on first use and kept in
+an LRU of TENANT_CACHE_SIZE entries together with its pre-encoded discovery
+and JWKS bytes. Requests outside any tenant use the default issuer
+(ISSUER_URL, the configured keys and models.clients).
+"""
+
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Dict, MutableMapping, Optional
+
+from cache import SingleFlight
+from store import StoreMapping, create_store
+
+TENANT_ID_RE = re.compile(r"^[a-z0-9][a-z0-9_-]{0,62}$")
+
+# Read on every client and key lookup, so kept in a context variable rather
+# than flask.g; set per request by the blueprint and cleared on teardown
+_current: "ContextVar[Optional[Tenant]]" = ContextVar("tenant", default=None)
+
+
+class Tenant:
+    """An issuer with its own keys and client registry"""
+
+    def __init__(self, tenant_id: str, issuer: str, keyring, clients: MutableMapping[str, Dict]):
+        self.tenant_id = tenant_id
+        self.issuer = issuer
+        self.keyring = keyring
+        self.clients = clients
+        self.client_policies: Dict[str, Any] = {}
+        # Encoded discovery documents per URL root
+        self.discovery: Dict[str, bytes] = {}
+
+    @property
+    def jwks_bytes(self) -> bytes:
+        return self.keyring.jwks_bytes
+
+
+class TenantRegistry:
+    """Loads tenants on demand and keeps the most recently used ones"""
+
+    def __init__(self, directory: str, issuer_template: str, base_issuer: str, capacity: int = 128):
+        self.directory = directory
+        self.issuer_template = issuer_template
+        self.base_issuer = base_issuer.rstrip("/")
+        self.capacity = capacity
+        self._tenants: "OrderedDict[str, Tenant]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Concurrent first requests for a tenant share one load
+        self._loads = SingleFlight()
+        # Clients registered at runtime, shared by every worker and kept across
+        # evictions of their tenant; keys are "<tenant_id>/<client_id>"
+        self._registered = create_store("tenant_clients")
+
+    def _load(self, tenant_id: str) -> Optional[Tenant]:
+        from auth.token import KeyRing
+
+        path = os.path.join(self.directory, tenant_id)
+        if not os.path.isdir(path):
+            return None
+        keyring = KeyRing.from_config({
+            "PRIVATE_KEY_PATH": os.path.join(path, "private.pem"),
+            "PUBLIC_KEY_PATH": os.path.join(path, "public.pem"),
+            "JWKS_PATH": os.path.join(path, "jwks.json")
+        })
+        provisioned: Dict[str, Dict] = {}
+        clients_path = os.path.join(path, "clients.json")
+        if os.path.exists(clients_path):
+            with open(clients_path) as f:
+                provisioned = {client["client_id"]: client for client in json.load(f)}
+
+        clients = StoreMapping(self._registered, provisioned, prefix=f"{tenant_id}/")
+        issuer = self.issuer_template.format(base=self.base_issuer, tenant=tenant_id)
+        return Tenant(tenant_id, issuer, keyring, clients)
+
+    def get(self, tenant_id: str) -> Optional[Tenant]:
+        """
+        Return a tenant, loading it on first use.
+        Returns None for unknown or malformed tenant ids.
+        """
+        with self._lock:
+            tenant = self._tenants.get(tenant_id)
+            if tenant is not None:
+                self._tenants.move_to_end(tenant_id)
+                return tenant
+        if not TENANT_ID_RE.match(tenant_id):
+            return None
+
+        tenant, _ = self._loads.do(tenant_id, lambda: self._load(tenant_id))
+        if tenant is None:
+            return None
+        with self._lock:
+            # Another thread may have installed it meanwhile; keep a single instance
+            tenant = self._tenants.setdefault(tenant_id, tenant)
+            self._tenants.move_to_end(tenant_id)
+            while len(self._tenants) > self.capacity:
+                self._tenants.popitem(last=False)
+        return tenant
+
+    def __len__(self) -> int:
+        return len(self._tenants)
+
+
+def current_tenant() -> Optional[Tenant]:
+    """The tenant serving this request, or None for the default issuer"""
+    return _current.get()
+
+
+def set_current_tenant(tenant: Optional[Tenant]) -> None:
+    """Bind a tenant (or the default issuer) to the current request"""
+    _current.set(tenant)
+
+
+def current_tenant_id() -> Optional[str]:
+    """Id of the tenant serving this request, or None for the default issuer"""
+    tenant = current_tenant()
+    return tenant.tenant_id if tenant else None
+
+
+def tenant_from_host(host: str, suffix: str) -> Optional[str]:
+    """Tenant id for host-based routing ("acme.idp.example.com" -> "acme")"""
+    host = host.split(":", 1)[0].lower()
+    if suffix and host.endswith(suffix) and len(host) > len(suffix):
+        return host[:-len(suffix)]
+    return None
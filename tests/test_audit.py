@@ -0,0 +1,155 @@
+# tests/test_audit.py
+import base64
+import json
+import os
+import threading
+import pytest
+import audit as audit_module
+from app import app
+from audit import AuditLog, query
+from metrics import audit_events_dropped
+from models import clients, users
+
+SERVICE_AUTH = {"Authorization": "Basic " + base64.b64encode(b"service123:servicesecret123").decode()}
+
+@pytest.fixture
+def log(tmp_path):
+    log = AuditLog(str(tmp_path))
+    yield log
+    log.close()
+
+@pytest.fixture
+def client(log, monkeypatch):
+    app.config["TESTING"] = True
+    monkeypatch.setitem(app.extensions, "audit", log)
+    with app.test_client() as client:
+        yield client
+
+def events(log, **filters):
+    assert log.flush(5)
+    return list(query(log.directory, **filters))
+
+def test_events_are_durable_after_flush(log):
+    threads = [
+        threading.Thread(target=lambda i=i: [log.record("login", user=f"user{i}", n=n) for n in range(100)])
+        for i in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    recorded = events(log)
+    assert len(recorded) == 800
+    assert [entry["ts"] for entry in recorded] == sorted(entry["ts"] for entry in recorded)
+    assert len(events(log, user="user3")) == 100
+
+    # Lines are NDJSON with the timestamp first
+    segment, = os.listdir(log.directory)
+    with open(os.path.join(log.directory, segment), "rb") as f:
+        assert f.readline().startswith(b'{"ts":')
+
+def test_segments_rotate_by_size(tmp_path):
+    log = AuditLog(str(tmp_path), segment_bytes=200)
+    try:
+        for i in range(20):
+            log.record("login", user="alice", n=i)
+            assert log.flush(5)
+        assert len(os.listdir(tmp_path)) > 1
+        # Reading across segments keeps time order
+        assert [entry["n"] for entry in query(str(tmp_path))] == list(range(20))
+    finally:
+        log.close()
+
+def test_query_by_time_range(log, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(audit_module.time, "time", lambda: clock[0])
+    for i in range(1000):
+        clock[0] = 1000.0 + i
+        log.record("token_issued", client_id="client123" if i % 2 else "service123", n=i)
+
+    in_range = events(log, since=1100, until=1199)
+    assert [entry["n"] for entry in in_range] == list(range(100, 200))
+    assert len(events(log, since=1100, until=1199, client_id="service123")) == 50
+    assert events(log, since=5000) == []
+
+def test_full_buffer_drops_oldest(tmp_path, monkeypatch):
+    log = AuditLog(str(tmp_path), buffer_size=10)
+    # A stalled disk: the writer holds its first batch until released
+    stalled, released = threading.Event(), threading.Event()
+    write = log._write
+    def slow_write(data, now):
+        stalled.set()
+        released.wait(5)
+        write(data, now)
+    monkeypatch.setattr(log, "_write", slow_write)
+    before = audit_events_dropped.value(("buffer_full",))
+
+    log.record("login", n=0)
+    assert stalled.wait(5)
+    for i in range(1, 13):
+        log.record("login", n=i)
+    assert audit_events_dropped.value(("buffer_full",)) == before + 2
+    released.set()
+
+    assert [entry["n"] for entry in events(log)] == [0] + list(range(3, 13))
+    log.close()
+
+def test_failed_write_is_not_durable(log, monkeypatch):
+    write = log._write
+    def failing_write(data, now):
+        raise OSError("disk full")
+    monkeypatch.setattr(log, "_write", failing_write)
+    before = audit_events_dropped.value(("write_failed",))
+
+    log.record("login", n=0)
+    log.record("login", n=1)
+    assert not log.flush(5)
+    assert audit_events_dropped.value(("write_failed",)) == before + 2
+
+    monkeypatch.setattr(log, "_write", write)
+    log.record("login", n=2)
+    assert [entry["n"] for entry in events(log)] == [2]
+
+def test_cli(log, capsys):
+    log.record("login", user="alice")
+    log.record("login", user="bob")
+    log.record("consent", user="alice", client_id="client123")
+    assert log.flush(5)
+
+    assert audit_module.main(["--dir", log.directory, "--user", "alice", "--limit", "1"]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(line)["event"] for line in lines] == ["login"]
+    assert audit_module.main(["--dir", os.path.join(log.directory, "missing")]) == 1
+
+def test_authorization_flow_is_audited(client, log):
+    client.get("/authorize", query_string={
+        "client_id": "client123", "redirect_uri": clients["client123"]["redirect_uris"][0],
+        "response_type": "code", "scope": "openid", "code_challenge": "c", "code_challenge_method": "plain"
+    })
+    assert client.post("/authorize", data={"username": "alice", "password": "wrong"}).status_code == 401
+    client.post("/authorize", data={"username": "alice", "password": users["alice"]["password"]})
+    client.post("/consent", data={"action": "approve"})
+
+    logins = events(log, event="login")
+    assert [entry["outcome"] for entry in logins] == ["failure", "success"]
+    assert logins[0]["ip"] == "127.0.0.1" and "password" not in logins[0]
+    code_issued, = events(log, event="code_issued")
+    assert code_issued["user"] == "alice" and code_issued["client_id"] == "client123"
+
+def test_token_grants_and_failures_are_audited(client, log):
+    assert client.post("/token", data={"grant_type": "client_credentials"}, headers=SERVICE_AUTH).status_code == 200
+    client.post("/token", data={"grant_type": "client_credentials", "client_id": "service123",
+                                "client_secret": "wrong"})
+    client.post("/token", data={"grant_type": "password"}, headers=SERVICE_AUTH)
+
+    issued, = events(log, event="token_issued")
+    assert issued["client_id"] == "service123" and issued["grant_type"] == "client_credentials"
+    failures = events(log, event="token_failed")
+    assert [entry["error"] for entry in failures] == ["invalid_client", "unsupported_grant_type"]
+    assert all(entry["outcome"] == "failure" and entry["client_id"] == "service123" for entry in failures)
+
+def test_disabled_by_default():
+    assert "audit" not in app.extensions
+    with app.test_request_context():
+        audit_module.audit("login", user="alice")
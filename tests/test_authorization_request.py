@@ -0,0 +1,77 @@
+# tests/test_authorization_request.py
+import pytest
+from app import app
+from auth.consent import revoke_consent
+from models import clients, users, authorization_requests
+
+AUTHORIZE_PARAMS = {
+    "client_id": "client123",
+    "redirect_uri": clients["client123"]["redirect_uris"][0],
+    "response_type": "code",
+    "state": "xyz",
+    "scope": "openid profile",
+    "code_challenge": "testchallenge",
+    "code_challenge_method": "plain",
+    "nonce": "n-0S6_WzA2Mj"
+}
+
+def test_request_parameters_stored_server_side(client):
+    client.get("/authorize", query_string=AUTHORIZE_PARAMS)
+    with client.session_transaction() as sess:
+        handle = sess["auth_request"]
+        assert "redirect_uri" not in sess and "code_challenge" not in sess
+
+    stored = authorization_requests.get(handle)
+    assert stored["client_id"] == "client123"
+    assert stored["nonce"] == AUTHORIZE_PARAMS["nonce"]
+
+def test_handle_from_form_completes_flow(client):
+    response = client.get("/authorize", query_string=AUTHORIZE_PARAMS)
+    with client.session_transaction() as sess:
+        handle = sess.pop("auth_request")
+    assert handle.encode() in response.data
+
+    response = client.post(
+        "/authorize",
+        data={"username": "alice", "password": users["alice"]["password"], "auth_request": handle}
+    )
+    assert response.status_code == 200
+
+    response = client.post("/consent", data={"action": "approve", "auth_request": handle})
+    assert response.status_code == 302
+    assert "state=xyz" in response.headers["Location"]
+
+    # Requests are single-use
+    assert authorization_requests.get(handle) is None
+    response = client.post("/consent", data={"action": "approve", "auth_request": handle})
+    assert response.status_code == 400
+
+def test_handle_from_another_browser_rejected(client):
+    # The attacker starts a request for their own client and plants its handle in the victim's form
+    with app.test_client() as attacker:
+        attacker.get("/authorize", query_string=AUTHORIZE_PARAMS)
+        with attacker.session_transaction() as sess:
+            handle = sess["auth_request"]
+
+    client.get("/authorize", query_string=AUTHORIZE_PARAMS)
+    client.post("/authorize", data={"username": "alice", "password": users["alice"]["password"]})
+    response = client.post("/consent", data={"action": "approve", "auth_request": handle})
+    assert response.status_code == 400
+    # The planted request is neither approved nor consumed
+    assert authorization_requests.get(handle) is not None
+
+def test_unknown_handle_rejected(client):
+    response = client.post(
+        "/authorize",
+        data={"username": "alice", "password": users["alice"]["password"], "auth_request": "bogus"}
+    )
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "invalid_request"
+
+@pytest.fixture
+def client():
+    app.config["TESTING"] = True
+    revoke_consent("alice", "client123")
+    with app.test_client() as client:
+        yield client
+    revoke_consent("alice", "client123")
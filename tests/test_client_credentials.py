@@ -0,0 +1,75 @@
+# tests/test_client_credentials.py
+import base64
+import pytest
+from app import app
+from auth.token import TokenService
+from models import client_credentials_tokens
+
+def basic_auth(client_id, secret):
+    return {"Authorization": "Basic " + base64.b64encode(f"{client_id}:{secret}".encode()).decode()}
+
+SERVICE_AUTH = basic_auth("service123", "servicesecret123")
+
+def request_token(client, headers=SERVICE_AUTH, **data):
+    return client.post("/token", data={"grant_type": "client_credentials", **data}, headers=headers)
+
+def test_client_credentials_grant(client):
+    response = request_token(client, scope="api.read")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["token_type"] == "Bearer"
+    assert body["scope"] == "api.read"
+
+    claims = TokenService.decode_token(body["access_token"])
+    assert claims["sub"] == "service123"
+    assert claims["scope"] == "api.read"
+
+def test_default_scope_is_client_registration(client):
+    body = request_token(client).get_json()
+    assert body["scope"] == "api.read api.write"
+
+def test_token_reused_within_lifetime(client, mint_counter):
+    first = request_token(client, scope="api.write api.read").get_json()
+    second = request_token(client, scope="api.read api.write").get_json()
+    assert first["access_token"] == second["access_token"]
+    assert second["expires_in"] <= first["expires_in"]
+    assert mint_counter == [1]
+
+def test_reuse_can_be_disabled(client, mint_counter):
+    app.config["CLIENT_CREDENTIALS_TOKEN_REUSE"] = False
+    try:
+        request_token(client, scope="api.read")
+        request_token(client, scope="api.read")
+    finally:
+        app.config["CLIENT_CREDENTIALS_TOKEN_REUSE"] = True
+    assert mint_counter == [2]
+
+def test_invalid_scope(client):
+    response = request_token(client, scope="api.read admin")
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "invalid_scope"
+
+def test_client_without_grant_rejected(client):
+    response = request_token(client, headers=basic_auth("client123", "secret123"))
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "unauthorized_client"
+
+@pytest.fixture
+def mint_counter(monkeypatch):
+    calls = [0]
+    original = TokenService.generate_access_token
+
+    def counting(sub, scope, *args):
+        calls[0] += 1
+        return original(sub, scope, *args)
+
+    monkeypatch.setattr(TokenService, "generate_access_token", staticmethod(counting))
+    return calls
+
+@pytest.fixture
+def client():
+    app.config["TESTING"] = True
+    for scope in ("api.read", "api.read api.write"):
+        client_credentials_tokens.delete(f"service123|{scope}")
+    with app.test_client() as client:
+        yield client
@@ -0,0 +1,76 @@
+# tests/test_consent.py
+import pytest
+from app import app
+from auth.consent import canonical_scope, has_consent, remember_consent, revoke_consent
+from models import clients, users
+
+def start_login(client, scope):
+    response = client.get(
+        "/authorize",
+        query_string={
+            "client_id": "client123",
+            "redirect_uri": clients["client123"]["redirect_uris"][0],
+            "response_type": "code",
+            "state": "s1",
+            "scope": scope,
+            "code_challenge": "testchallenge",
+            "code_challenge_method": "plain"
+        }
+    )
+    # An existing SSO session skips the login form
+    if b"Login" not in response.data:
+        return response
+    return client.post(
+        "/authorize",
+        data={"username": "alice", "password": users["alice"]["password"]}
+    )
+
+def test_canonical_scope():
+    assert canonical_scope("profile openid  email openid") == "email openid profile"
+    assert canonical_scope(["email", "openid"]) == canonical_scope("openid email")
+
+def test_approved_consent_skips_consent_page(client):
+    response = start_login(client, "openid email")
+    assert b"Consent" in response.data
+    client.post("/consent", data={"action": "approve"})
+    assert has_consent("alice", "client123", "email openid")
+
+    # Same scopes in a different order go straight back to the client
+    response = start_login(client, "email openid")
+    assert response.status_code == 302
+    assert "code=" in response.headers["Location"]
+
+    # A different scope set still asks
+    response = start_login(client, "openid email profile")
+    assert response.status_code == 200
+    assert b"Consent" in response.data
+
+def test_denied_consent_not_remembered(client):
+    start_login(client, "openid email")
+    client.post("/consent", data={"action": "deny"})
+    assert not has_consent("alice", "client123", "openid email")
+
+def test_revoke_consent(client):
+    remember_consent("alice", "client123", "openid")
+    remember_consent("alice", "client123", "openid email")
+
+    response = client.post("/consent/revoke", data={"client_id": "client123"})
+    assert response.status_code == 401
+
+    start_login(client, "openid profile")
+    response = client.post("/consent/revoke", data={"client_id": "client123"})
+    assert response.status_code == 200
+    assert response.get_json()["revoked"] == 2
+    assert not has_consent("alice", "client123", "openid")
+
+def test_consent_expires():
+    remember_consent("bob", "client123", "openid", ttl=-1)
+    assert not has_consent("bob", "client123", "openid")
+
+@pytest.fixture
+def client():
+    app.config["TESTING"] = True
+    revoke_consent("alice", "client123")
+    with app.test_client() as client:
+        yield client
+    revoke_consent("alice", "client123")
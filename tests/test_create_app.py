@@ -0,0 +1,48 @@
+# tests/test_create_app.py
+import json
+import jwt
+import pytest
+import app as app_module
+from app import app, create_app
+from config import Config
+from test_tenants import write_tenant
+
+def test_missing_key_material_fails_fast(tmp_path):
+    class MissingKey(Config):
+        PRIVATE_KEY_PATH = str(tmp_path / "missing.pem")
+    with pytest.raises(RuntimeError, match="PRIVATE_KEY_PATH"):
+        create_app(MissingKey)
+
+def test_warmed_jwks_and_discovery_are_served(monkeypatch):
+    app.config["TESTING"] = True
+    warmed = app.extensions["discovery"][app.config["ISSUER_URL"].rstrip("/") + "/"]
+    # Nothing is built on the request path
+    monkeypatch.setattr(app_module, "build_discovery_document", lambda *args: pytest.fail("rebuilt"))
+    with app.test_client() as client:
+        discovery = client.get("/.well-known/openid-configuration", base_url=app.config["ISSUER_URL"])
+        assert discovery.data == warmed
+        assert client.get("/.well-known/jwks.json").data == app.extensions["keyring"].jwks_bytes
+
+def test_apps_keep_their_own_keys(tmp_path):
+    write_tenant(tmp_path, "other", [])
+    class OtherKeys(Config):
+        ISSUER_URL = "http://other.example"
+        PRIVATE_KEY_PATH = str(tmp_path / "other" / "private.pem")
+        PUBLIC_KEY_PATH = str(tmp_path / "other" / "public.pem")
+        JWKS_PATH = str(tmp_path / "other" / "jwks.json")
+        REFRESH_COALESCE_WINDOW = 0
+        # Issued tokens are cached in the shared store, which both apps use here
+        CLIENT_CREDENTIALS_TOKEN_REUSE = False
+    jwks = app.extensions["keyring"].jwks_bytes
+    other = create_app(OtherKeys)
+
+    assert app.extensions["keyring"].jwks_bytes == jwks
+    assert app.extensions["refresh_flight"].window == Config.REFRESH_COALESCE_WINDOW
+    for flask_app in (app, other):
+        with flask_app.test_client() as client:
+            keys = json.loads(client.get("/.well-known/jwks.json").data)["keys"]
+            token = client.post("/token", data={
+                "grant_type": "client_credentials", "client_id": "service123", "client_secret": "servicesecret123"
+            }).get_json()["access_token"]
+        assert jwt.get_unverified_header(token)["kid"] == keys[0]["kid"]
+    assert other.extensions["keyring"].kid != app.extensions["keyring"].kid
@@ -0,0 +1,45 @@
+# tests/test_debug_stats.py
+import pytest
+from app import app
+from diagnostics import approx_size, store_stats
+from models import authorization_codes
+from store import MemoryStore
+
+def test_debug_stats_requires_admin(client):
+    assert client.get("/debug/stats").status_code == 403
+    assert client.get("/debug/stats", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+def test_debug_stats_report(client):
+    response = client.get("/debug/stats", headers={"X-Admin-Token": "stats-admin"})
+    assert response.status_code == 200
+    report = response.get_json()
+    assert "rss_bytes" in report
+    for name in ("tokens", "authorization_codes", "authorization_requests", "sso_sessions", "refresh_families"):
+        assert set(report["stores"][name]) == {"entries", "approx_bytes"}
+    assert report["stores"]["clients"]["entries"] >= 1
+
+def test_store_stats_estimates_size():
+    store = MemoryStore()
+    for i in range(1000):
+        store.set(f"key-{i}", {"client_id": "client123", "scope": "openid " * 10}, 60)
+    stats = store_stats(store)
+    assert stats["entries"] == 1000
+    assert stats["approx_bytes"] > 1000 * approx_size({"scope": "openid " * 10})
+
+def test_unredeemed_codes_expire():
+    authorization_codes.set("stale-code", {"client_id": "client123"}, -1)
+    authorization_codes.set("fresh-code", {"client_id": "client123"}, 600)
+    try:
+        assert authorization_codes.purge_expired() >= 1
+        assert authorization_codes.get("stale-code") is None
+        assert authorization_codes.get("fresh-code") is not None
+    finally:
+        authorization_codes.delete("fresh-code")
+
+@pytest.fixture
+def client():
+    app.config["TESTING"] = True
+    app.config["ADMIN_TOKEN"] = "stats-admin"
+    with app.test_client() as client:
+        yield client
+    app.config["ADMIN_TOKEN"] = ""
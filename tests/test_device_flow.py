@@ -0,0 +1,151 @@
+# tests/test_device_flow.py
+import base64
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import auth.device as device_module
+from app import app
+from auth.device import DEVICE_CODE_GRANT
+from auth.token import TokenService
+from metrics import rate_limit_rejections
+
+DEVICE_AUTH = {"Authorization": "Basic " + base64.b64encode(b"device123:devicesecret123").decode()}
+
+@pytest.fixture
+def client(monkeypatch):
+    app.config["TESTING"] = True
+    monkeypatch.setitem(app.config, "DEVICE_POLL_INTERVAL", 0)
+    monkeypatch.setitem(app.config, "DEVICE_POLL_WAIT", 0)
+    with app.test_client() as client:
+        yield client
+
+def start(client, scope="openid profile"):
+    response = client.post("/device_authorization", data={"scope": scope}, headers=DEVICE_AUTH)
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "no-store"
+    return response.get_json()
+
+def poll(client, device_code):
+    return client.post("/token", data={"grant_type": DEVICE_CODE_GRANT, "device_code": device_code},
+                       headers=DEVICE_AUTH)
+
+def decide(user_code, action="approve"):
+    with app.test_client() as browser:
+        return browser.post("/device", data={
+            "user_code": user_code, "username": "alice", "password": "alicepassword", "action": action
+        })
+
+def test_device_flow(client):
+    grant = start(client)
+    assert grant["verification_uri"] == "http://localhost/device"
+    assert grant["verification_uri_complete"].endswith(f"user_code={grant['user_code']}")
+    assert poll(client, grant["device_code"]).get_json()["error"] == "authorization_pending"
+
+    # Codes are typed by hand: case and separators do not matter
+    page = client.get("/device", query_string={"user_code": grant["user_code"].lower().replace("-", " ")})
+    assert page.status_code == 200 and b"device123" in page.data
+    assert decide(grant["user_code"]).status_code == 200
+
+    response = poll(client, grant["device_code"])
+    assert response.status_code == 200
+    tokens = response.get_json()
+    claims = TokenService.decode_token(tokens["access_token"])
+    assert claims["sub"] == "user-alice" and claims["scope"] == "openid profile"
+    assert tokens["id_token"] and tokens["refresh_token"]
+
+    # Device codes and user codes are single-use
+    assert poll(client, grant["device_code"]).get_json()["error"] == "invalid_grant"
+    assert decide(grant["user_code"]).status_code == 400
+
+def test_denied(client):
+    grant = start(client)
+    decide(grant["user_code"], "deny")
+    assert poll(client, grant["device_code"]).get_json()["error"] == "access_denied"
+
+def test_rejects_other_clients_and_grants(client):
+    grant = start(client)
+    service = {"Authorization": "Basic " + base64.b64encode(b"service123:servicesecret123").decode()}
+    response = client.post("/token", data={"grant_type": DEVICE_CODE_GRANT, "device_code": grant["device_code"]},
+                           headers=service)
+    assert response.get_json()["error"] == "invalid_grant"
+    assert client.post("/device_authorization", headers=service).get_json()["error"] == "unauthorized_client"
+    assert client.post("/device_authorization", data={"scope": "admin"},
+                       headers=DEVICE_AUTH).get_json()["error"] == "invalid_scope"
+
+def test_slow_down(client, monkeypatch):
+    monkeypatch.setitem(app.config, "DEVICE_POLL_INTERVAL", 5)
+    grant = start(client)
+    assert grant["interval"] == 5
+    before = rate_limit_rejections.value(("token",))
+
+    assert poll(client, grant["device_code"]).get_json()["error"] == "authorization_pending"
+    assert poll(client, grant["device_code"]).get_json()["error"] == "slow_down"
+    assert poll(client, grant["device_code"]).get_json()["error"] == "slow_down"
+    assert rate_limit_rejections.value(("token",)) == before + 2
+
+    # An approved code is still refused until the (now longer) interval has passed
+    decide(grant["user_code"])
+    assert poll(client, grant["device_code"]).get_json()["error"] == "slow_down"
+
+def test_long_poll_returns_when_approved(client, monkeypatch):
+    monkeypatch.setitem(app.config, "DEVICE_POLL_WAIT", 10)
+    grant = start(client)
+    threading.Timer(0.2, decide, (grant["user_code"],)).start()
+
+    started = time.monotonic()
+    response = poll(client, grant["device_code"])
+    assert response.status_code == 200 and "access_token" in response.get_json()
+    assert time.monotonic() - started < 5
+
+def test_long_poll_times_out_pending(client, monkeypatch):
+    monkeypatch.setitem(app.config, "DEVICE_POLL_WAIT", 0.3)
+    grant = start(client)
+    started = time.monotonic()
+    assert poll(client, grant["device_code"]).get_json()["error"] == "authorization_pending"
+    assert time.monotonic() - started >= 0.3
+
+def test_held_polls_cannot_starve_other_requests(client, monkeypatch):
+    monkeypatch.setitem(app.config, "DEVICE_POLL_WAIT", 10)
+    monkeypatch.setitem(app.extensions, "held_device_polls", threading.BoundedSemaphore(1))
+    grants = [start(client) for _ in range(4)]
+
+    def request(fn):
+        with app.test_client() as worker:
+            started = time.monotonic()
+            fn(worker)
+            return time.monotonic() - started
+
+    # A worker with two threads: one poll is held, the others are answered at once
+    with ThreadPoolExecutor(max_workers=2) as threads:
+        polls = [threads.submit(request, lambda c, g=g: poll(c, g["device_code"])) for g in grants]
+        other = threads.submit(request, lambda c: c.get("/.well-known/openid-configuration"))
+        assert other.result(timeout=5) < 2
+        for grant in grants:
+            decide(grant["user_code"])
+        elapsed = sorted(future.result(timeout=5) for future in polls)
+    assert elapsed[2] < 2
+
+def test_polls_that_cannot_be_held_back_off(client, monkeypatch):
+    monkeypatch.setitem(app.config, "DEVICE_POLL_INTERVAL", 5)
+    monkeypatch.setitem(app.config, "DEVICE_POLL_WAIT", 20)
+    # Every slot is taken, as with many more pending devices than held polls
+    monkeypatch.setitem(app.extensions, "held_device_polls", threading.BoundedSemaphore(1))
+    app.extensions["held_device_polls"].acquire()
+    clock = [time.time()]
+    monkeypatch.setattr(device_module.time, "time", lambda: clock[0])
+    grant = start(client)
+
+    # A device following RFC 8628 over the code's lifetime
+    interval, errors = grant["interval"], []
+    deadline = clock[0] + grant["expires_in"]
+    while clock[0] < deadline:
+        errors.append(poll(client, grant["device_code"]).get_json()["error"])
+        if errors[-1] == "slow_down":
+            interval += 5
+        clock[0] += interval
+
+    assert interval == app.config["DEVICE_POLL_MAX_INTERVAL"]
+    assert set(errors) == {"slow_down", "authorization_pending"}
+    # 15 requests instead of 120 at a fixed 5 second interval
+    assert len(errors) == 15
@@ -0,0 +1,27 @@
+# tests/test_launcher.py
+import pytest
+import launcher
+from config import Config
+
+def test_profiles_sized_for_cpu_budget(monkeypatch):
+    monkeypatch.setattr(Config, "STORE_URL", "redis://localhost:6379/0")
+
+    sync = launcher.build_profile("sync", cpus=4)
+    assert sync["worker_class"] == "sync" and sync["workers"] == 5
+    assert sync["preload_app"] and sync["max_requests_jitter"]
+
+    gthread = launcher.build_profile("gthread", cpus=0.5)
+    assert gthread["workers"] == 1 and gthread["threads"] == 8
+
+def test_held_device_polls_leave_threads_free(monkeypatch):
+    monkeypatch.setattr(Config, "STORE_URL", "redis://localhost:6379/0")
+    assert launcher.held_device_polls(launcher.build_profile("sync", cpus=2)) == 0
+    assert launcher.held_device_polls(launcher.build_profile("gthread", cpus=2)) == 2
+
+def test_single_worker_without_shared_store(monkeypatch):
+    monkeypatch.setattr(Config, "STORE_URL", "")
+    assert launcher.build_profile("sync", cpus=8)["workers"] == 1
+
+def test_unknown_profile():
+    with pytest.raises(ValueError):
+        launcher.build_profile("prefork", cpus=1)
@@ -0,0 +1,22 @@
+# tests/test_loadgen.py
+import json
+from app import app
+from loadgen import FlaskTransport, percentile, run_load
+
+def test_run_load_in_process():
+    app.config["TESTING"] = True
+    report = run_load(lambda: FlaskTransport(app), users=2, iterations=2)
+
+    assert report["flows_completed"] == 4
+    assert report["flows_failed"] == 0
+    for name in ("discovery", "authorize", "token", "userinfo", "refresh"):
+        stats = report["endpoints"][name]
+        assert stats["count"] == 4 and stats["errors"] == 0
+        assert stats["p50_ms"] <= stats["p95_ms"] <= stats["p99_ms"] <= stats["max_ms"]
+    json.dumps(report)
+
+def test_percentile():
+    samples = [i / 100 for i in range(1, 101)]
+    assert percentile(samples, 50) == 0.5
+    assert percentile(samples, 99) == 0.99
+    assert percentile([], 95) == 0.0
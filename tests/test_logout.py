@@ -0,0 +1,241 @@
+# tests/test_logout.py
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import jwt
+import pytest
+from app import app
+from auth.client_auth import client_policies
+from auth.logout import LogoutDispatcher, record_rp_session, rp_sessions
+from auth.token import TokenService, get_keyring
+from models import clients, users
+
+BACKCHANNEL_EVENT = "http://schemas.openid.net/event/backchannel-logout"
+
+class Receivers:
+    """Stand-in relying parties recording the logout tokens they receive"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.received = {}
+        self.failures = {}
+        self.lock = threading.Lock()
+        receivers = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"])).decode()
+                time.sleep(receivers.delay)
+                with receivers.lock:
+                    failing = receivers.failures.get(self.path, 0)
+                    receivers.failures[self.path] = max(failing - 1, 0)
+                    if not failing:
+                        receivers.received[self.path] = parse_qs(body)["logout_token"][0]
+                self.send_response(500 if failing else 200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.base = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+@pytest.fixture
+def receivers():
+    receivers = Receivers(delay=0.2)
+    yield receivers
+    receivers.close()
+
+@pytest.fixture
+def client(monkeypatch):
+    app.config["TESTING"] = True
+    dispatcher = LogoutDispatcher(workers=64, timeout=2, retries=3, backoff=0.05)
+    monkeypatch.setitem(app.extensions, "logout_dispatcher", dispatcher)
+    monkeypatch.setitem(app.config, "REGISTRATION_OPEN", True)
+    before = set(clients)
+    with app.test_client() as client:
+        yield client
+    dispatcher.shutdown()
+    for client_id in set(clients) - before:
+        del clients[client_id]
+        client_policies.pop(client_id, None)
+    rp_sessions.delete("alice")
+
+def register(client, receivers, path, **metadata):
+    response = client.post("/register", json={
+        "grant_types": ["authorization_code"],
+        "redirect_uris": ["http://localhost:8080/callback"],
+        "backchannel_logout_uri": receivers.base + path,
+        **metadata
+    })
+    assert response.status_code == 201
+    return response.get_json()
+
+def login(client, client_id):
+    client.get("/authorize", query_string={
+        "client_id": client_id, "redirect_uri": "http://localhost:8080/callback", "response_type": "code",
+        "scope": "openid", "code_challenge": "c", "code_challenge_method": "plain"
+    })
+    client.post("/authorize", data={"username": "alice", "password": users["alice"]["password"]})
+    response = client.post("/consent", data={"action": "approve"})
+    assert response.status_code == 302
+
+def confirm_logout(client, **params):
+    page = client.get("/logout", query_string=params)
+    assert page.status_code == 200
+    confirm = re.search(rb'name="confirm" value="([^"]+)"', page.data).group(1).decode()
+    return client.post("/logout", data={**params, "confirm": confirm})
+
+def assert_logout_token(token, client_id):
+    claims = jwt.decode(token, get_keyring().public_key, algorithms=["RS256"], audience=client_id)
+    assert claims["sub"] == "user-alice"
+    assert BACKCHANNEL_EVENT in claims["events"] and "nonce" not in claims
+
+def test_logout_notifies_signed_in_clients(client, receivers):
+    rp = register(client, receivers, "/rp")
+    login(client, rp["client_id"])
+
+    response = confirm_logout(client)
+    assert response.status_code == 200 and b"logged out" in response.data
+    assert_logout_token(receivers.received["/rp"], rp["client_id"])
+
+    # The SSO session is gone and the user is logged out only once
+    page = client.get("/authorize", query_string={
+        "client_id": rp["client_id"], "redirect_uri": "http://localhost:8080/callback", "response_type": "code"
+    })
+    assert b"Login" in page.data
+    receivers.received.clear()
+    client.get("/logout")
+    assert receivers.received == {}
+
+def test_fifty_sessions_are_notified_concurrently(client, receivers):
+    registered = [register(client, receivers, f"/rp/{i}") for i in range(50)]
+    login(client, registered[0]["client_id"])
+    with app.test_request_context():
+        for rp in registered[1:]:
+            record_rp_session("alice", rp["client_id"], int(time.time()))
+
+    page = client.get("/logout")
+    confirm = re.search(rb'name="confirm" value="([^"]+)"', page.data).group(1).decode()
+    started = time.monotonic()
+    client.post("/logout", data={"confirm": confirm})
+    elapsed = time.monotonic() - started
+
+    # Each receiver takes 0.2s; one at a time this would take 10s
+    assert elapsed < 2, elapsed
+    assert len(receivers.received) == 50
+    for i, rp in enumerate(registered):
+        assert_logout_token(receivers.received[f"/rp/{i}"], rp["client_id"])
+
+def test_failed_deliveries_are_retried(client, receivers):
+    rp = register(client, receivers, "/flaky")
+    receivers.failures["/flaky"] = 2
+    login(client, rp["client_id"])
+    confirm_logout(client)
+    assert "/flaky" in receivers.received
+
+def test_slow_clients_do_not_hold_logout(client, receivers, monkeypatch):
+    monkeypatch.setitem(app.config, "BACKCHANNEL_LOGOUT_WAIT", 0.5)
+    receivers.delay = 2
+    rp = register(client, receivers, "/slow", backchannel_logout_timeout=0.1)
+    login(client, rp["client_id"])
+
+    page = client.get("/logout")
+    confirm = re.search(rb'name="confirm" value="([^"]+)"', page.data).group(1).decode()
+    started = time.monotonic()
+    assert client.post("/logout", data={"confirm": confirm}).status_code == 200
+    assert time.monotonic() - started < 1.5
+
+def test_bare_logout_with_session_needs_confirmation(client, receivers):
+    rp = register(client, receivers, "/rp")
+    login(client, rp["client_id"])
+
+    # A cross-site link or form cannot end the session on its own
+    page = client.get("/logout")
+    assert page.status_code == 200 and b"alice" in page.data and b"logged out" not in page.data
+    assert client.post("/logout").status_code == 200
+    assert client.post("/logout", data={"confirm": "guess"}).status_code == 200
+    assert receivers.received == {}
+    page = client.get("/authorize", query_string={
+        "client_id": rp["client_id"], "redirect_uri": "http://localhost:8080/callback", "response_type": "code",
+        "scope": "openid", "code_challenge": "c", "code_challenge_method": "plain"
+    })
+    assert b"Login" not in page.data
+
+    assert b"logged out" in confirm_logout(client).data
+    assert_logout_token(receivers.received["/rp"], rp["client_id"])
+
+def test_post_logout_redirect(client, receivers):
+    rp = register(client, receivers, "/rp", post_logout_redirect_uris=["http://localhost:8080/bye"])
+    login(client, rp["client_id"])
+    with app.app_context():
+        id_token = TokenService.generate_id_token("user-alice", rp["client_id"])
+
+    response = client.get("/logout", query_string={
+        "id_token_hint": id_token, "post_logout_redirect_uri": "http://evil.example/bye"
+    })
+    assert response.status_code == 400
+
+    response = client.get("/logout", query_string={
+        "id_token_hint": id_token, "post_logout_redirect_uri": "http://localhost:8080/bye", "state": "s1"
+    })
+    assert response.status_code == 302
+    assert parse_qs(urlparse(response.headers["Location"]).query) == {"state": ["s1"]}
+    assert "/rp" in receivers.received
+
+def test_id_token_hint_without_session_needs_confirmation(client, receivers):
+    rp = register(client, receivers, "/rp")
+    with app.test_request_context():
+        record_rp_session("alice", rp["client_id"], int(time.time()))
+        id_token = TokenService.generate_id_token("user-alice", rp["client_id"])
+
+    # Neither a plain GET nor a POST without the confirmation logs anyone out
+    page = client.get("/logout", query_string={"id_token_hint": id_token})
+    assert page.status_code == 200 and b"alice" in page.data
+    assert client.post("/logout", data={"id_token_hint": id_token, "confirm": "guess"}).status_code == 200
+    assert receivers.received == {}
+
+    page = client.get("/logout", query_string={"id_token_hint": id_token})
+    confirm = re.search(rb'name="confirm" value="([^"]+)"', page.data).group(1).decode()
+    response = client.post("/logout", data={"id_token_hint": id_token, "confirm": confirm})
+    assert response.status_code == 200 and b"logged out" in response.data
+    assert_logout_token(receivers.received["/rp"], rp["client_id"])
+    assert client.get("/logout", query_string={"id_token_hint": "garbage"}).status_code == 400
+
+def test_expired_hint_without_session_logs_nobody_out(client, receivers, monkeypatch):
+    rp = register(client, receivers, "/rp")
+    with app.test_request_context():
+        record_rp_session("alice", rp["client_id"], int(time.time()))
+        id_token = TokenService.generate_id_token("user-alice", rp["client_id"])
+    expires = jwt.decode(id_token, options={"verify_signature": False})["exp"]
+    now = time.time
+    monkeypatch.setattr(time, "time", lambda: max(now(), expires + 1))
+    assert client.post("/logout", data={"id_token_hint": id_token}).status_code == 200
+    assert receivers.received == {} and rp_sessions.get("alice")
+
+def test_invalid_hint_keeps_session(client, receivers):
+    rp = register(client, receivers, "/rp")
+    login(client, rp["client_id"])
+    assert client.get("/logout", query_string={"id_token_hint": "garbage"}).status_code == 400
+    with app.app_context():
+        bob_token = TokenService.generate_id_token("user-bob", rp["client_id"])
+    assert client.get("/logout", query_string={"id_token_hint": bob_token}).status_code == 400
+    assert receivers.received == {}
+
+    # Still signed in: the consent page comes back without a login
+    page = client.get("/authorize", query_string={
+        "client_id": rp["client_id"], "redirect_uri": "http://localhost:8080/callback", "response_type": "code",
+        "scope": "openid", "code_challenge": "c", "code_challenge_method": "plain"
+    })
+    assert b"Login" not in page.data
@@ -0,0 +1,63 @@
+# tests/test_metrics.py
+import base64
+import pytest
+from app import app
+from metrics import Counter, Gauge, Histogram, http_request_duration, tokens_issued
+
+def test_metrics_endpoint(client):
+    client.get("/.well-known/openid-configuration")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+
+    text = response.get_data(as_text=True)
+    assert "# TYPE oidc_http_request_duration_seconds histogram" in text
+    assert ('oidc_http_request_duration_seconds_count{route="/.well-known/openid-configuration",'
+            'method="GET",status="200"}') in text
+    assert 'oidc_store_entries{store="authorization_requests"}' in text
+
+def test_request_and_token_counters(client):
+    labels = ("/token", "POST", "200")
+    requests_before = http_request_duration.count(labels)
+    minted_before = tokens_issued.value(("access",))
+
+    credentials = base64.b64encode(b"service123:servicesecret123").decode()
+    app.config["CLIENT_CREDENTIALS_TOKEN_REUSE"] = False
+    try:
+        response = client.post(
+            "/token",
+            data={"grant_type": "client_credentials"},
+            headers={"Authorization": f"Basic {credentials}"}
+        )
+    finally:
+        app.config["CLIENT_CREDENTIALS_TOKEN_REUSE"] = True
+    assert response.status_code == 200
+
+    assert http_request_duration.count(labels) == requests_before + 1
+    assert tokens_issued.value(("access",)) == minted_before + 1
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_latency_seconds", "Test", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, ("/x",))
+    lines = histogram.render()
+    assert 'test_latency_seconds_bucket{route="/x",le="0.1"} 1' in lines
+    assert 'test_latency_seconds_bucket{route="/x",le="1.0"} 2' in lines
+    assert 'test_latency_seconds_bucket{route="/x",le="+Inf"} 3' in lines
+    assert 'test_latency_seconds_count{route="/x"} 3' in lines
+
+def test_counter_and_gauge_render():
+    counter = Counter("test_total", "Test", ("kind",))
+    counter.inc(("a",))
+    counter.inc(("a",), 2)
+    assert counter.render()[-1] == 'test_total{kind="a"} 3.0'
+
+    gauge = Gauge("test_entries", "Test", ("store",))
+    gauge.set_function(lambda: 7, ('we"ird',))
+    assert gauge.render()[-1] == 'test_entries{store="we\\"ird"} 7'
+
+@pytest.fixture
+def client():
+    app.config["TESTING"] = True
+    with app.test_client() as client:
+        yield client
@@ -0,0 +1,65 @@
+# tests/test_profiling.py
+import os
+import pstats
+import time
+from flask import Flask
+import profiling
+from auth.admin import sign_admin_value, verify_admin_signature
+
+ADMIN_TOKEN = "test-admin-token"
+
+def signed_header(timestamp=None):
+    timestamp = str(timestamp if timestamp is not None else int(time.time()))
+    return f"{timestamp}:{sign_admin_value(timestamp, ADMIN_TOKEN)}"
+
+def make_app(tmp_path, enabled=True):
+    app = Flask(__name__)
+    app.config.update(
+        PROFILING_ENABLED=enabled,
+        PROFILING_DIR=str(tmp_path),
+        PROFILING_SAMPLE_RATE=1.0,
+        PROFILING_WINDOW=60,
+        ADMIN_TOKEN=ADMIN_TOKEN
+    )
+    profiling.init_profiler(app)
+
+    @app.route("/token", methods=["POST"])
+    def token():
+        return "ok"
+
+    return app
+
+def profiles(tmp_path):
+    return [os.path.join(root, f) for root, _, files in os.walk(tmp_path) for f in files]
+
+def test_signed_header_profiles_request(tmp_path):
+    client = make_app(tmp_path).test_client()
+    client.post("/token", headers={"X-Profile": signed_header()})
+
+    written = profiles(tmp_path)
+    assert len(written) == 1
+    assert os.path.basename(os.path.dirname(written[0])) == "token"
+    pstats.Stats(written[0])  # loadable
+
+def test_bad_signature_ignored(tmp_path):
+    client = make_app(tmp_path).test_client()
+    client.post("/token", headers={"X-Profile": "123:deadbeef"})
+    client.post("/token", headers={"X-Profile": signed_header(int(time.time()) - 3600)})
+    client.post("/token")
+    assert profiles(tmp_path) == []
+
+def test_armed_sampling(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "_armed_until", 0.0)
+    client = make_app(tmp_path).test_client()
+    profiling.arm(60)
+    client.post("/token")
+    client.post("/token")
+    assert len(profiles(tmp_path)) == 2
+
+def test_disabled_installs_no_hooks(tmp_path):
+    app = make_app(tmp_path, enabled=False)
+    assert not app.before_request_funcs and not app.teardown_request_funcs
+
+def test_admin_signature_requires_token():
+    assert not verify_admin_signature(signed_header(), key="")
+    assert verify_admin_signature(signed_header(), key=ADMIN_TOKEN)
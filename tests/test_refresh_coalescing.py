@@ -0,0 +1,106 @@
+# tests/test_refresh_coalescing.py
+import base64
+import threading
+import time
+import pytest
+import app as app_module
+from app import app
+from auth.refresh import issue_refresh_token
+from auth.token import TokenService
+from cache import SingleFlight
+
+CLIENT_AUTH = {"Authorization": "Basic " + base64.b64encode(b"client123:secret123").decode()}
+
+def test_refresh_stampede_signs_once(monkeypatch):
+    app.config["TESTING"] = True
+    refresh_token = issue_refresh_token("user-stampede", "client123", "openid")
+    signs = []
+    original = TokenService.generate_access_token
+
+    def slow_sign(sub, scope, *args):
+        signs.append(sub)
+        time.sleep(0.2)  # keep the leader in flight while the burst arrives
+        return original(sub, scope, *args)
+
+    monkeypatch.setattr(TokenService, "generate_access_token", staticmethod(slow_sign))
+
+    burst = 8
+    barrier = threading.Barrier(burst)
+    results = [None] * burst
+
+    def worker(i):
+        with app.test_client() as client:
+            barrier.wait()
+            response = client.post(
+                "/token",
+                data={"grant_type": "refresh_token", "refresh_token": refresh_token},
+                headers=CLIENT_AUTH
+            )
+            results[i] = (response.status_code, response.get_json())
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(burst)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert signs == ["user-stampede"]
+    assert all(status == 200 for status, _ in results)
+    assert len({body["access_token"] for _, body in results}) == 1
+    # Coalesced duplicates share the rotated token instead of tripping reuse detection
+    assert len({body["refresh_token"] for _, body in results}) == 1
+
+def test_invalid_refresh_token_not_cached(client, monkeypatch):
+    response = client.post(
+        "/token",
+        data={"grant_type": "refresh_token", "refresh_token": "not-a-jwt"},
+        headers=CLIENT_AUTH
+    )
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "invalid_grant"
+
+    # A failed attempt is not replayed to a retry within the coalescing window
+    refresh_token = issue_refresh_token("user-alice", "client123", "openid")
+    rotate = app_module.rotate_refresh_token
+    failures = [ValueError("store unavailable")]
+    def flaky_rotate(*args):
+        if failures:
+            raise failures.pop()
+        return rotate(*args)
+    monkeypatch.setattr(app_module, "rotate_refresh_token", flaky_rotate)
+
+    data = {"grant_type": "refresh_token", "refresh_token": refresh_token}
+    assert app.config["REFRESH_COALESCE_WINDOW"] > 0
+    assert client.post("/token", data=data, headers=CLIENT_AUTH).status_code == 400
+    response = client.post("/token", data=data, headers=CLIENT_AUTH)
+    assert response.status_code == 200 and response.get_json()["refresh_token"]
+
+def test_single_flight_window():
+    flight = SingleFlight(window=60)
+    calls = []
+    assert flight.do("k", lambda: calls.append(1) or "first") == ("first", False)
+    assert flight.do("k", lambda: calls.append(1) or "second") == ("first", True)
+    assert flight.do("other", lambda: "third") == ("third", False)
+    assert len(calls) == 1
+
+def test_single_flight_without_window_reruns():
+    flight = SingleFlight()
+    assert flight.do("k", lambda: 1) == (1, False)
+    assert flight.do("k", lambda: 2) == (2, False)
+
+def test_single_flight_propagates_errors():
+    flight = SingleFlight(window=60)
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        flight.do("k", fail)
+    # Failures are not cached
+    assert flight.do("k", lambda: "ok") == ("ok", False)
+
+@pytest.fixture
+def client():
+    app.config["TESTING"] = True
+    with app.test_client() as client:
+        yield client
@@ -0,0 +1,107 @@
+# tests/test_refresh_rotation.py
+import base64
+import threading
+import pytest
+from app import app
+from auth.refresh import issue_refresh_token, refresh_families, refresh_redemptions, revoke_family, rotate_refresh_token
+from auth.token import TokenService
+
+CLIENT_AUTH = {"Authorization": "Basic " + base64.b64encode(b"client123:secret123").decode()}
+
+def refresh(client, token, headers=CLIENT_AUTH):
+    return client.post("/token", data={"grant_type": "refresh_token", "refresh_token": token}, headers=headers)
+
+@pytest.fixture
+def client(monkeypatch):
+    app.config["TESTING"] = True
+    # Each request is its own exchange here, not a coalesced duplicate
+    monkeypatch.setattr(app.extensions["refresh_flight"], "window", 0)
+    with app.test_client() as client:
+        yield client
+
+def test_rotation_issues_successor(client):
+    first = issue_refresh_token("user-alice", "client123", "openid profile")
+    response = refresh(client, first)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["refresh_token"] != first
+
+    old, new = TokenService.decode_token(first), TokenService.decode_token(body["refresh_token"])
+    assert new["fid"] == old["fid"] and new["jti"] != old["jti"]
+    # Rotation never extends the family lifetime
+    assert new["exp"] == old["exp"]
+    assert TokenService.decode_token(body["access_token"])["scope"] == "openid profile"
+
+    assert refresh(client, body["refresh_token"]).status_code == 200
+
+def test_reuse_revokes_family(client):
+    first = issue_refresh_token("user-alice", "client123", "openid")
+    second = refresh(client, first).get_json()["refresh_token"]
+    family_id = TokenService.decode_token(first)["fid"]
+
+    reused = refresh(client, first)
+    assert reused.status_code == 400
+    assert "reuse" in reused.get_json()["error_description"]
+    assert refresh_families.get(family_id) is None
+    # The legitimate successor dies with the family
+    assert refresh(client, second).status_code == 400
+
+def test_other_client_rejected_without_revoking(client):
+    token = issue_refresh_token("user-alice", "client123", "openid")
+    other = {"Authorization": "Basic " + base64.b64encode(b"service123:servicesecret123").decode()}
+    assert refresh(client, token, headers=other).status_code == 400
+    assert refresh(client, token).status_code == 200
+
+def test_concurrent_redemption_keeps_family(monkeypatch):
+    token = issue_refresh_token("user-alice", "client123", "openid")
+    family_id = TokenService.decode_token(token)["fid"]
+    # Every worker has read the family before any of them redeems the token
+    barrier, first_read = threading.Barrier(4), threading.local()
+    get = refresh_families.get
+    def synchronized_get(key):
+        family = get(key)
+        if not getattr(first_read, "done", False):
+            first_read.done = True
+            barrier.wait(5)
+        return family
+    monkeypatch.setattr(refresh_families, "get", synchronized_get)
+
+    rotated, errors = [], []
+    def redeem():
+        try:
+            rotated.append(rotate_refresh_token(token, "client123")[0])
+        except ValueError as e:
+            errors.append(str(e))
+    threads = [threading.Thread(target=redeem) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    monkeypatch.setattr(refresh_families, "get", get)
+
+    assert len(rotated) == 1
+    assert errors == ["Refresh token has already been redeemed"] * 3
+    # The losers neither revoked nor overwrote the family
+    assert get(family_id)["current"] == TokenService.decode_token(rotated[0])["jti"]
+    rotate_refresh_token(rotated[0], "client123")
+
+def test_rotations_leave_no_claims_behind():
+    token = issue_refresh_token("user-alice", "client123", "openid")
+    before = len(refresh_redemptions)
+    for _ in range(20):
+        token, _ = rotate_refresh_token(token, "client123")
+    # One family entry, however often it rotates
+    assert len(refresh_redemptions) == before
+
+def test_revoke_family(client):
+    token = issue_refresh_token("user-alice", "client123", "openid")
+    assert revoke_family(TokenService.decode_token(token)["fid"])
+    assert refresh(client, token).status_code == 400
+
+def test_family_expires_with_store_entry(client):
+    token = issue_refresh_token("user-alice", "client123", "openid", ttl=1)
+    family_id = TokenService.decode_token(token)["fid"]
+    value, exp = refresh_families._data[family_id]
+    refresh_families._data[family_id] = (value, exp - 2)
+    assert refresh_families.purge_expired() >= 1
+    assert refresh(client, token).status_code == 400
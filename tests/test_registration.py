@@ -0,0 +1,133 @@
+# tests/test_registration.py
+import base64
+import json
+import pytest
+from app import app
+from auth.client_auth import authenticate_client, client_policies, get_client_policy
+from auth.registration import import_clients
+from models import clients
+from store import StoreMapping
+
+ADMIN_TOKEN = "import-admin"
+
+@pytest.fixture
+def client(monkeypatch):
+    app.config["TESTING"] = True
+    monkeypatch.setitem(app.config, "ADMIN_TOKEN", ADMIN_TOKEN)
+    monkeypatch.setitem(app.config, "REGISTRATION_OPEN", True)
+    monkeypatch.setitem(app.config, "REGISTRATION_SCOPES", "openid profile email reports.read")
+    before = set(clients)
+    with app.test_client() as client:
+        yield client
+    for client_id in set(clients) - before:
+        del clients[client_id]
+        client_policies.pop(client_id, None)
+
+def basic(client_id, client_secret):
+    return {"Authorization": "Basic " + base64.b64encode(f"{client_id}:{client_secret}".encode()).decode()}
+
+def test_registered_client_can_get_tokens(client):
+    response = client.post("/register", json={
+        "client_name": "Reporting",
+        "grant_types": ["client_credentials"],
+        "scope": "reports.read"
+    })
+    assert response.status_code == 201
+    registered = response.get_json()
+    assert registered["client_secret"] and registered["client_secret_expires_at"] == 0
+    assert registered["client_name"] == "Reporting"
+
+    token = client.post("/token", data={"grant_type": "client_credentials"},
+                        headers=basic(registered["client_id"], registered["client_secret"]))
+    assert token.status_code == 200
+    assert token.get_json()["scope"] == "reports.read"
+
+def test_registered_redirect_uri_accepted_by_authorize(client):
+    registered = client.post("/register", json={"redirect_uris": ["https://app.example.com/cb"]}).get_json()
+    response = client.get("/authorize", query_string={
+        "response_type": "code",
+        "client_id": registered["client_id"],
+        "redirect_uri": "https://app.example.com/cb",
+        "scope": "openid"
+    })
+    assert response.status_code == 200
+
+def test_registered_clients_are_seen_by_other_workers(client, monkeypatch):
+    registered = client.post("/register", json={"redirect_uris": ["https://app.example.com/cb"]}).get_json()
+    lines = "\n".join(json.dumps({"client_id": f"shared-{i}", "grant_types": ["client_credentials"]}) for i in range(3))
+    imported = client.post("/admin/clients/import", data=lines, headers={"X-Admin-Token": ADMIN_TOKEN})
+    secrets = {r["client_id"]: r["client_secret"] for r in map(json.loads, imported.get_data(as_text=True).splitlines())}
+
+    # Another worker: the same shared store, but its own seeded records and policy cache
+    monkeypatch.setattr("auth.client_auth.clients", StoreMapping(clients.store))
+    monkeypatch.setattr("auth.client_auth.client_policies", {})
+    assert authenticate_client(registered["client_id"], registered["client_secret"])
+    assert get_client_policy(registered["client_id"]).redirect_uris == {"https://app.example.com/cb"}
+    assert all(authenticate_client(client_id, secret) for client_id, secret in secrets.items())
+
+@pytest.mark.parametrize("metadata, error", [
+    ({}, "invalid_redirect_uri"),
+    ({"redirect_uris": ["javascript:alert(1)"]}, "invalid_redirect_uri"),
+    ({"redirect_uris": ["https://a.example/cb"], "grant_types": ["password"]}, "invalid_client_metadata"),
+    ({"redirect_uris": "https://a.example/cb"}, "invalid_client_metadata"),
+    ({"grant_types": ["client_credentials"], "scope": "admin api.write superuser"}, "invalid_client_metadata"),
+])
+def test_invalid_metadata(client, metadata, error):
+    response = client.post("/register", json=metadata)
+    assert response.status_code == 400
+    assert response.get_json()["error"] == error
+
+def test_client_cannot_choose_credentials(client):
+    registered = client.post("/register", json={
+        "client_id": "client123", "client_secret": "mine", "grant_types": ["client_credentials"]
+    }).get_json()
+    assert registered["client_id"] != "client123"
+    assert clients["client123"]["client_secret"] == "secret123"
+
+def test_unknown_metadata_is_dropped(client):
+    registered = client.post("/register", json={
+        "grant_types": ["client_credentials"], "client_name": "Reporting", "is_admin": True, "client_policies": {}
+    }).get_json()
+    assert registered["client_name"] == "Reporting"
+    assert "is_admin" not in registered and "is_admin" not in clients[registered["client_id"]]
+
+def test_closed_unless_opened(client, monkeypatch):
+    monkeypatch.setitem(app.config, "REGISTRATION_OPEN", False)
+    response = client.post("/register", json={"grant_types": ["client_credentials"]})
+    assert response.status_code == 401
+
+def test_initial_access_token(client, monkeypatch):
+    monkeypatch.setitem(app.config, "REGISTRATION_ACCESS_TOKEN", "onboarding")
+    metadata = {"grant_types": ["client_credentials"]}
+    assert client.post("/register", json=metadata).status_code == 401
+    assert client.post("/register", json=metadata,
+                       headers={"Authorization": "Bearer onboarding"}).status_code == 201
+
+def test_bulk_import_api(client):
+    lines = [json.dumps({"client_id": f"tenant-{i}", "grant_types": ["client_credentials"]}) for i in range(25)]
+    lines[3] = "{not json"
+    lines[7] = json.dumps({"client_id": "client123", "grant_types": ["client_credentials"]})
+    body = "\n".join(lines) + "\n"
+
+    assert client.post("/admin/clients/import", data=body).status_code == 403
+    response = client.post("/admin/clients/import?batch_size=10", data=body,
+                           headers={"X-Admin-Token": ADMIN_TOKEN})
+    assert response.status_code == 200
+    results = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    assert [r["line"] for r in results] == list(range(1, 26))
+    assert {r["line"] for r in results if "error" in r} == {4, 8}
+    assert "tenant-24" in clients and "tenant-3" not in clients
+    issued = next(r for r in results if r.get("client_id") == "tenant-0")
+    assert authenticate_client("tenant-0", issued["client_secret"])
+
+def test_import_writes_in_batches(client, monkeypatch):
+    writes = []
+    original = clients.update
+    registry = type("Registry", (dict,), {
+        "update": lambda self, batch: writes.append(len(batch)) or original(batch)
+    })(clients)
+    monkeypatch.setattr("auth.registration.client_registry", lambda: (registry, {}))
+    lines = (json.dumps({"grant_types": ["client_credentials"]}) for _ in range(25))
+    assert len(list(import_clients(lines, batch_size=10))) == 25
+    assert writes == [10, 10, 5]
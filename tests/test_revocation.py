@@ -0,0 +1,103 @@
+# tests/test_revocation.py
+import base64
+import time
+import pytest
+from app import app
+from auth.refresh import issue_refresh_token, refresh_families
+from auth.revocation import is_revoked, revoke_jti, revoked_tokens
+from auth.token import TokenService
+
+CLIENT_AUTH = {"Authorization": "Basic " + base64.b64encode(b"client123:secret123").decode()}
+SERVICE_AUTH = {"Authorization": "Basic " + base64.b64encode(b"service123:servicesecret123").decode()}
+
+def bearer(token):
+    return {"Authorization": f"Bearer {token}"}
+
+@pytest.fixture
+def client():
+    app.config["TESTING"] = True
+    with app.test_client() as client:
+        yield client
+
+def test_tokens_carry_jti():
+    access = TokenService.decode_token(TokenService.generate_access_token("user-alice", "openid"))
+    id_token = TokenService.decode_token(TokenService.generate_id_token("user-alice", "client123"))
+    assert access["jti"] and id_token["jti"] and access["jti"] != id_token["jti"]
+
+def test_revoked_access_token_rejected(client):
+    token = TokenService.generate_access_token("user-alice", "openid", "client123")
+    assert client.get("/userinfo", headers=bearer(token)).status_code == 200
+    assert client.post("/introspect", data={"token": token}, headers=CLIENT_AUTH).get_json()["active"]
+
+    assert client.post("/revoke", data={"token": token}, headers=CLIENT_AUTH).status_code == 200
+    assert client.get("/userinfo", headers=bearer(token)).status_code == 401
+    assert client.post("/introspect", data={"token": token}, headers=CLIENT_AUTH).get_json() == {"active": False}
+
+def test_revoke_refresh_token_kills_family(client):
+    token = issue_refresh_token("user-alice", "client123", "openid")
+    introspected = client.post("/introspect", data={"token": token}, headers=CLIENT_AUTH).get_json()
+    assert introspected["active"] and introspected["token_type"] == "refresh_token"
+
+    assert client.post("/revoke", data={"token": token, "token_type_hint": "refresh_token"},
+                       headers=CLIENT_AUTH).status_code == 200
+    response = client.post("/token", data={"grant_type": "refresh_token", "refresh_token": token},
+                           headers=CLIENT_AUTH)
+    assert response.status_code == 400
+
+def test_userinfo_rejects_revoked_refresh_and_id_tokens(client):
+    token = issue_refresh_token("user-alice", "client123", "openid")
+    assert client.post("/revoke", data={"token": token}, headers=CLIENT_AUTH).status_code == 200
+    assert client.post("/introspect", data={"token": token}, headers=CLIENT_AUTH).get_json() == {"active": False}
+    assert client.get("/userinfo", headers=bearer(token)).status_code == 401
+
+    # Neither is a bearer credential even while valid
+    live = issue_refresh_token("user-alice", "client123", "openid")
+    id_token = TokenService.generate_id_token("user-alice", "client123")
+    for token in (live, id_token):
+        response = client.get("/userinfo", headers=bearer(token))
+        assert response.status_code == 401 and "Not an access token" in response.get_json()["error_description"]
+
+def test_revoke_requires_owner(client):
+    token = TokenService.generate_access_token("user-alice", "openid", "client123")
+    assert client.post("/revoke", data={"token": token}, headers=SERVICE_AUTH).status_code == 400
+    assert client.post("/revoke", data={"token": token}).status_code == 400
+    assert not is_revoked(TokenService.decode_token(token)["jti"])
+
+def test_id_token_revocable_only_by_its_client(client):
+    id_token = TokenService.generate_id_token("user-alice", "client123")
+    assert client.post("/revoke", data={"token": id_token}, headers=SERVICE_AUTH).status_code == 400
+    assert not is_revoked(TokenService.decode_token(id_token)["jti"])
+    assert client.post("/revoke", data={"token": id_token}, headers=CLIENT_AUTH).status_code == 200
+    assert is_revoked(TokenService.decode_token(id_token)["jti"])
+
+def test_introspect_survives_family_deleted_mid_request(client, monkeypatch):
+    token = issue_refresh_token("user-alice", "client123", "openid")
+    get = refresh_families.get
+    calls = []
+    def get_once(key):
+        # The family disappears right after the first lookup
+        calls.append(key)
+        return get(key) if len(calls) == 1 else None
+    monkeypatch.setattr(refresh_families, "get", get_once)
+    response = client.post("/introspect", data={"token": token}, headers=CLIENT_AUTH)
+    assert response.status_code == 200
+    assert response.get_json()["scope"] == "openid"
+
+def test_revoke_invalid_token_is_ok(client):
+    assert client.post("/revoke", data={"token": "garbage"}, headers=CLIENT_AUTH).status_code == 200
+
+def test_revoked_client_credentials_token_not_reused(client):
+    data = {"grant_type": "client_credentials", "scope": "api.read"}
+    first = client.post("/token", data=data, headers=SERVICE_AUTH).get_json()["access_token"]
+    client.post("/revoke", data={"token": first}, headers=SERVICE_AUTH)
+    second = client.post("/token", data=data, headers=SERVICE_AUTH).get_json()["access_token"]
+    assert second != first
+
+def test_revocations_expire_with_token():
+    assert not revoke_jti("long-gone", int(time.time()) - 3600)
+    assert revoke_jti("short-lived", int(time.time()) - TokenService.LENIENT_LEEWAY + 1)
+    value, exp = revoked_tokens._data["short-lived"]
+    assert exp - time.time() <= 1
+    revoked_tokens._data["short-lived"] = (value, time.time() - 1)
+    revoked_tokens.purge_expired()
+    assert "short-lived" not in revoked_tokens._data
@@ -0,0 +1,65 @@
+# tests/test_sealed_codes.py
+import base64
+import pytest
+from app import app
+from auth.codes import open_code, seal_code
+from loadgen import FlaskTransport, Recorder, run_flow
+from models import authorization_codes
+
+SECRET = "test-sealing-secret"
+CLAIMS = {"client_id": "client123", "user": "alice", "scope": "openid", "nonce": "n"}
+
+@pytest.fixture
+def sealed(monkeypatch):
+    app.config["TESTING"] = True
+    monkeypatch.setitem(app.config, "SEALED_AUTHORIZATION_CODES", True)
+    monkeypatch.setitem(app.config, "AUTHORIZATION_CODE_KEY", SECRET)
+
+def test_round_trip_is_single_use():
+    code = seal_code(CLAIMS, 60, SECRET)
+    assert open_code(code, SECRET) == CLAIMS
+    assert open_code(code, SECRET) is None
+
+def test_padding_and_junk_variants_are_rejected():
+    code = seal_code(CLAIMS, 60, SECRET)
+    for variant in (code + "==", code + "....", code + " ", code + "\n", code + "=\n"):
+        assert open_code(variant, SECRET) is None
+    assert open_code(code, SECRET) == CLAIMS
+    assert open_code(code, SECRET) is None
+
+def test_rejects_forged_expired_and_foreign_codes():
+    code = seal_code(CLAIMS, 60, SECRET)
+    blob = bytearray(base64.urlsafe_b64decode(code + "=" * (-len(code) % 4)))
+    blob[-1] ^= 1
+    assert open_code(base64.urlsafe_b64encode(bytes(blob)).decode(), SECRET) is None
+    assert open_code(code, "another-secret") is None
+    assert open_code(seal_code(CLAIMS, -1, SECRET), SECRET) is None
+    assert open_code("not-a-code", SECRET) is None
+
+def test_raw_32_byte_key_used_directly():
+    key = base64.urlsafe_b64encode(bytes(range(32))).decode()
+    assert open_code(seal_code(CLAIMS, 60, key), key) == CLAIMS
+
+def test_flow_without_code_storage(sealed):
+    stored = len(authorization_codes)
+    recorder = Recorder()
+    run_flow(FlaskTransport(app), recorder)
+    assert recorder.errors == {}
+    assert len(authorization_codes) == stored
+
+def test_stored_codes_still_redeemable(sealed, monkeypatch):
+    # Codes issued before sealing was enabled keep working during a rollout
+    monkeypatch.setitem(app.config, "SEALED_AUTHORIZATION_CODES", False)
+    transport = FlaskTransport(app)
+    original = transport.request
+
+    def switch_after_consent(method, path, **kwargs):
+        response = original(method, path, **kwargs)
+        if response.status == 302 and "code=" in response.headers.get("Location", ""):
+            app.config["SEALED_AUTHORIZATION_CODES"] = True
+        return response
+
+    transport.request = switch_after_consent
+    recorder = Recorder()
+    run_flow(transport, recorder)
+    assert recorder.errors == {}
@@ -0,0 +1,62 @@
+# tests/test_server_timing.py
+import base64
+from flask import Flask
+from app import app
+from loadgen import Recorder, Response
+from metrics import init_server_timing, phase, phase_duration
+
+def test_server_timing_header():
+    timed = Flask(__name__)
+    init_server_timing(timed)
+
+    @timed.route("/work")
+    def work():
+        with phase("sign"):
+            pass
+        with phase("sign"):
+            pass
+        with phase("store"):
+            pass
+        return "ok"
+
+    @timed.route("/idle")
+    def idle():
+        return "ok"
+
+    response = timed.test_client().get("/work")
+    entries = [entry.split(";")[0] for entry in response.headers["Server-Timing"].split(", ")]
+    assert entries == ["sign", "store"]
+    assert "Server-Timing" not in timed.test_client().get("/idle").headers
+
+def test_token_phases_recorded():
+    app.config["TESTING"] = True
+    before = {name: phase_duration.count((name,)) for name in ("client_auth", "key_load", "sign")}
+    credentials = base64.b64encode(b"service123:servicesecret123").decode()
+    app.config["CLIENT_CREDENTIALS_TOKEN_REUSE"] = False
+    try:
+        with app.test_client() as client:
+            response = client.post(
+                "/token",
+                data={"grant_type": "client_credentials"},
+                headers={"Authorization": f"Basic {credentials}"}
+            )
+    finally:
+        app.config["CLIENT_CREDENTIALS_TOKEN_REUSE"] = True
+    assert response.status_code == 200
+    for name, count in before.items():
+        assert phase_duration.count((name,)) == count + 1
+
+def test_phase_outside_request_context():
+    before = phase_duration.count(("offline",))
+    with phase("offline"):
+        pass
+    assert phase_duration.count(("offline",)) == before + 1
+
+def test_loadgen_collects_phases():
+    class Transport:
+        def request(self, method, path, **kwargs):
+            return Response(200, {"Server-Timing": "sign;dur=2.5, store;dur=0.100"}, b"")
+
+    recorder = Recorder()
+    recorder.call("token", Transport(), "POST", "/token")
+    assert recorder.phases["token"] == {"sign": [2.5], "store": [0.1]}
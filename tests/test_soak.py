@@ -0,0 +1,55 @@
+# tests/test_soak.py
+"""
+Leak soak test: runs complete flows through the Flask test client and
+checks that the stores and traced memory stay bounded.
+
+    SOAK_FLOWS=1000000 pytest tests/test_soak.py
+"""
+import contextlib
+import gc
+import os
+import time
+import tracemalloc
+from app import app, clear_caches, STORES
+from loadgen import FlaskTransport, Recorder, run_flow
+
+SOAK_FLOWS = int(os.environ.get("SOAK_FLOWS", 200))
+SOAK_MAX_GROWTH_BYTES = int(os.environ.get("SOAK_MAX_GROWTH_BYTES", 512 * 1024))
+
+def run_flows(count):
+    for _ in range(count):
+        # A new browser each time: full login, a new SSO session
+        run_flow(FlaskTransport(app), Recorder())
+
+def settle():
+    """Let short-lived entries expire, sweep them and collect garbage"""
+    time.sleep(2.1)
+    for store in STORES.values():
+        if hasattr(store, "purge_expired"):
+            store.purge_expired()
+    # Size-capped caches are bounded by design; only leaks should remain
+    clear_caches(app)
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+def test_soak_memory_bounded(monkeypatch):
+    app.config["TESTING"] = True
+    # Abandoned sessions and token families would otherwise legitimately live for hours
+    monkeypatch.setitem(app.config, "SSO_SESSION_MAX_AGE", 1)
+    monkeypatch.setitem(app.config, "REFRESH_TOKEN_TTL", 2)
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        tracemalloc.start()
+        try:
+            run_flows(max(10, SOAK_FLOWS // 4))
+            baseline = settle()
+            sizes = {name: len(store) for name, store in STORES.items()}
+            run_flows(SOAK_FLOWS)
+            final = settle()
+        finally:
+            tracemalloc.stop()
+
+    assert final - baseline < SOAK_MAX_GROWTH_BYTES, f"grew {final - baseline} bytes over {SOAK_FLOWS} flows"
+    # Complete flows leave nothing behind once their entries expire
+    for name, store in STORES.items():
+        assert len(store) <= sizes[name] + 2, f"{name} grew from {sizes[name]} to {len(store)}"
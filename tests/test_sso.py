@@ -0,0 +1,104 @@
+# tests/test_sso.py
+import base64
+import time
+from urllib.parse import urlparse, parse_qs
+import pytest
+from app import app
+from auth.consent import remember_consent, revoke_consent
+from auth.token import TokenService
+from models import clients, users, sso_sessions
+
+REDIRECT_URI = clients["client123"]["redirect_uris"][0]
+
+def authorize(client, **extra):
+    params = {
+        "client_id": "client123",
+        "redirect_uri": REDIRECT_URI,
+        "response_type": "code",
+        "state": "st",
+        "scope": "openid",
+        "code_challenge": "testchallenge",
+        "code_challenge_method": "plain"
+    }
+    params.update(extra)
+    return client.get("/authorize", query_string=params)
+
+def login(client):
+    authorize(client)
+    client.post("/authorize", data={"username": "alice", "password": users["alice"]["password"]})
+
+def redirect_params(response):
+    assert response.status_code == 302
+    return parse_qs(urlparse(response.headers["Location"]).query)
+
+def test_sso_session_skips_login(client):
+    login(client)
+    response = authorize(client)
+    assert response.status_code == 200
+    assert b"Consent" in response.data and b"Login" not in response.data
+
+def test_prompt_none_without_session(client):
+    params = redirect_params(authorize(client, prompt="none"))
+    assert params["error"] == ["login_required"]
+    assert params["state"] == ["st"]
+
+def test_prompt_none_requires_consent(client):
+    login(client)
+    params = redirect_params(authorize(client, prompt="none"))
+    assert params["error"] == ["consent_required"]
+
+def test_prompt_none_issues_code(client):
+    login(client)
+    remember_consent("alice", "client123", "openid")
+    params = redirect_params(authorize(client, prompt="none"))
+    assert "code" in params
+
+def test_prompt_login_forces_login(client):
+    login(client)
+    remember_consent("alice", "client123", "openid")
+    response = authorize(client, prompt="login")
+    assert response.status_code == 200
+    assert b"Login" in response.data
+
+def test_max_age_exceeded(client):
+    login(client)
+    remember_consent("alice", "client123", "openid")
+    with client.session_transaction() as sess:
+        sid = sess["sid"]
+    sso = sso_sessions.get(sid)
+    sso_sessions.set(sid, {**sso, "auth_time": int(time.time()) - 120}, 600)
+
+    assert authorize(client, max_age="60").status_code == 200
+    assert "code" in redirect_params(authorize(client, max_age="3600"))
+    assert authorize(client, max_age="soon").status_code == 400
+
+def test_auth_time_and_nonce_in_id_token(client):
+    login(client)
+    with client.session_transaction() as sess:
+        auth_time = sso_sessions.get(sess["sid"])["auth_time"]
+    remember_consent("alice", "client123", "openid")
+
+    code = redirect_params(authorize(client, nonce="abc123"))["code"][0]
+    credentials = base64.b64encode(b"client123:secret123").decode()
+    response = client.post(
+        "/token",
+        data={
+            "grant_type": "authorization_code",
+            "code": code,
+            "client_id": "client123",
+            "code_verifier": "testchallenge"
+        },
+        headers={"Authorization": f"Basic {credentials}"}
+    )
+    assert response.status_code == 200
+    id_token = TokenService.decode_token(response.get_json()["id_token"])
+    assert id_token["auth_time"] == auth_time
+    assert id_token["nonce"] == "abc123"
+
+@pytest.fixture
+def client():
+    app.config["TESTING"] = True
+    revoke_consent("alice", "client123")
+    with app.test_client() as client:
+        yield client
+    revoke_consent("alice", "client123")
@@ -0,0 +1,54 @@
+# tests/test_status_report.py
+from app import app
+import argparse
+from loadgen import Credentials, FlaskTransport, add_credential_arguments, credentials_from_args
+import status_report
+
+def probe(**kwargs):
+    app.config["TESTING"] = True
+    return status_report.run_probe(lambda: FlaskTransport(app), duration=0.2, users=1, **kwargs)
+
+def test_probe_healthy():
+    report = probe()
+    assert report["status"] == "healthy", report["checks"]
+    names = {check["name"] for check in report["checks"]}
+    assert {"discovery", "jwks", "routed:token_endpoint", "client_credentials", "flow"} <= names
+    assert report["flow"]["flows_completed"] > 0
+    assert report["server_metrics"]["routes"]["/token"]["count"] > 0
+
+def test_probe_degraded_on_slo_breach():
+    report = probe(slos={"token": 0})
+    assert report["status"] == "degraded"
+    assert not next(s for s in report["slos"] if s["endpoint"] == "token")["ok"]
+
+def test_probe_uses_configured_credentials():
+    report = probe(credentials=Credentials(password="wrong"), service_client=("service123", "wrong"))
+    assert report["status"] == "degraded"
+    assert report["flow"]["flows_completed"] == 0 and report["flow"]["flows_failed"] > 0
+    assert not next(c for c in report["checks"] if c["name"] == "client_credentials")["ok"]
+
+def test_credentials_fall_back_to_environment(monkeypatch):
+    monkeypatch.setenv("OIDC_USERNAME", "probe-user")
+    monkeypatch.setenv("OIDC_PASSWORD", "from-env")
+    parser = argparse.ArgumentParser()
+    add_credential_arguments(parser)
+    credentials = credentials_from_args(parser.parse_args(["--client-id", "probe"]))
+    assert credentials == Credentials(client_id="probe", username="probe-user", password="from-env")
+
+def test_unreachable_exit_code():
+    assert status_report.main(["--url", "http://127.0.0.1:9", "--duration", "0"]) == 2
+
+def test_metrics_delta():
+    before = status_report.parse_metrics(
+        'oidc_http_request_duration_seconds_count{route="/token",method="POST",status="200"} 2.0\n'
+    )
+    after = status_report.parse_metrics(
+        '# TYPE oidc_http_request_duration_seconds histogram\n'
+        'oidc_http_request_duration_seconds_count{route="/token",method="POST",status="200"} 5.0\n'
+        'oidc_http_request_duration_seconds_sum{route="/token",method="POST",status="200"} 0.03\n'
+        'oidc_http_request_duration_seconds_count{route="/token",method="POST",status="500"} 1.0\n'
+    )
+    delta = status_report.metrics_delta(before, after)
+    assert delta["requests"] == 4
+    assert delta["server_error_rate"] == 0.25
+    assert delta["routes"]["/token"]["count"] == 4
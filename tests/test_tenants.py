@@ -0,0 +1,114 @@
+# tests/test_tenants.py
+import base64
+import json
+import jwt
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from app import app, clear_caches
+from tenants import TenantRegistry
+
+def b64int(value):
+    return base64.urlsafe_b64encode(value.to_bytes((value.bit_length() + 7) // 8, "big")).rstrip(b"=").decode()
+
+def write_tenant(directory, tenant_id, clients):
+    path = directory / tenant_id
+    path.mkdir()
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    (path / "private.pem").write_bytes(key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ))
+    (path / "public.pem").write_bytes(key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ))
+    numbers = key.public_key().public_numbers()
+    (path / "jwks.json").write_text(json.dumps({"keys": [{
+        "kty": "RSA", "use": "sig", "alg": "RS256", "kid": f"{tenant_id}-1",
+        "n": b64int(numbers.n), "e": b64int(numbers.e)
+    }]}))
+    (path / "clients.json").write_text(json.dumps(clients))
+
+SERVICE = {
+    "client_id": "svc",
+    "client_secret": "svc-secret",
+    "grant_types": ["client_credentials"],
+    "scope": "reports.read"
+}
+
+@pytest.fixture(scope="module")
+def tenants_dir(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("tenants")
+    write_tenant(directory, "acme", [SERVICE])
+    write_tenant(directory, "globex", [{**SERVICE, "client_secret": "globex-secret"}])
+    return directory
+
+@pytest.fixture
+def client(tenants_dir, monkeypatch):
+    app.config["TESTING"] = True
+    registry = TenantRegistry(str(tenants_dir), app.config["TENANT_ISSUER_TEMPLATE"], app.config["ISSUER_URL"], 1)
+    monkeypatch.setitem(app.extensions, "tenants", registry)
+    monkeypatch.setitem(app.config, "REGISTRATION_OPEN", True)
+    monkeypatch.setitem(app.config, "REGISTRATION_SCOPES", "openid reports.read")
+    with app.test_client() as client:
+        yield client
+    clear_caches(app)
+
+def basic(client_id, client_secret):
+    return {"Authorization": "Basic " + base64.b64encode(f"{client_id}:{client_secret}".encode()).decode()}
+
+def issue(client, tenant_id, secret="svc-secret"):
+    return client.post(f"/t/{tenant_id}/token", data={"grant_type": "client_credentials"},
+                       headers=basic("svc", secret))
+
+def test_discovery_uses_tenant_issuer(client):
+    document = client.get("/t/acme/.well-known/openid-configuration").get_json()
+    issuer = app.config["ISSUER_URL"].rstrip("/") + "/t/acme"
+    assert document["issuer"] == issuer
+    assert document["token_endpoint"] == "http://localhost/t/acme/token"
+    assert document["jwks_uri"] == "http://localhost/t/acme/.well-known/jwks.json"
+    # The default issuer is unchanged
+    assert client.get("/.well-known/openid-configuration").get_json()["issuer"] == app.config["ISSUER_URL"].rstrip("/")
+
+def test_unknown_tenant_is_not_found(client):
+    assert client.get("/t/initech/.well-known/jwks.json").status_code == 404
+    assert client.get("/t/..%2Facme/.well-known/jwks.json").status_code == 404
+
+def test_tokens_are_signed_with_tenant_keys(client):
+    response = issue(client, "acme")
+    assert response.status_code == 200
+    access_token = response.get_json()["access_token"]
+    assert jwt.get_unverified_header(access_token)["kid"] == "acme-1"
+
+    jwks = client.get("/t/acme/.well-known/jwks.json").get_json()
+    key = jwt.PyJWK(jwks["keys"][0]).key
+    claims = jwt.decode(access_token, key, algorithms=["RS256"], options={"verify_aud": False})
+    assert claims["iss"].endswith("/t/acme")
+
+def test_tenants_are_isolated(client):
+    # Each tenant has its own client registry
+    assert issue(client, "globex").get_json()["error"] == "invalid_client"
+    assert issue(client, "globex", "globex-secret").status_code == 200
+    assert client.post("/token", data={"grant_type": "client_credentials"},
+                       headers=basic("svc", "svc-secret")).get_json()["error"] == "invalid_client"
+
+    # A token minted by one tenant is not accepted by another
+    access_token = issue(client, "acme").get_json()["access_token"]
+    for tenant_id in ("acme", "globex"):
+        response = client.post(f"/t/{tenant_id}/introspect", data={"token": access_token},
+                               headers=basic("svc", "svc-secret" if tenant_id == "acme" else "globex-secret"))
+        assert response.get_json()["active"] is (tenant_id == "acme")
+
+def test_runtime_registrations_survive_eviction(client):
+    response = client.post("/t/acme/register", json={"grant_types": ["client_credentials"], "scope": "reports.read"})
+    assert response.status_code == 201
+    registered = response.get_json()
+
+    # The registry holds a single tenant, so loading globex evicts acme
+    assert issue(client, "globex", "globex-secret").status_code == 200
+    assert len(app.extensions["tenants"]) == 1
+
+    response = client.post("/t/acme/token", data={"grant_type": "client_credentials"},
+                           headers=basic(registered["client_id"], registered["client_secret"]))
+    assert response.status_code == 200
+    assert client.post("/t/globex/token", data={"grant_type": "client_credentials"},
+                       headers=basic(registered["client_id"], registered["client_secret"])).get_json()["error"] == "invalid_client"
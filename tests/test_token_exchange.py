@@ -0,0 +1,131 @@
+# tests/test_token_exchange.py
+import base64
+import time
+import pytest
+from app import app
+from auth.client_auth import client_policies
+from auth.exchange import ACCESS_TOKEN_TYPE, TOKEN_EXCHANGE_GRANT, derived_tokens
+from auth.revocation import revoke_token
+from auth.token import TokenService
+from metrics import cache_requests
+from models import clients
+
+ORDERS = "https://orders.example.com"
+
+def basic(client_id, client_secret):
+    return {"Authorization": "Basic " + base64.b64encode(f"{client_id}:{client_secret}".encode()).decode()}
+
+GATEWAY_AUTH = basic("gateway123", "gatewaysecret123")
+ORDERS_AUTH = basic("orders-svc", "orders-secret")
+
+@pytest.fixture
+def client():
+    app.config["TESTING"] = True
+    derived_tokens.clear()
+    # The next hop: a service that may exchange tokens addressed to it
+    clients["orders-svc"] = {
+        "client_id": "orders-svc", "client_secret": "orders-secret", "grant_types": [TOKEN_EXCHANGE_GRANT],
+        "scope": "openid profile", "token_exchange_audiences": ["https://billing.example.com"]
+    }
+    with app.test_client() as client:
+        yield client
+    del clients["orders-svc"]
+    client_policies.pop("orders-svc", None)
+
+def user_token(scope="openid profile email"):
+    with app.app_context():
+        return TokenService.generate_access_token("user-alice", scope, "client123")
+
+def exchange(client, subject_token, headers=GATEWAY_AUTH, **params):
+    return client.post("/token", data={
+        "grant_type": TOKEN_EXCHANGE_GRANT,
+        "subject_token": subject_token,
+        "subject_token_type": ACCESS_TOKEN_TYPE,
+        **params
+    }, headers=headers)
+
+def test_exchange_downscopes_for_the_next_hop(client):
+    subject = user_token()
+    response = exchange(client, subject, scope="profile", audience=ORDERS)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["issued_token_type"] == ACCESS_TOKEN_TYPE and body["scope"] == "profile"
+
+    claims = TokenService._verify(body["access_token"])
+    subject_claims = TokenService.decode_token(subject)
+    assert claims["sub"] == "user-alice" and claims["aud"] == ORDERS
+    assert claims["act"] == {"sub": "gateway123"} and claims["client_id"] == "gateway123"
+    assert claims["exp"] <= subject_claims["exp"]
+
+def test_chained_exchange_by_the_addressed_client(client, monkeypatch):
+    monkeypatch.setitem(clients["gateway123"], "token_exchange_audiences", [ORDERS, "orders-svc"])
+    client_policies.pop("gateway123", None)
+    try:
+        first = exchange(client, user_token(), audience="orders-svc").get_json()["access_token"]
+        second = exchange(client, first, headers=ORDERS_AUTH, audience="https://billing.example.com").get_json()
+        claims = TokenService._verify(second["access_token"])
+        assert claims["act"] == {"sub": "orders-svc", "act": {"sub": "gateway123"}}
+        assert claims["scope"] == "openid profile"  # bounded by orders-svc's registration
+    finally:
+        client_policies.pop("gateway123", None)
+
+def test_audience_restricted_token_cannot_be_readdressed(client):
+    for_orders = exchange(client, user_token(), audience=ORDERS).get_json()["access_token"]
+    # Neither the original client nor another one may exchange a token addressed elsewhere
+    assert exchange(client, for_orders, audience=ORDERS).get_json()["error"] == "invalid_grant"
+    response = exchange(client, for_orders, headers=ORDERS_AUTH, audience="https://billing.example.com")
+    assert response.get_json()["error"] == "invalid_grant"
+
+def test_audience_must_be_allowed_for_the_client(client):
+    response = exchange(client, user_token(), audience="https://billing.example.com")
+    assert response.status_code == 400 and response.get_json()["error"] == "invalid_target"
+    assert exchange(client, user_token(), resource="https://billing.example.com").get_json()["error"] == "invalid_target"
+
+def test_repeated_exchanges_reuse_the_derived_token(client):
+    subject = user_token()
+    hits = cache_requests.value(("token_exchange", "hit"))
+    first = exchange(client, subject, scope="openid", audience=ORDERS).get_json()
+    for _ in range(5):
+        again = exchange(client, subject, scope="openid", audience=ORDERS).get_json()
+        assert again["access_token"] == first["access_token"]
+    assert cache_requests.value(("token_exchange", "hit")) == hits + 5
+
+    unaddressed = exchange(client, subject, scope="openid").get_json()
+    assert unaddressed["access_token"] != first["access_token"]
+    narrower = exchange(client, subject, scope="profile", audience=ORDERS).get_json()
+    assert narrower["access_token"] != first["access_token"]
+
+def test_rejects_invalid_subject_tokens(client):
+    assert exchange(client, user_token(), scope="admin").get_json()["error"] == "invalid_scope"
+    assert exchange(client, "garbage").get_json()["error"] == "invalid_grant"
+
+    with app.app_context():
+        refresh_token = TokenService.generate_refresh_token("user-alice", "fid", "jti", int(time.time()) + 60)
+        id_token = TokenService.generate_id_token("user-alice", "client123")
+    assert exchange(client, refresh_token).get_json()["error"] == "invalid_grant"
+    assert exchange(client, id_token).get_json()["error"] == "invalid_grant"
+
+    response = exchange(client, user_token(), subject_token_type="urn:ietf:params:oauth:token-type:id_token")
+    assert response.get_json()["error"] == "invalid_request"
+    web = basic("client123", "secret123")
+    assert exchange(client, user_token(), headers=web).get_json()["error"] == "unauthorized_client"
+
+def test_scope_is_bounded_by_the_client_registration(client):
+    subject = user_token("openid profile email")
+    response = exchange(client, subject, headers=ORDERS_AUTH, scope="email")
+    assert response.get_json()["error"] == "invalid_scope"
+    assert exchange(client, subject, headers=ORDERS_AUTH).get_json()["scope"] == "openid profile"
+
+def test_revoked_subject_is_not_served_from_cache(client):
+    subject = user_token()
+    assert exchange(client, subject).status_code == 200
+    with app.app_context():
+        revoke_token(TokenService.decode_token(subject))
+    assert exchange(client, subject).get_json()["error"] == "invalid_grant"
+
+def test_expired_subject_gets_no_grace(client, monkeypatch):
+    subject = user_token()
+    expires = TokenService.decode_token(subject)["exp"]
+    # Within the bearer grace period, but past exp
+    monkeypatch.setattr(time, "time", lambda: expires + 10)
+    assert exchange(client, subject).get_json()["error"] == "invalid_grant"
@@ -0,0 +1,62 @@
+# tests/test_userinfo_cache.py
+import pytest
+from app import app
+from auth.token import TokenService
+from metrics import cache_requests
+from models import update_user, users
+
+def bearer(token, etag=None):
+    headers = {"Authorization": f"Bearer {token}"}
+    if etag:
+        headers["If-None-Match"] = etag
+    return headers
+
+@pytest.fixture
+def client():
+    app.config["TESTING"] = True
+    with app.test_client() as client:
+        yield client
+
+@pytest.fixture
+def restore_bob():
+    saved = dict(users["bob"])
+    yield
+    update_user("bob", **{k: v for k, v in saved.items() if k != "version"})
+
+def test_claims_follow_scope(client):
+    token = TokenService.generate_access_token("user-alice", "openid email")
+    assert client.get("/userinfo", headers=bearer(token)).get_json() == {
+        "sub": "user-alice", "email": "alice@example.com", "email_verified": True
+    }
+    token = TokenService.generate_access_token("user-alice", "openid profile")
+    assert client.get("/userinfo", headers=bearer(token)).get_json() == {"sub": "user-alice", "name": "Alice"}
+
+def test_conditional_request_returns_304(client):
+    token = TokenService.generate_access_token("user-alice", "openid profile email")
+    first = client.get("/userinfo", headers=bearer(token))
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and etag
+    assert "no-cache" in first.headers["Cache-Control"]
+
+    hits = cache_requests.value(("userinfo", "hit"))
+    again = client.get("/userinfo", headers=bearer(token, etag))
+    assert again.status_code == 304 and again.get_data() == b""
+    assert again.headers["ETag"] == etag
+    assert cache_requests.value(("userinfo", "hit")) == hits + 1
+
+    # A different scope set is cached separately
+    other = TokenService.generate_access_token("user-alice", "openid")
+    assert client.get("/userinfo", headers=bearer(other, etag)).status_code == 200
+
+def test_user_update_invalidates(client, restore_bob):
+    token = TokenService.generate_access_token("user-bob", "openid profile")
+    etag = client.get("/userinfo", headers=bearer(token)).headers["ETag"]
+
+    update_user("bob", name="Robert")
+    response = client.get("/userinfo", headers=bearer(token, etag))
+    assert response.status_code == 200
+    assert response.get_json()["name"] == "Robert"
+    assert response.headers["ETag"] != etag
+
+def test_invalid_token_still_rejected(client):
+    assert client.get("/userinfo", headers=bearer("not-a-jwt")).status_code == 401
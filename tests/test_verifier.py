@@ -0,0 +1,170 @@
+# tests/test_verifier.py
+import base64
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from flask import Flask, g, jsonify
+from app import app
+from auth.token import TokenService, get_keyring
+from auth.verifier import JWKSVerifier, require_token
+
+ISSUER = app.config["ISSUER_URL"].rstrip("/")
+
+class JWKSServer:
+    """Stand-in for the provider's JWKS endpoint"""
+
+    def __init__(self, jwks):
+        self.jwks = jwks
+        self.requests = 0
+        self.fail = False
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests += 1
+                body = b"unavailable" if server.fail else json.dumps(server.jwks).encode()
+                self.send_response(503 if server.fail else 200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/.well-known/jwks.json"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def b64int(value):
+    return base64.urlsafe_b64encode(value.to_bytes((value.bit_length() + 7) // 8, "big")).rstrip(b"=").decode()
+
+def new_key(kid):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    numbers = key.public_key().public_numbers()
+    return key, {"kty": "RSA", "use": "sig", "alg": "RS256", "kid": kid, "n": b64int(numbers.n), "e": b64int(numbers.e)}
+
+def provider_jwks():
+    return json.loads(get_keyring().jwks_bytes)
+
+def access_token(scope="openid profile"):
+    with app.app_context():
+        return TokenService.generate_access_token("user-alice", scope, "client123")
+
+@pytest.fixture
+def jwks_server():
+    server = JWKSServer(provider_jwks())
+    yield server
+    server.close()
+
+@pytest.fixture
+def verifier(jwks_server):
+    verifier = JWKSVerifier(jwks_server.url, ISSUER, min_refresh_interval=0.05)
+    verifier.refresh()
+    yield verifier
+    verifier.stop()
+
+def test_verifies_provider_tokens_locally(verifier, jwks_server):
+    token = access_token()
+    claims = verifier.verify(token)
+    assert claims["sub"] == "user-alice" and claims["client_id"] == "client123"
+    assert verifier.verify(token) is claims  # served from the verified-claims cache
+    assert jwks_server.requests == 1
+
+def test_rejects_invalid_tokens(verifier):
+    token = access_token()
+    assert verifier.verify(token[:-4] + "AAAA") is None
+    assert verifier.verify("not-a-jwt") is None
+
+    with app.app_context():
+        refresh_token = TokenService.generate_refresh_token("user-alice", "fid", "jti", int(time.time()) + 60)
+        id_token = TokenService.generate_id_token("user-alice", "client123")
+    assert verifier.verify(refresh_token) is None
+    assert verifier.verify(id_token) is None
+
+    other = JWKSVerifier(verifier.jwks_uri, "https://other.example.com")
+    other.refresh()
+    assert other.verify(token) is None
+
+def test_unknown_kid_triggers_one_refresh(verifier, jwks_server):
+    key, jwk = new_key("rotated-1")
+    token = jwt.encode({"iss": ISSUER, "sub": "user-bob", "exp": int(time.time()) + 60},
+                       key, algorithm="RS256", headers={"kid": "rotated-1"})
+    assert verifier.verify(token) is None
+
+    jwks_server.jwks = {"keys": provider_jwks()["keys"] + [jwk]}
+    time.sleep(0.06)
+    assert verifier.verify(token)["sub"] == "user-bob"
+    requests = jwks_server.requests
+
+    # Unknown kids cannot force more than one fetch per min_refresh_interval
+    verifier.min_refresh_interval = 60
+    forged = jwt.encode({"iss": ISSUER, "sub": "x", "exp": int(time.time()) + 60},
+                        key, algorithm="RS256", headers={"kid": "unknown"})
+    for _ in range(20):
+        assert verifier.verify(forged) is None
+    assert jwks_server.requests == requests
+
+def test_withdrawn_key_invalidates_cached_claims(verifier, jwks_server):
+    token = access_token()
+    assert verifier.verify(token)
+    jwks_server.jwks = {"keys": [new_key("replacement")[1]]}
+    verifier.refresh()
+    assert verifier.verify(token) is None
+
+def test_background_refresh_keeps_keys_on_failure(jwks_server):
+    verifier = JWKSVerifier(jwks_server.url, ISSUER, refresh_interval=0.05, min_refresh_interval=0.05).start()
+    try:
+        jwks_server.fail = True
+        requests = jwks_server.requests
+        time.sleep(0.3)
+        assert jwks_server.requests > requests
+        assert verifier.verify(access_token())  # previous keys still in use
+    finally:
+        verifier.stop()
+
+def test_require_token_decorator(verifier):
+    api = Flask("api")
+
+    @api.route("/reports")
+    @require_token(verifier, scope="reports.read")
+    def reports():
+        return jsonify(owner=g.token_claims["sub"])
+
+    client = api.test_client()
+    response = client.get("/reports")
+    assert response.status_code == 401
+    assert response.headers["WWW-Authenticate"].startswith('Bearer error="invalid_request"')
+
+    response = client.get("/reports", headers={"Authorization": "Bearer garbage"})
+    assert response.status_code == 401
+    assert response.get_json()["error"] == "invalid_token"
+
+    response = client.get("/reports", headers={"Authorization": f"Bearer {access_token('openid')}"})
+    assert response.status_code == 403
+    assert response.get_json()["error"] == "insufficient_scope"
+
+    response = client.get("/reports", headers={"Authorization": f"Bearer {access_token('openid reports.read')}"})
+    assert response.status_code == 200
+    assert response.get_json() == {"owner": "user-alice"}
+
+def test_audience_restricted_tokens(verifier):
+    with app.app_context():
+        subject = TokenService.decode_token(access_token())
+        exchanged = TokenService.generate_exchanged_token(subject, "openid", "service123", "https://reports.example.com")
+    # Only an API that identifies itself as the audience accepts the token
+    assert verifier.verify(exchanged) is None
+    reports = JWKSVerifier(verifier.jwks_uri, ISSUER, audience="https://reports.example.com")
+    reports.refresh()
+    assert reports.verify(exchanged)["act"] == {"sub": "service123"}
+    other = JWKSVerifier(verifier.jwks_uri, ISSUER, audience="https://billing.example.com")
+    other.refresh()
+    assert other.verify(exchanged) is None